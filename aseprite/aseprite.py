@@ -1,13 +1,18 @@
 """Decoder for Aseprite animation files in .ase or .aseprite format.
 """
 
-import io
+import copy
 import zlib
 import struct
 
 from pyglet.image import ImageData, Animation, AnimationFrame
 from pyglet.image.codecs import ImageDecoder, ImageDecodeException
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 #   Documentation for the Aseprite format can be found here:
 #   https://raw.githubusercontent.com/aseprite/aseprite/master/docs/ase-file-specs.md
@@ -33,45 +38,403 @@ BLEND_MODES = {0: 'Normal',
                12: 'Hue',
                13: 'Saturation',
                14: 'Color',
-               15: 'Luminosity'}
-
-PALETTE_DICT = {}
-PALETTE_INDEX = 0
-
-
-def _unpack(fmt, file):
-    """Unpack little endian bytes fram a file-like object. """
-    size = struct.calcsize(fmt)
-    data = file.read(size)
-    if len(data) < size:
+               15: 'Luminosity',
+               16: 'Addition',
+               17: 'Subtract',
+               18: 'Divide'}
+
+# Pixel pipeline used for decoding. The 'numpy' backend works on whole
+# arrays at once, the 'python' backend is the original per-pixel fallback.
+BACKENDS = ('numpy', 'python')
+DEFAULT_BACKEND = 'numpy' if np is not None else 'python'
+
+
+# Precompiled little endian layouts. The whole file is read once and these
+# are unpacked by offset from a memoryview, so chunks are never copied:
+_HEADER = struct.Struct("<" + DWORD + WORD * 5 + DWORD + WORD + DWORD * 2 + BYTE + "3x" + WORD + "94x")
+_FRAME_HEADER = struct.Struct("<" + DWORD + WORD * 3 + "6x")
+_CHUNK_HEADER = struct.Struct("<" + DWORD + WORD)
+_LAYER = struct.Struct("<" + WORD * 6 + BYTE + "3x" + WORD)
+_CEL = struct.Struct("<" + WORD + SHORT * 2 + BYTE + WORD + "7x")
+_CEL_SIZE = struct.Struct("<" + WORD * 2)
+_CEL_LINK = struct.Struct("<" + WORD)
+_PALETTE = struct.Struct("<" + DWORD * 3 + "8x" + WORD)
+_RGBA = struct.Struct("<" + BYTE * 4)
+
+
+def _unpack_from(layout, data, offset=0):
+    """Unpack a precompiled layout from a buffer, without copying it."""
+    if offset + layout.size > len(data):
         raise ImageDecodeException('Unexpected EOF')
-    return struct.unpack("<" + fmt, data)[0]
+    return layout.unpack_from(data, offset)
 
 
 def _chunked_iter(seq, size):
     return (seq[pos:pos + size] for pos in range(0, len(seq), size))
 
 
+#########################################
+#   Blend modes
+#########################################
+
+#   The kernels follow Aseprite's own rgba_blender_* functions: a mode
+#   computes a new source color from the backdrop and source colors, which
+#   is then composited over the backdrop with the 'Normal' alpha formula
+#   using the source alpha scaled by the cel and layer opacity. As in
+#   Aseprite's default ("new") blending, the result fades from the blended
+#   color to plain 'Normal' as the backdrop gets transparent, so e.g. a
+#   Multiply layer does not darken empty canvas.
+#   Each mode has a scalar kernel for the 'python' backend and a vectorized
+#   one for the 'numpy' backend, which work on int32 arrays of 0-255 values.
+
+def _mul_un8(a, b):
+    """a * b / 255, rounded the way Aseprite does it. Works on ints and arrays."""
+    t = a * b + 0x80
+    return ((t >> 8) + t) >> 8
+
+
+def _div_un8(a, b):
+    """a * 255 / b, rounded. b must not be zero."""
+    return (a * 0xff + b // 2) // b
+
+
+def _blend_hard_light(b, s):
+    return _mul_un8(b, s << 1) if s < 128 else b + ((s << 1) - 255) - _mul_un8(b, (s << 1) - 255)
+
+
+def _blend_soft_light(b, s):
+    b, s = b / 255.0, s / 255.0
+    d = ((16 * b - 12) * b + 4) * b if b <= 0.25 else b ** 0.5
+    r = b - (1.0 - 2.0 * s) * b * (1.0 - b) if s <= 0.5 else b + (2.0 * s - 1.0) * (d - b)
+    return int(r * 255 + 0.5)
+
+
+def _blend_color_dodge(b, s):
+    if b == 0:
+        return 0
+    s = 255 - s
+    return 255 if b >= s else _div_un8(b, s)
+
+
+def _blend_color_burn(b, s):
+    if b == 255:
+        return 255
+    b = 255 - b
+    return 0 if b >= s else 255 - _div_un8(b, s)
+
+
+def _blend_divide(b, s):
+    if b == 0:
+        return 0
+    return 255 if b >= s else _div_un8(b, s)
+
+
+# Modes that blend each color channel on its own: (backdrop, source) -> result
+_SEPARABLE_BLENDS = {
+    'Multiply': _mul_un8,
+    'Screen': lambda b, s: b + s - _mul_un8(b, s),
+    'Overlay': lambda b, s: _blend_hard_light(s, b),
+    'Darken': min,
+    'Lighten': max,
+    'Color Dodge': _blend_color_dodge,
+    'Color Burn': _blend_color_burn,
+    'Hard Light': _blend_hard_light,
+    'Soft Light': _blend_soft_light,
+    'Difference': lambda b, s: abs(b - s),
+    'Exclusion': lambda b, s: b + s - 2 * _mul_un8(b, s),
+    'Addition': lambda b, s: min(b + s, 255),
+    'Subtract': lambda b, s: max(b - s, 0),
+    'Divide': _blend_divide,
+}
+
+
+def _lum(r, g, b):
+    return 0.3 * r + 0.59 * g + 0.11 * b
+
+
+def _sat(r, g, b):
+    return max(r, g, b) - min(r, g, b)
+
+
+def _clip_color(r, g, b):
+    lum = _lum(r, g, b)
+    n, x = min(r, g, b), max(r, g, b)
+    if n < 0:
+        r, g, b = (lum + (c - lum) * lum / (lum - n) for c in (r, g, b))
+    if x > 1:
+        r, g, b = (lum + (c - lum) * (1 - lum) / (x - lum) for c in (r, g, b))
+    return r, g, b
+
+
+def _set_lum(r, g, b, lum):
+    d = lum - _lum(r, g, b)
+    return _clip_color(r + d, g + d, b + d)
+
+
+def _set_sat(r, g, b, sat):
+    n, x = min(r, g, b), max(r, g, b)
+    if x > n:
+        return tuple((c - n) * sat / (x - n) for c in (r, g, b))
+    return 0.0, 0.0, 0.0
+
+
+# Modes that work on the whole color: (backdrop rgb, source rgb) -> result rgb, all in 0.0-1.0
+_NON_SEPARABLE_BLENDS = {
+    'Hue': lambda b, s: _set_lum(*_set_sat(*s, _sat(*b)), _lum(*b)),
+    'Saturation': lambda b, s: _set_lum(*_set_sat(*b, _sat(*s)), _lum(*b)),
+    'Color': lambda b, s: _set_lum(*s, _lum(*b)),
+    'Luminosity': lambda b, s: _set_lum(*b, _lum(*s)),
+}
+
+
+def _blend_normal_pixel(backdrop, src, opacity):
+    """Composite one RGBA source pixel over a backdrop pixel."""
+    if backdrop[3] == 0:
+        return src[0], src[1], src[2], _mul_un8(src[3], opacity)
+    if src[3] == 0:
+        return tuple(backdrop)
+    src_a = _mul_un8(src[3], opacity)
+    back_a = backdrop[3]
+    res_a = src_a + back_a - _mul_un8(back_a, src_a)
+    # Like Aseprite (C integer division), the channel offset is truncated towards zero:
+    return tuple(b + int((s - b) * src_a / res_a) for b, s in zip(backdrop[:3], src[:3])) + (res_a,)
+
+
+def _merge_pixel(backdrop, src, opacity):
+    """Interpolate from one RGBA pixel to another by opacity 0-255."""
+    if backdrop[3] == 0:
+        rgb = src[:3]
+    elif src[3] == 0:
+        rgb = backdrop[:3]
+    else:
+        rgb = [b + _mul_un8(s - b, opacity) for b, s in zip(backdrop[:3], src[:3])]
+    alpha = backdrop[3] + _mul_un8(src[3] - backdrop[3], opacity)
+    if alpha == 0:
+        return 0, 0, 0, 0
+    return tuple(rgb) + (alpha,)
+
+
+def _blend_pixel(backdrop, src, mode, opacity):
+    normal = _blend_normal_pixel(backdrop, src, opacity)
+    if mode == 'Normal' or backdrop[3] == 0:
+        return normal
+    if mode in _SEPARABLE_BLENDS:
+        blend = _SEPARABLE_BLENDS[mode]
+        blended = tuple(blend(b, s) for b, s in zip(backdrop[:3], src[:3])) + (src[3],)
+    else:
+        rgb = _NON_SEPARABLE_BLENDS[mode]([c / 255.0 for c in backdrop[:3]], [c / 255.0 for c in src[:3]])
+        blended = tuple(int(255.0 * c) for c in rgb) + (src[3],)
+    blend = _blend_normal_pixel(backdrop, blended, opacity)
+    merged = _merge_pixel(normal, blend, backdrop[3])
+    return _merge_pixel(merged, blend, _mul_un8(backdrop[3], _mul_un8(src[3], opacity)))
+
+
+#   Vectorized kernels, used by the 'numpy' backend
+
+def _div_un8_numpy(a, b):
+    return (a * 0xff + b // 2) // np.maximum(b, 1)
+
+
+def _hard_light_numpy(b, s):
+    s2 = s << 1
+    return np.where(s < 128, _mul_un8(b, s2), b + (s2 - 255) - _mul_un8(b, s2 - 255))
+
+
+def _soft_light_numpy(b, s):
+    b, s = b / 255.0, s / 255.0
+    d = np.where(b <= 0.25, ((16 * b - 12) * b + 4) * b, np.sqrt(b))
+    r = np.where(s <= 0.5, b - (1.0 - 2.0 * s) * b * (1.0 - b), b + (2.0 * s - 1.0) * (d - b))
+    return (r * 255 + 0.5).astype(np.int32)
+
+
+def _color_dodge_numpy(b, s):
+    s = 255 - s
+    return np.where(b == 0, 0, np.where(b >= s, 255, _div_un8_numpy(b, s)))
+
+
+def _color_burn_numpy(b, s):
+    inverted = 255 - b
+    return np.where(b == 255, 255, np.where(inverted >= s, 0, 255 - _div_un8_numpy(inverted, s)))
+
+
+def _divide_numpy(b, s):
+    return np.where(b == 0, 0, np.where(b >= s, 255, _div_un8_numpy(b, s)))
+
+
+_SEPARABLE_BLENDS_NUMPY = {
+    'Multiply': _mul_un8,
+    'Screen': lambda b, s: b + s - _mul_un8(b, s),
+    'Overlay': lambda b, s: _hard_light_numpy(s, b),
+    'Darken': lambda b, s: np.minimum(b, s),
+    'Lighten': lambda b, s: np.maximum(b, s),
+    'Color Dodge': _color_dodge_numpy,
+    'Color Burn': _color_burn_numpy,
+    'Hard Light': _hard_light_numpy,
+    'Soft Light': _soft_light_numpy,
+    'Difference': lambda b, s: np.abs(b - s),
+    'Exclusion': lambda b, s: b + s - 2 * _mul_un8(b, s),
+    'Addition': lambda b, s: np.minimum(b + s, 255),
+    'Subtract': lambda b, s: np.maximum(b - s, 0),
+    'Divide': _divide_numpy,
+}
+
+
+def _lum_numpy(rgb):
+    # Same operation order as _lum, so both backends round the same way:
+    return 0.3 * rgb[..., 0] + 0.59 * rgb[..., 1] + 0.11 * rgb[..., 2]
+
+
+def _sat_numpy(rgb):
+    return rgb.max(axis=-1) - rgb.min(axis=-1)
+
+
+def _clip_color_numpy(rgb):
+    lum = _lum_numpy(rgb)[..., None]
+    n = rgb.min(axis=-1, keepdims=True)
+    x = rgb.max(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rgb = np.where(n < 0, lum + (rgb - lum) * lum / (lum - n), rgb)
+        rgb = np.where(x > 1, lum + (rgb - lum) * (1 - lum) / (x - lum), rgb)
+    return rgb
+
+
+def _set_lum_numpy(rgb, lum):
+    return _clip_color_numpy(rgb + (lum - _lum_numpy(rgb))[..., None])
+
+
+def _set_sat_numpy(rgb, sat):
+    n = rgb.min(axis=-1, keepdims=True)
+    x = rgb.max(axis=-1, keepdims=True)
+    spread = x - n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(spread > 0, (rgb - n) * sat[..., None] / spread, 0.0)
+
+
+_NON_SEPARABLE_BLENDS_NUMPY = {
+    'Hue': lambda b, s: _set_lum_numpy(_set_sat_numpy(s, _sat_numpy(b)), _lum_numpy(b)),
+    'Saturation': lambda b, s: _set_lum_numpy(_set_sat_numpy(b, _sat_numpy(s)), _lum_numpy(b)),
+    'Color': lambda b, s: _set_lum_numpy(s, _lum_numpy(b)),
+    'Luminosity': lambda b, s: _set_lum_numpy(b, _lum_numpy(s)),
+}
+
+
+def _blend_normal_numpy(backdrop, src, opacity):
+    """Composite (..., 4) int32 source pixels over backdrop pixels."""
+    src_a = _mul_un8(src[..., 3], opacity)
+    back_a = backdrop[..., 3]
+    res_a = src_a + back_a - _mul_un8(back_a, src_a)
+    # Like Aseprite (C integer division), the channel offset is truncated towards zero:
+    offset = (src[..., :3] - backdrop[..., :3]) * src_a[..., None]
+    divisor = np.maximum(res_a, 1)[..., None]
+    result = np.empty_like(backdrop)
+    result[..., :3] = backdrop[..., :3] + np.sign(offset) * (np.abs(offset) // divisor)
+    result[..., 3] = res_a
+    result = np.where((src[..., 3] == 0)[..., None], backdrop, result)
+    # A transparent backdrop takes the source as it is:
+    src = src.copy()
+    src[..., 3] = src_a
+    return np.where((back_a == 0)[..., None], src, result)
+
+
+def _merge_numpy(backdrop, src, opacity):
+    """Interpolate from one set of (..., 4) int32 pixels to another by opacity 0-255 (scalar or per pixel)."""
+    opacity = np.asarray(opacity)[..., None]
+    back_a = backdrop[..., 3:]
+    src_a = src[..., 3:]
+    rgb = backdrop[..., :3] + _mul_un8(src[..., :3] - backdrop[..., :3], opacity)
+    rgb = np.where(src_a == 0, backdrop[..., :3], rgb)
+    rgb = np.where(back_a == 0, src[..., :3], rgb)
+    alpha = back_a + _mul_un8(src_a - back_a, opacity)
+    return np.where(alpha == 0, 0, np.concatenate((rgb, alpha), axis=-1))
+
+
+def _blend_pixels_numpy(backdrop, src, mode, opacity):
+    """Blend (..., 4) uint8 source pixels onto backdrop pixels with a blend mode and opacity 0-255."""
+    alpha = src[..., 3]
+    # (alpha - 1) wraps around for 0, so this is True only for partially transparent pixels:
+    if mode == 'Normal' and opacity == 255 and not ((alpha - np.uint8(1)) < 254).any():
+        # Fast path for pixel art: every source pixel is either opaque or fully transparent
+        result = backdrop.copy()
+        np.copyto(result, src, where=((alpha == 255) | (backdrop[..., 3] == 0))[..., None])
+        return result
+
+    backdrop = backdrop.astype(np.int32)
+    src = src.astype(np.int32)
+    normal = _blend_normal_numpy(backdrop, src, opacity)
+    if mode == 'Normal':
+        return normal.astype(np.uint8)
+
+    blended = src.copy()
+    if mode in _SEPARABLE_BLENDS_NUMPY:
+        blended[..., :3] = _SEPARABLE_BLENDS_NUMPY[mode](backdrop[..., :3], src[..., :3])
+    else:
+        rgb = _NON_SEPARABLE_BLENDS_NUMPY[mode](backdrop[..., :3] / 255.0, src[..., :3] / 255.0)
+        blended[..., :3] = (255.0 * rgb).astype(np.int32)
+    blend = _blend_normal_numpy(backdrop, blended, opacity)
+    back_a = backdrop[..., 3]
+    merged = _merge_numpy(normal, blend, back_a)
+    merged = _merge_numpy(merged, blend, _mul_un8(back_a, _mul_un8(src[..., 3], opacity)))
+    return np.where((back_a == 0)[..., None], normal, merged).astype(np.uint8)
+
+
 #########################################
 #   Class for Aseprite compliant header
 #########################################
 
 class AsepriteHeader:
-    def __init__(self, file):
-        self.file_size = _unpack(DWORD, file)
-        self.magic_number = hex(_unpack(WORD, file))
-        self.num_frames = _unpack(WORD, file)
-        self.width = _unpack(WORD, file)
-        self.height = _unpack(WORD, file)
-        self.color_depth = _unpack(WORD, file)
-        self.flags = _unpack(DWORD, file)
-        self.speed = _unpack(WORD, file)
-        self._zero = _unpack(DWORD, file)
-        self._zero = _unpack(DWORD, file)
-        self.palette_index = _unpack(BYTE, file)
-        self._ignore = _unpack(BYTE * 3, file)
-        self.number_of_colors = _unpack(WORD, file)
-        self._zero = _unpack(BYTE * 94, file)
+    size = _HEADER.size
+
+    def __init__(self, data):
+        (self.file_size, magic_number, self.num_frames, self.width, self.height,
+         self.color_depth, self.flags, self.speed, _zero, _zero,
+         self.palette_index, self.number_of_colors) = _unpack_from(_HEADER, data)
+        self.magic_number = hex(magic_number)
+
+
+#########################################
+#   Palette of an indexed color file
+#########################################
+
+class Palette:
+    """The colors of one file, shared by all of its frames.
+
+    Each parse creates its own palette, so several files can be decoded at
+    the same time (e.g. from a thread pool). Indexed pixels are converted
+    through a 256-entry RGBA lookup table, built once per palette.
+    """
+    def __init__(self, transparent_index=0):
+        self.transparent_index = transparent_index
+        self.colors = {}
+        self._lookup = None
+        self._lookup_numpy = None
+
+    def update(self, palette_chunk):
+        """Apply a palette chunk, which sets the colors of a range of indices."""
+        self.colors.update(palette_chunk.palette_dict)
+        self._lookup = self._lookup_numpy = None
+
+    @property
+    def lookup(self):
+        """A list of 256 RGBA colors as 4-byte strings, the transparent index being empty."""
+        if self._lookup is None:
+            lookup = [bytes(4)] * 256
+            for index, rgba in self.colors.items():
+                if index < 256:
+                    lookup[index] = bytes(rgba)
+            lookup[self.transparent_index] = bytes(4)
+            self._lookup = lookup
+        return self._lookup
+
+    @property
+    def lookup_numpy(self):
+        """The lookup table as a (256, 4) array."""
+        if self._lookup_numpy is None:
+            self._lookup_numpy = np.frombuffer(b''.join(self.lookup), dtype=np.uint8).reshape(256, 4)
+        return self._lookup_numpy
+
+    def to_rgba(self, indices):
+        """Convert indexed pixels to RGBA bytes."""
+        return b''.join(map(self.lookup.__getitem__, indices))
 
 
 #########################################
@@ -79,25 +442,33 @@ class AsepriteHeader:
 #########################################
 
 class Frame(object):
-    def __init__(self, num_chunks, duration, header, data):
+    def __init__(self, num_chunks, duration, header, data, palette=None):
         self.num_chunks = num_chunks
         self.duration = duration
         self.color_depth = header.color_depth
+        # Bit 1 of the header flags: the layer opacity field holds a valid value
+        self.layer_opacity_valid = bool(header.flags & 1)
         self.width = header.width
         self.height = header.height
         self._data = data
+        # Shared by every frame of the file, palette chunks may come in any frame:
+        self.palette = palette if palette is not None else Palette(header.palette_index)
+        # Set by _resolve_links when every cel links into one other frame, which then looks the same:
+        self.source_frame = None
         self.chunks = self._parse_chunks()
         self.cels = [c for c in self.chunks if type(c) == CelChunk]
         self.layers = [c for c in self.chunks if type(c) == LayerChunk]
 
     def _parse_chunks(self):
-        fileobj = io.BytesIO(self._data)
+        data = self._data
+        offset = 0
         chunks = []
         for chunk in range(self.num_chunks):
-            chunk_size = _unpack(DWORD, fileobj)
-            chunk_type = format(_unpack(WORD, fileobj), "#06x")
-            header_size = struct.calcsize(DWORD + WORD)
-            chunk_data = fileobj.read(chunk_size - header_size)
+            chunk_size, chunk_type = _unpack_from(_CHUNK_HEADER, data, offset)
+            chunk_type = format(chunk_type, "#06x")
+            # A view into the frame data, not a copy:
+            chunk_data = data[offset + _CHUNK_HEADER.size:offset + chunk_size]
+            offset += chunk_size
             if chunk_type in ("0x0004", "0x0011", "0x2016"):
                 chunks.append(DeprecatedChunk(chunk_size, chunk_type, chunk_data))
             elif chunk_type == "0x2004":
@@ -111,86 +482,159 @@ class Frame(object):
             elif chunk_type == "0x2019":
                 palette_chunk = PaletteChunk(chunk_size, chunk_type, chunk_data)
                 chunks.append(palette_chunk)
-                global PALETTE_DICT
-                PALETTE_DICT = palette_chunk.palette_dict.copy()
+                self.palette.update(palette_chunk)
             elif chunk_type == "0x2020":
                 chunks.append(UserDataChunk(chunk_size, chunk_type, chunk_data))
         return chunks
 
-    def _pad_pixels(self, cel):
-        """For cels that don't fill the entire frame, pad with zeros."""
-        fileobj = io.BytesIO(cel.pixel_data)
-
-        padding = b'\x00\x00\x00\x00'
-        top_pad = padding * (self.width * cel.y_pos)
-        left_pad = padding * cel.x_pos
-        right_pad = padding * (self.width - cel.x_pos - cel.width)
-        bottom_pad = padding * (self.width * (self.height - cel.height - cel.y_pos))
-        line_size = cel.width * 4   # (RGBA)
-
-        pixel_array = top_pad
-        for i in range(cel.height):
-            pixel_array += (left_pad + fileobj.read(line_size) + right_pad)
-        pixel_array += bottom_pad
-
-        return pixel_array
+    def _cel_rect(self, cel):
+        """The part of the canvas covered by a cel, clipped to the canvas edges.
+
+        Returns (x0, y0, x1, y1), or None if the cel lies outside the canvas.
+        """
+        x0, y0 = max(cel.x_pos, 0), max(cel.y_pos, 0)
+        x1 = min(cel.x_pos + cel.width, self.width)
+        y1 = min(cel.y_pos + cel.height, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def _cel_pixels(self, cel, backend):
+        """Return (cel, RGBA pixels) for a cel, following links to the cel holding the pixels.
+
+        Cels that other cels link to keep their converted pixels, so every
+        frame linking to them reuses the same data instead of decoding again.
+        """
+        if cel.link is not None:
+            cel = cel.link
+        if cel._rgba is not None and cel._rgba[0] == backend:
+            return cel, cel._rgba[1]
+        if backend == 'numpy':
+            pixels = self._convert_to_rgba_numpy(cel)
+        else:
+            pixels = self._convert_to_rgba(cel).pixel_data
+        if cel.is_link_target:
+            cel._rgba = backend, pixels
+        return cel, pixels
+
+    def _cel_opacity(self, cel, layer):
+        if self.layer_opacity_valid:
+            return _mul_un8(cel.opacity_level, layer.opacity)
+        return cel.opacity_level
+
+    def _blend_rect(self, canvas, cel, pixels, mode, opacity):
+        """Blend a cel into the canvas, touching only the rows and columns it covers."""
+        rect = self._cel_rect(cel)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        row_size = (x1 - x0) * 4
+        src_x = (x0 - cel.x_pos) * 4
+        for y in range(y0, y1):
+            dst = (y * self.width + x0) * 4
+            src = (y - cel.y_pos) * cel.width * 4 + src_x
+            canvas[dst:dst + row_size] = self._blend_pixels(canvas[dst:dst + row_size],
+                                                            pixels[src:src + row_size], mode, opacity)
 
     @staticmethod
-    def _blend_pixels(bottom, top, mode):
+    def _blend_pixels(bottom, top, mode, opacity=255):
+        if mode != 'Normal' and mode not in _SEPARABLE_BLENDS and mode not in _NON_SEPARABLE_BLENDS:
+            raise ImageDecodeException("Unsupported blend mode: '{}'".format(mode))
+
         # Iterate over the arrays in chunks of 4 (RGBA):
         bottom_iter = _chunked_iter(bottom, 4)
         top_iter = _chunked_iter(top, 4)
 
-        if mode == 'Normal':
-            final_array = []
-            # If RGBA values are > 0, use the top pixel.
-            for bottom_pixel, top_pixel in zip(bottom_iter, top_iter):
-                if any(top_pixel) > 0:      # Any of R, G, B, A > 0
-                    final_array.extend(top_pixel)
-                else:
-                    final_array.extend(bottom_pixel)
-            return bytes(final_array)
-
-        # TODO: implement additional blend modes
-        else:
-            raise ImageDecodeException("Unsupported blend mode: '{}'".format(mode))
+        final_array = []
+        opaque_normal = mode == 'Normal' and opacity == 255
+        for bottom_pixel, top_pixel in zip(bottom_iter, top_iter):
+            if top_pixel[3] == 0:
+                # Nothing is drawn, but an empty backdrop takes the source color (like Aseprite):
+                final_array.extend(bottom_pixel if bottom_pixel[3] else top_pixel)
+            elif opaque_normal and top_pixel[3] == 255:
+                final_array.extend(top_pixel)
+            else:
+                final_array.extend(_blend_pixel(bottom_pixel, top_pixel, mode, opacity))
+        return bytes(final_array)
 
     def _convert_to_rgba(self, cel):
+        # Convert a copy, so that a frame can be decoded more than once:
         if self.color_depth == 8:
-            global PALETTE_INDEX
-            pixel_array = []
-            for pixel in cel.pixel_data:
-                if pixel == PALETTE_INDEX:
-                    pixel_array.extend([0, 0, 0, 0])
-                else:
-                    pixel_array.extend(PALETTE_DICT[pixel])
-            cel.pixel_data = bytes(pixel_array)
+            cel = copy.copy(cel)
+            cel.pixel_data = self.palette.to_rgba(cel.pixel_data)
             return cel
 
         elif self.color_depth == 16:
             greyscale_iter = _chunked_iter(cel.pixel_data, 2)
             pixel_array = []
-            for pixel in greyscale_iter:
-                rgba = (pixel[0] * 3) + pixel[1]
-                pixel_array.append(rgba)
+            for value, alpha in greyscale_iter:
+                pixel_array.extend((value, value, value, alpha))
+            cel = copy.copy(cel)
             cel.pixel_data = bytes(pixel_array)
             return cel
 
         else:
             return cel
 
-    def get_pixel_array(self, layers):
+    def get_pixel_array(self, layers, backend='python'):
+        if backend == 'numpy':
+            return self._get_pixel_array_numpy(layers)
+
+        # Start off with an empty RGBA base:
+        canvas = bytearray(4 * self.width * self.height)
+
+        # Blend each layer's cel data one-by-one, only where the cel lies:
+        for cel in self.cels:
+            cel, pixels = self._cel_pixels(cel, backend)
+            layer = layers[cel.layer_index]
+            blend_mode = BLEND_MODES.get(layer.blend_mode)
+            self._blend_rect(canvas, cel, pixels, blend_mode, self._cel_opacity(cel, layer))
+
+        return bytes(canvas)
+
+    #   NumPy backend: same pipeline as above, but on (height, width, 4) arrays
+
+    @staticmethod
+    def _blend_pixels_numpy(bottom, top, mode, opacity=255):
+        if mode != 'Normal' and mode not in _SEPARABLE_BLENDS_NUMPY and mode not in _NON_SEPARABLE_BLENDS_NUMPY:
+            raise ImageDecodeException("Unsupported blend mode: '{}'".format(mode))
+        return _blend_pixels_numpy(bottom, top, mode, opacity)
+
+    def _convert_to_rgba_numpy(self, cel):
+        """Return the cel's pixels as a (height, width, 4) RGBA array."""
+        if self.color_depth == 8:
+            indices = np.frombuffer(cel.pixel_data, dtype=np.uint8)
+            pixels = self.palette.lookup_numpy[indices]
+
+        elif self.color_depth == 16:
+            greyscale = np.frombuffer(cel.pixel_data, dtype=np.uint8).reshape(-1, 2)
+            pixels = np.empty((len(greyscale), 4), dtype=np.uint8)
+            pixels[:, :3] = greyscale[:, :1]
+            pixels[:, 3] = greyscale[:, 1]
+
+        else:
+            pixels = np.frombuffer(cel.pixel_data, dtype=np.uint8)
+
+        return pixels.reshape(cel.height, cel.width, 4)
+
+    def _get_pixel_array_numpy(self, layers):
         # Start off with an empty RGBA base:
-        pixel_array = bytes(4 * self.width * self.height)
+        canvas = np.zeros((self.height, self.width, 4), dtype=np.uint8)
 
-        # Blend each layer's cel data one-by-one:
+        # Blend each layer's cel data one-by-one, only within the cel's rectangle:
         for cel in self.cels:
-            cel = self._convert_to_rgba(cel)
-            padded_pixels = self._pad_pixels(cel)
-            blend_mode = BLEND_MODES[layers[cel.layer_index].blend_mode]
-            pixel_array = self._blend_pixels(pixel_array, padded_pixels, blend_mode)
+            cel, pixels = self._cel_pixels(cel, 'numpy')
+            rect = self._cel_rect(cel)
+            if rect is None:
+                continue
+            x0, y0, x1, y1 = rect
+            region = canvas[y0:y1, x0:x1]
+            top = pixels[y0 - cel.y_pos:y1 - cel.y_pos, x0 - cel.x_pos:x1 - cel.x_pos]
+            layer = layers[cel.layer_index]
+            blend_mode = BLEND_MODES.get(layer.blend_mode)
+            region[...] = self._blend_pixels_numpy(region, top, blend_mode, self._cel_opacity(cel, layer))
 
-        return pixel_array
+        return canvas.tobytes()
 
 
 #########################################
@@ -206,41 +650,42 @@ class Chunk:
 class LayerChunk(Chunk):
     def __init__(self, size, chunk_type, data):
         super().__init__(size, chunk_type)
-        fileobj = io.BytesIO(data)
-        self.flags = _unpack(WORD, fileobj)
-        self.layer_type = _unpack(WORD, fileobj)
-        self.child_level = _unpack(WORD, fileobj)
-        _ignored_width = _unpack(WORD, fileobj)
-        _ignored_height = _unpack(WORD, fileobj)
-        self.blend_mode = _unpack(WORD, fileobj)
-        self.opacity = _unpack(BYTE, fileobj)
-        _zero_unused = _unpack(BYTE * 3, fileobj)
-        name_length = _unpack(WORD, fileobj)
-        self.name = fileobj.read(name_length)
-        if hasattr(self.name, "decode"):
-            self.name = self.name.decode('utf8')
+        (self.flags, self.layer_type, self.child_level, _ignored_width, _ignored_height,
+         self.blend_mode, self.opacity, name_length) = _unpack_from(_LAYER, data)
+        self.name = bytes(data[_LAYER.size:_LAYER.size + name_length]).decode('utf8')
 
 
 class CelChunk(Chunk):
     def __init__(self, size, chunk_type, data):
         super().__init__(size, chunk_type)
-        fileobj = io.BytesIO(data)
-        self.layer_index = _unpack(WORD, fileobj)
-        self.x_pos = _unpack(SHORT, fileobj)
-        self.y_pos = _unpack(SHORT, fileobj)
-        self.opacity_level = _unpack(BYTE, fileobj)
-        self.cel_type = _unpack(WORD, fileobj)
-        _zero_unused = _unpack(BYTE * 7, fileobj)
+        self._pixel_data = None
+        self._compressed_data = None
+        # Linked cels (cel_type 1) point at the cel they share pixels with, see _resolve_links:
+        self.link = None
+        self.is_link_target = False
+        self._rgba = None
+        (self.layer_index, self.x_pos, self.y_pos,
+         self.opacity_level, self.cel_type) = _unpack_from(_CEL, data)
+        offset = _CEL.size
         if self.cel_type == 0:
-            self.width = _unpack(WORD, fileobj)
-            self.height = _unpack(WORD, fileobj)
-            self.pixel_data = fileobj.read()
+            self.width, self.height = _unpack_from(_CEL_SIZE, data, offset)
+            self.pixel_data = data[offset + _CEL_SIZE.size:]
         elif self.cel_type == 1:
-            self.frame_position = _unpack(WORD, fileobj)
+            self.frame_position, = _unpack_from(_CEL_LINK, data, offset)
         elif self.cel_type == 2:
-            self.width = _unpack(WORD, fileobj)
-            self.height = _unpack(WORD, fileobj)
-            self.pixel_data = zlib.decompress(fileobj.read())
+            self.width, self.height = _unpack_from(_CEL_SIZE, data, offset)
+            # Decompressed on first access, so parsing a file stays cheap:
+            self._compressed_data = data[offset + _CEL_SIZE.size:]
+
+    @property
+    def pixel_data(self):
+        if self._pixel_data is None and self._compressed_data is not None:
+            return zlib.decompress(self._compressed_data)
+        return self._pixel_data
+
+    @pixel_data.setter
+    def pixel_data(self, data):
+        self._pixel_data = data
 
 
 class PathChunk(Chunk):
@@ -257,21 +702,18 @@ class FrameTagsChunk(Chunk):
 class PaletteChunk(Chunk):
     def __init__(self, size, chunk_type, data):
         super().__init__(size, chunk_type)
-        fileobj = io.BytesIO(data)
-        self.palette_size = _unpack(DWORD, fileobj)
-        self.first_color_index = _unpack(DWORD, fileobj)
-        self.last_color_index = _unpack(DWORD, fileobj)
-        _zero = _unpack(BYTE * 8, fileobj)
+        (self.palette_size, self.first_color_index,
+         self.last_color_index, has_name) = _unpack_from(_PALETTE, data)
         self.palette_dict = {}
-        if _unpack(WORD, fileobj) == 1:              # color has name
+        if has_name == 1:              # color has name
             size = 7
         else:
             size = 6
+        offset = _PALETTE.size
         for index in range(self.first_color_index, self.last_color_index+1):
-            rgba_data = fileobj.read(size)
             # Ignore the palette names, as they aren't needed:
-            r, g, b, a = struct.unpack('<BBBB', rgba_data[:4])
-            self.palette_dict[index] = r, g, b, a
+            self.palette_dict[index] = _unpack_from(_RGBA, data, offset)
+            offset += size
 
 
 class UserDataChunk(Chunk):
@@ -290,6 +732,15 @@ class DeprecatedChunk(Chunk):
 #########################################
 
 class AsepriteImageDecoder(ImageDecoder):
+    def __init__(self, backend=None):
+        if backend is None:
+            backend = DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError("Unknown decode backend: '{}'".format(backend))
+        if backend == 'numpy' and np is None:
+            raise ImportError("The 'numpy' decode backend requires NumPy.")
+        self.backend = backend
+
     def get_file_extensions(self):
         return ['.ase', '.aseprite']
 
@@ -298,14 +749,19 @@ class AsepriteImageDecoder(ImageDecoder):
 
     def decode(self, filename, file):
         header, frames, layers, pitch = self._parse_file(filename, file)
-        pixel_data = frames[0].get_pixel_array(layers=layers)
+        pixel_data = frames[0].get_pixel_array(layers=layers, backend=self.backend)
         return ImageData(header.width, header.height, 'RGBA', pixel_data, -pitch)
 
     def decode_animation(self, file, filename):
         header, frames, layers, pitch = self._parse_file(file, filename)
         animation_frames = []
+        decoded = {}
         for frame in frames:
-            pixel_data = frame.get_pixel_array(layers=layers)
+            # A frame made only of links into one earlier frame reuses its composited pixels:
+            pixel_data = decoded.get(frame.source_frame)
+            if pixel_data is None:
+                pixel_data = frame.get_pixel_array(layers=layers, backend=self.backend)
+            decoded[frame] = pixel_data
             image = ImageData(header.width, header.height, 'RGBA', pixel_data, -pitch)
             animation_frames.append(AnimationFrame(image, frame.duration/1000.0))
         return Animation(animation_frames)
@@ -315,38 +771,87 @@ class AsepriteImageDecoder(ImageDecoder):
         if not file:
             file = open(filename, 'rb')
 
-        header = AsepriteHeader(file)
+        # Read the file once, frames and chunks are then sliced out of this view:
+        data = memoryview(file.read())
+        file.close()
+
+        header = AsepriteHeader(data)
         if header.magic_number != '0xa5e0':
             raise ImageDecodeException("Does not appear to be a valid ASEprite file.")
 
         if header.color_depth not in (8, 16, 32):
             raise ImageDecodeException("Invalid color depth.")
 
-        global PALETTE_INDEX
-        PALETTE_INDEX = header.palette_index
-
+        palette = Palette(header.palette_index)
         frames = []
+        offset = AsepriteHeader.size
         for _ in range(header.num_frames):
-            frame_size = _unpack(DWORD, file)
-            magic_number = hex(_unpack(WORD, file))
-            if magic_number != '0xf1fa':
+            frame_size, magic_number, num_chunks, duration = _unpack_from(_FRAME_HEADER, data, offset)
+            if magic_number != 0xf1fa:
                 raise ImageDecodeException("Malformed frame. File may be corrupted.")
-            num_chunks = _unpack(WORD, file)
-            duration = _unpack(WORD, file)
-            _zero = _unpack(BYTE * 6, file)
-            header_size = struct.calcsize(DWORD + WORD * 3 + BYTE * 6)
-            data = file.read(frame_size - header_size)
-            frames.append(Frame(num_chunks, duration, header, data))
+            frame_data = data[offset + _FRAME_HEADER.size:offset + frame_size]
+            frames.append(Frame(num_chunks, duration, header, frame_data, palette))
+            offset += frame_size
+
+        AsepriteImageDecoder._resolve_links(frames)
 
         # Layers chunk is in the first frame:
         layers = frames[0].layers
         pitch = len('RGBA') * header.width
 
-        file.close()
-
         return header, frames, layers, pitch
 
 
+    @staticmethod
+    def _resolve_links(frames):
+        """Point each linked cel at the cel of the same layer in the frame it links to."""
+        for frame in frames:
+            source_frames = set()
+            for cel in frame.cels:
+                if cel.cel_type != 1:
+                    continue
+                if cel.frame_position >= len(frames):
+                    raise ImageDecodeException("Linked cel points to a missing frame.")
+                source = frames[cel.frame_position]
+                target = next((c for c in source.cels if c.layer_index == cel.layer_index), None)
+                if target is None or target.cel_type == 1:
+                    raise ImageDecodeException("Linked cel has no cel to link to.")
+                cel.link = target
+                target.is_link_target = True
+                source_frames.add(source)
+
+            if len(source_frames) == 1 and all(cel.cel_type == 1 for cel in frame.cels):
+                source = source_frames.pop()
+                if [c.layer_index for c in source.cels] == [c.layer_index for c in frame.cels]:
+                    frame.source_frame = source
+
+
+#########################################
+#   On-demand frame decoding
+#########################################
+
+class AsepriteFrameStream:
+    """Decode the frames of an Aseprite file one at a time, on demand.
+
+    Only the raw file, with its compressed cel data, is kept in memory, so long or large
+    animations can be played back without holding every decoded frame.
+    """
+    def __init__(self, filename, backend=None):
+        decoder = AsepriteImageDecoder(backend=backend)
+        self.backend = decoder.backend
+        self.header, self.frames, self.layers, self.pitch = decoder._parse_file(filename, None)
+        self.width = self.header.width
+        self.height = self.header.height
+        self.durations = [frame.duration / 1000.0 for frame in self.frames]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get_frame(self, index):
+        pixel_data = self.frames[index].get_pixel_array(layers=self.layers, backend=self.backend)
+        return ImageData(self.width, self.height, 'RGBA', pixel_data, -self.pitch)
+
+
 def get_decoders():
     return [AsepriteImageDecoder()]
 
@@ -0,0 +1,263 @@
+"""Compare the decode backends of the Aseprite decoder on the shipped sprites.
+
+Usage:
+    python aseprite/benchmark.py [--repeat N] [--backends numpy python] [files ...]
+    python aseprite/benchmark.py --blend-modes [--size N] [--repeat N] [--backends ...]
+
+Without files, every .ase/.aseprite file in aseprite/sprites is decoded,
+plus a generated 16-bit greyscale file (the shipped sprites are all RGBA).
+Each file is decoded with every backend, timed, and the decoded frames are
+compared byte-for-byte against the first backend. The greyscale frames are
+also compared with the pixels they were generated from. The "parse" column is the
+time spent reading the frame and chunk structure alone, before any pixels
+are decoded. The "baseline" column parses the same structure the way the
+decoder used to: one struct.unpack per field, through io.BytesIO copies of
+every frame and chunk.
+
+With --blend-modes, the blend kernels are timed instead: every mode blends
+random translucent pixels, and "Normal (pixel art)" blends only opaque and
+fully transparent pixels at full opacity, the fast path used by the shipped
+sprites. Throughput is reported in megapixels per second.
+"""
+
+import argparse
+import glob
+import io
+import os
+import random
+import struct
+import tempfile
+import time
+
+import pyglet
+
+# The decoder does not need a GL context, so the benchmark can run headless:
+pyglet.options['shadow_window'] = False
+
+import aseprite
+from fixtures import write_greyscale_sprite
+
+SPRITES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sprites')
+
+
+def _unpack(fmt, file):
+    size = struct.calcsize(fmt)
+    data = file.read(size)
+    if len(data) < size:
+        raise aseprite.ImageDecodeException('Unexpected EOF')
+    return struct.unpack("<" + fmt, data)[0]
+
+
+def _parse_baseline_chunk(chunk_type, data):
+    fileobj = io.BytesIO(data)
+    if chunk_type == 0x2004:
+        flags = _unpack('H', fileobj)
+        layer_type = _unpack('H', fileobj)
+        child_level = _unpack('H', fileobj)
+        _unpack('H', fileobj)
+        _unpack('H', fileobj)
+        blend_mode = _unpack('H', fileobj)
+        opacity = _unpack('B', fileobj)
+        _unpack('BBB', fileobj)
+        name = fileobj.read(_unpack('H', fileobj)).decode('utf8')
+        return flags, layer_type, child_level, blend_mode, opacity, name
+    if chunk_type == 0x2005:
+        cel = (_unpack('H', fileobj), _unpack('h', fileobj), _unpack('h', fileobj),
+               _unpack('B', fileobj), _unpack('H', fileobj))
+        _unpack('B' * 7, fileobj)
+        if cel[4] == 1:
+            return cel + (_unpack('H', fileobj),)
+        return cel + (_unpack('H', fileobj), _unpack('H', fileobj), fileobj.read())
+    if chunk_type == 0x2019:
+        _unpack('I', fileobj)
+        first = _unpack('I', fileobj)
+        last = _unpack('I', fileobj)
+        _unpack('B' * 8, fileobj)
+        size = 7 if _unpack('H', fileobj) == 1 else 6
+        return {index: struct.unpack('<BBBB', fileobj.read(size)[:4]) for index in range(first, last + 1)}
+    return None
+
+
+def parse_baseline(filename):
+    """Parse a file the way the decoder did before it unpacked by offset.
+
+    Returns the cels of every frame as (layer_index, x, y, opacity, cel_type)
+    tuples, so the result can be checked against the current parser.
+    """
+    with open(filename, 'rb') as file:
+        _unpack('I', file)
+        if _unpack('H', file) != 0xa5e0:
+            raise aseprite.ImageDecodeException("Does not appear to be a valid ASEprite file.")
+        num_frames = _unpack('H', file)
+        for fmt in ('H', 'H', 'H', 'I', 'H', 'I', 'I', 'B', 'BBB', 'H', 'B' * 94):
+            _unpack(fmt, file)
+        frames = []
+        for _ in range(num_frames):
+            frame_size = _unpack('I', file)
+            _unpack('H', file)
+            num_chunks = _unpack('H', file)
+            _unpack('H', file)
+            _unpack('B' * 6, file)
+            fileobj = io.BytesIO(file.read(frame_size - struct.calcsize('IHHH' + 'B' * 6)))
+            cels = []
+            for _ in range(num_chunks):
+                chunk_size = _unpack('I', fileobj)
+                chunk_type = _unpack('H', fileobj)
+                chunk = _parse_baseline_chunk(chunk_type, fileobj.read(chunk_size - struct.calcsize('IH')))
+                if chunk_type == 0x2005:
+                    cels.append(chunk[:5])
+            frames.append(cels)
+    return frames
+
+
+def parsed_cels(filename):
+    _, frames, _, _ = aseprite.AsepriteImageDecoder._parse_file(filename, None)
+    return [[(cel.layer_index, cel.x_pos, cel.y_pos, cel.opacity_level, cel.cel_type) for cel in frame.cels]
+            for frame in frames]
+
+
+def decode_frames(filename, backend):
+    decoder = aseprite.AsepriteImageDecoder(backend=backend)
+    animation = decoder.decode_animation(filename, None)
+    return [frame.image.get_data('RGBA', frame.image.width * 4) for frame in animation.frames]
+
+
+def time_parse(filename, repeat, parse=parsed_cels):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(filename)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_backend(filename, backend, repeat):
+    best = float('inf')
+    frames = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = decode_frames(filename, backend)
+        best = min(best, time.perf_counter() - start)
+    return best, frames
+
+
+def blend_inputs(pixels, pixel_art):
+    rng = random.Random(0)
+    backdrop = bytearray(rng.randbytes(pixels * 4))
+    src = bytearray(rng.randbytes(pixels * 4))
+    for i in range(3, len(src), 4):
+        if pixel_art:
+            src[i] = 255 if src[i] & 1 else 0
+        elif i % 20 == 3:
+            # Some fully transparent pixels, as in real sprites
+            src[i] = 0
+    return bytes(backdrop), bytes(src)
+
+
+def time_blend(backend, mode, opacity, pixel_art, size, repeat):
+    # The per-pixel Python kernels are slow, so they get a smaller sample:
+    pixels = size * size if backend == 'numpy' else min(size * size, 64 * 64)
+    backdrop, src = blend_inputs(pixels, pixel_art)
+    if backend == 'numpy':
+        backdrop = aseprite.np.frombuffer(backdrop, dtype=aseprite.np.uint8).reshape(-1, size, 4)
+        src = aseprite.np.frombuffer(src, dtype=aseprite.np.uint8).reshape(-1, size, 4)
+        blend = aseprite.Frame._blend_pixels_numpy
+    else:
+        blend = aseprite.Frame._blend_pixels
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        blend(backdrop, src, mode, opacity)
+        best = min(best, time.perf_counter() - start)
+    return pixels / best / 1e6
+
+
+def benchmark_blend_modes(backends, size, repeat):
+    cases = [("Normal (pixel art)", 'Normal', 255, True), ("Normal (50% opacity)", 'Normal', 128, False)]
+    cases += [(mode, mode, 255, False) for mode in aseprite.BLEND_MODES.values()]
+
+    header = "{:<24}".format("mode") + "".join("{:>14}".format(b + " Mpx/s") for b in backends)
+    print(header)
+    print("-" * len(header))
+    for name, mode, opacity, pixel_art in cases:
+        row = "{:<24}".format(name)
+        row += "".join("{:>14.2f}".format(time_blend(b, mode, opacity, pixel_art, size, repeat)) for b in backends)
+        print(row)
+
+
+def benchmark_files(files, expected, backends, repeat):
+    compare = len(backends) > 1
+    header = "{:<34}{:>10}{:>10}".format("file", "baseline", "parse") + "".join("{:>12}".format(b) for b in backends)
+    if compare:
+        header += "{:>10}".format("speedup")
+    print(header)
+    print("-" * len(header))
+
+    totals = dict.fromkeys(backends, 0.0)
+    parse_total = baseline_total = 0.0
+    for filename in files:
+        if parse_baseline(filename) != parsed_cels(filename):
+            print("MISMATCH: '{}' parses differently than the baseline parser".format(filename))
+        baseline_time = time_parse(filename, repeat, parse_baseline)
+        baseline_total += baseline_time
+        parse_time = time_parse(filename, repeat)
+        parse_total += parse_time
+        timings = {}
+        reference = None
+        for backend in backends:
+            timings[backend], frames = time_backend(filename, backend, repeat)
+            totals[backend] += timings[backend]
+            if reference is None:
+                reference = frames
+            elif frames != reference:
+                print("MISMATCH: '{}' decodes differently with the '{}' backend".format(filename, backend))
+            if filename in expected and frames != expected[filename]:
+                print("MISMATCH: '{}' decodes wrong with the '{}' backend".format(filename, backend))
+
+        row = "{:<34}{:>8.2f}ms{:>8.2f}ms".format(os.path.basename(filename), baseline_time * 1000, parse_time * 1000)
+        row += "".join("{:>11.3f}s".format(timings[b]) for b in backends)
+        if compare:
+            row += "{:>9.1f}x".format(timings[backends[-1]] / timings[backends[0]])
+        print(row)
+
+    print("-" * len(header))
+    row = "{:<34}{:>8.2f}ms{:>8.2f}ms".format("total", baseline_total * 1000, parse_total * 1000)
+    row += "".join("{:>11.3f}s".format(totals[b]) for b in backends)
+    if compare:
+        row += "{:>9.1f}x".format(totals[backends[-1]] / totals[backends[0]])
+    print(row)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="Files to decode (default: all shipped .aseprite sprites)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per backend, the best time is reported")
+    parser.add_argument('--backends', nargs='+', default=list(aseprite.BACKENDS), choices=aseprite.BACKENDS)
+    parser.add_argument('--blend-modes', action='store_true', help="Time each blend mode instead of decoding files")
+    parser.add_argument('--size', type=int, default=512, help="Side of the square blended with --blend-modes")
+    args = parser.parse_args()
+
+    if args.blend_modes:
+        benchmark_blend_modes(args.backends, args.size, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        expected = {}
+        files = args.files
+        if not files:
+            files = sorted(glob.glob(os.path.join(SPRITES_PATH, '*.ase')) +
+                           glob.glob(os.path.join(SPRITES_PATH, '*.aseprite')))
+            greyscale = os.path.join(tmp_dir, 'greyscale.aseprite')
+            size = 64
+            frames = write_greyscale_sprite(greyscale, size, size, 4, seed=0)
+            # The generated rows go top to bottom, decode_frames returns them bottom to top
+            row = size * 4
+            expected[greyscale] = [b''.join(frame[y * row:(y + 1) * row] for y in reversed(range(size)))
+                                   for frame in frames]
+            files.append(greyscale)
+        benchmark_files(files, expected, args.backends, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
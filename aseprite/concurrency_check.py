@@ -0,0 +1,76 @@
+"""Check that the Aseprite decoder gives the same result when files are decoded in parallel threads.
+
+Usage:
+    python aseprite/concurrency_check.py [--files N] [--rounds N] [--threads N] [--backends ...]
+
+The shipped sprites are all 32-bit RGBA, so the check first writes indexed
+color files (each with its own palette and transparent index) into a
+temporary directory. Every file, shipped sprites included, is then decoded
+many times at once from a thread pool with every backend. Each result is
+compared with the expected pixels: the palette lookup done here for the
+generated files, and a single-threaded decode for the shipped sprites.
+
+Exits with status 1 if any decode differs.
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pyglet
+
+# The decoder does not need a GL context, so the check can run headless:
+pyglet.options['shadow_window'] = False
+
+import aseprite
+from fixtures import write_indexed_sprite
+
+SPRITES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sprites')
+
+
+def decode(filename, backend):
+    animation = aseprite.AsepriteImageDecoder(backend=backend).decode_animation(filename, None)
+    # Negative pitch: rows top to bottom, as they are stored in the file
+    return [frame.image.get_data('RGBA', -frame.image.width * 4) for frame in animation.frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=16, help="Indexed color files to generate")
+    parser.add_argument('--rounds', type=int, default=4, help="Times every file is decoded")
+    parser.add_argument('--threads', type=int, default=8, help="Size of the thread pool")
+    parser.add_argument('--backends', nargs='+', default=list(aseprite.BACKENDS), choices=aseprite.BACKENDS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        expected = {}
+        for i in range(args.files):
+            filename = os.path.join(tmp_dir, 'indexed_{:02}.aseprite'.format(i))
+            expected[filename] = write_indexed_sprite(filename, 48, 40, 3, seed=i)
+        for filename in sorted(glob.glob(os.path.join(SPRITES_PATH, '*.ase')) +
+                               glob.glob(os.path.join(SPRITES_PATH, '*.aseprite'))):
+            # The large background would dominate the run time without adding anything to the check
+            if os.path.getsize(filename) < 100000:
+                expected[filename] = decode(filename, aseprite.DEFAULT_BACKEND)
+
+        jobs = [(filename, backend) for _ in range(args.rounds) for backend in args.backends
+                for filename in expected]
+        random.Random(0).shuffle(jobs)
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            results = list(executor.map(lambda job: decode(*job), jobs))
+
+    failures = 0
+    for (filename, backend), frames in zip(jobs, results):
+        if frames != expected[filename]:
+            failures += 1
+            print("MISMATCH: '{}' with the '{}' backend".format(os.path.basename(filename), backend))
+    print("{} decodes in {} threads, {} mismatches".format(len(jobs), args.threads, failures))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
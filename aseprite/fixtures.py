@@ -0,0 +1,72 @@
+"""Small .aseprite files written from scratch, for the checks and benchmarks in this directory.
+
+The shipped sprites are all 32-bit RGBA, so the other color modes of the
+decoder are only exercised through these generated files. Every writer
+returns the RGBA bytes the decoder should produce for each frame, rows top
+to bottom.
+"""
+
+import random
+import struct
+import zlib
+
+
+def _chunk(chunk_type, data):
+    return struct.pack('<IH', len(data) + 6, chunk_type) + data
+
+
+def write_indexed_sprite(filename, width, height, num_frames, seed):
+    """Write an 8-bit indexed .aseprite file and return the RGBA bytes of its frames, rows top to bottom."""
+    rng = random.Random(seed)
+    transparent_index = rng.randrange(256)
+    palette = [(rng.randrange(256), rng.randrange(256), rng.randrange(256), 255) for _ in range(256)]
+
+    layer = struct.pack('<6HB3xH', 3, 0, 0, 0, 0, 0, 255, 5) + b'Layer'
+    entries = b''.join(struct.pack('<H4B', 0, *rgba) for rgba in palette)
+    palette_chunk = struct.pack('<3I8x', 256, 0, 255) + entries
+
+    frames = []
+    expected = []
+    for frame in range(num_frames):
+        indices = bytes(rng.randrange(256) for _ in range(width * height))
+        cel = struct.pack('<HhhBH7xHH', 0, 0, 0, 255, 2, width, height) + zlib.compress(indices)
+        chunks = [_chunk(0x2005, cel)]
+        if frame == 0:
+            chunks = [_chunk(0x2004, layer), _chunk(0x2019, palette_chunk)] + chunks
+        body = b''.join(chunks)
+        frames.append(struct.pack('<IHHH6x', len(body) + 16, 0xF1FA, len(chunks), 100) + body)
+        expected.append(b''.join(bytes(4) if i == transparent_index else bytes(palette[i]) for i in indices))
+
+    data = b''.join(frames)
+    header = struct.pack('<I5HIH2IB3xH94x', 128 + len(data), 0xA5E0, num_frames, width, height, 8,
+                         1, 100, 0, 0, transparent_index, 256)
+    with open(filename, 'wb') as f:
+        f.write(header + data)
+    return expected
+
+
+def write_greyscale_sprite(filename, width, height, num_frames, seed):
+    """Write a 16-bit greyscale .aseprite file and return the RGBA bytes of its frames, rows top to bottom."""
+    rng = random.Random(seed)
+    layer = struct.pack('<6HB3xH', 3, 0, 0, 0, 0, 0, 255, 5) + b'Layer'
+
+    frames = []
+    expected = []
+    for frame in range(num_frames):
+        # (value, alpha) pairs, some of them fully transparent
+        pixels = [(rng.randrange(256), rng.choice((0, 255, rng.randrange(256)))) for _ in range(width * height)]
+        cel = struct.pack('<HhhBH7xHH', 0, 0, 0, 255, 2, width, height)
+        cel += zlib.compress(bytes(channel for pixel in pixels for channel in pixel))
+        chunks = [_chunk(0x2005, cel)]
+        if frame == 0:
+            chunks = [_chunk(0x2004, layer)] + chunks
+        body = b''.join(chunks)
+        frames.append(struct.pack('<IHHH6x', len(body) + 16, 0xF1FA, len(chunks), 100) + body)
+        expected.append(bytes(channel for value, alpha in pixels for channel in (value, value, value, alpha)))
+
+    data = b''.join(frames)
+    header = struct.pack('<I5HIH2IB3xH94x', 128 + len(data), 0xA5E0, num_frames, width, height, 16,
+                         1, 100, 0, 0, 0, 0)
+    with open(filename, 'wb') as f:
+        f.write(header + data)
+    return expected
@@ -0,0 +1,195 @@
+"""Transcode Aseprite sprites into GPU-ready, premultiplied RGBA frame sheets.
+
+Usage:
+    python aseprite/transcode.py [--jobs N] [--output DIR] [--force] [source_dir]
+
+Every .ase/.aseprite file under the source directory (default: aseprite/sprites,
+subdirectories included) is decoded in a process pool. Each file becomes one sheet: the raw RGBA
+frames stored one after another, rows bottom-to-top as OpenGL expects them,
+with the color channels premultiplied by alpha. The sheets are described by
+index.json in the output directory (default: aseprite/prebuilt):
+
+    {"version": 2,
+     "sprites": {"<source path>": {"sheet": "<sheet file>", "sha1": "<source sha1>",
+                                   "size": bytes, "mtime_ns": ns,
+                                   "width": w, "height": h,
+                                   "durations": [seconds, ...], "translucent": bool}}}
+
+Sprites are keyed by their path relative to the source directory, with "/"
+separators, so files with the same name in different directories do not
+collide. Sheets mirror that layout in the output directory. "size" and
+"mtime_ns" let the game check that a sheet is current without hashing the
+source. The sha1 is only needed when they differ (e.g. after a checkout).
+
+"translucent" tells whether any pixel is partially transparent, in which case
+the sheet has to be drawn with premultiplied blending (GL_ONE as source factor).
+
+Only files whose contents changed since the last run are transcoded again,
+unless --force is given. Sources are only hashed when their size or mtime changed.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pyglet
+
+# The decoder does not need a GL context, so the transcoder can run headless:
+pyglet.options['shadow_window'] = False
+
+import aseprite
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SPRITES_PATH = os.path.join(HERE, 'sprites')
+OUTPUT_PATH = os.path.join(HERE, 'prebuilt')
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 2
+SHEET_EXTENSION = '.rgba'
+
+
+def file_sha1(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def sprite_key(source, source_dir):
+    """Index key of a sprite: its path relative to the source directory, with "/" separators."""
+    return os.path.relpath(source, source_dir).replace(os.sep, '/')
+
+
+def is_current(entry, source):
+    """Whether an index entry still matches its source: size and mtime first, the sha1 only if they changed."""
+    stat = os.stat(source)
+    if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    return entry.get('sha1') == file_sha1(source)
+
+
+def premultiply(pixels):
+    """Return (premultiplied RGBA bytes, whether any pixel is partially transparent)."""
+    if np is not None:
+        rgba = np.frombuffer(pixels, dtype=np.uint8).reshape(-1, 4)
+        alpha = rgba[:, 3:4].astype(np.uint16)
+        translucent = bool(((alpha > 0) & (alpha < 255)).any())
+        result = np.empty_like(rgba)
+        result[:, :3] = (rgba[:, :3] * alpha + 127) // 255
+        result[:, 3:] = alpha
+        return result.tobytes(), translucent
+
+    result = bytearray(pixels)
+    translucent = False
+    for i in range(0, len(result), 4):
+        alpha = result[i + 3]
+        if alpha == 255:
+            continue
+        if alpha:
+            translucent = True
+        for c in range(i, i + 3):
+            result[c] = (result[c] * alpha + 127) // 255
+    return bytes(result), translucent
+
+
+def transcode_file(source, name, output_dir):
+    """Decode one sprite and write its sheet. Runs in a worker process."""
+    stat = os.stat(source)
+    sha1 = file_sha1(source)
+    animation = aseprite.AsepriteImageDecoder().decode_animation(source, None)
+    sheet = name + SHEET_EXTENSION
+    os.makedirs(os.path.dirname(os.path.join(output_dir, sheet)), exist_ok=True)
+
+    durations = []
+    translucent = False
+    width = height = 0
+    tmp_file = os.path.join(output_dir, sheet + '.tmp')
+    with open(tmp_file, 'wb') as f:
+        for frame in animation.frames:
+            image = frame.image
+            width, height = image.width, image.height
+            # Positive pitch: bottom-to-top rows, ready for glTexImage2D
+            pixels, frame_translucent = premultiply(image.get_data('RGBA', width * 4))
+            translucent = translucent or frame_translucent
+            f.write(pixels)
+            durations.append(frame.duration)
+    os.replace(tmp_file, os.path.join(output_dir, sheet))
+
+    return name, {'sheet': sheet, 'sha1': sha1, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                  'width': width, 'height': height, 'durations': durations, 'translucent': translucent}
+
+
+def load_index(output_dir):
+    try:
+        with open(os.path.join(output_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get('version') != INDEX_VERSION:
+        return {}
+    return index.get('sprites', {})
+
+
+def save_index(output_dir, sprites):
+    index_file = os.path.join(output_dir, INDEX_FILE)
+    with open(index_file + '.tmp', 'w') as f:
+        json.dump({'version': INDEX_VERSION, 'sprites': sprites}, f, indent=1, sort_keys=True)
+    os.replace(index_file + '.tmp', index_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', default=SPRITES_PATH, help="Directory with .ase/.aseprite files")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="Directory for the sheets and index.json")
+    parser.add_argument('--jobs', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Transcode every file, even if unchanged")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    os.makedirs(args.output, exist_ok=True)
+    sources = sorted(glob.glob(os.path.join(args.source, '**', '*.ase'), recursive=True) +
+                     glob.glob(os.path.join(args.source, '**', '*.aseprite'), recursive=True))
+    old_index = {} if args.force else load_index(args.output)
+    index = {}
+    pending = []
+    for source in sources:
+        name = sprite_key(source, args.source)
+        entry = old_index.get(name)
+        if (entry is not None and os.path.exists(os.path.join(args.output, entry['sheet'])) and
+                is_current(entry, source)):
+            # Same contents with a new mtime (checkout, copy): keep the sheet, remember the new stat
+            stat = os.stat(source)
+            index[name] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        else:
+            pending.append((source, name))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [executor.submit(transcode_file, source, name, args.output) for source, name in pending]
+            for future in futures:
+                name, entry = future.result()
+                index[name] = entry
+                print("transcoded {:<34} {:>3} frames  {}x{}{}".format(
+                    name, len(entry['durations']), entry['width'], entry['height'],
+                    "  (translucent)" if entry['translucent'] else ""))
+
+    # Sheets of sprites that no longer exist:
+    for name, entry in load_index(args.output).items():
+        if name not in index:
+            sheet_file = os.path.join(args.output, entry['sheet'])
+            if os.path.exists(sheet_file):
+                os.remove(sheet_file)
+
+    save_index(args.output, index)
+    print("{} transcoded, {} up to date, {:.2f}s".format(
+        len(pending), len(sources) - len(pending), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
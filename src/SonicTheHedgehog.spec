@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('audio.py', '.')],  # main.Audio ho načíta podľa cesty vedľa main.py
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
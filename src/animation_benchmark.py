@@ -0,0 +1,90 @@
+"""Porovná cenu jedného ticku animácií: priradenie sprite.image v každom ticku (ako to predtým robili bossovia)
+a AnimationStateMachine, ktorá animáciu mení len pri zmene stavu.
+
+Použitie:
+    python src/animation_benchmark.py [--sprites N] [--ticks N] [--flip N] [--rate N] [--files LEFT RIGHT]
+
+Každý sprite sa správa ako boss: každý tick sa nastaví animácia podľa smeru a smer sa otočí každých --flip tickov.
+Meria sa update všetkých spritov spolu s pyglet.clock.tick() (plánovanie animácií v clocku je súčasť ceny).
+Clock ide v simulovanom čase (--rate tickov za sekundu), aby sa animácie posúvali ako v hre, nie podľa toho,
+ako rýchlo benchmark beží.
+Vypíše čas na tick, počet skutočných prepnutí animácie a najvyššiu dosiahnutú snímku - pri priradení v každom
+ticku sa animácia stále vracia na snímku 0.
+
+Potrebuje OpenGL kontext (sprity v batchi, atlas). Na serveri bez displeja: PYGLET_HEADLESS=1 (EGL).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pyglet
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, '..')]
+
+import main
+
+
+def run(variant, animations, sprites, ticks, flip, rate):
+    clock = pyglet.clock.get_default()
+    real_time = clock.time
+    sim_time = [real_time()]
+    clock.time = lambda: sim_time[0]
+    batch = pyglet.graphics.Batch()
+    entities = []
+    for i in range(sprites):
+        sprite = pyglet.sprite.Sprite(animations['right'], x=i * 10, y=0, batch=batch)
+        entities.append((sprite, main.AnimationStateMachine(sprite, animations, 'right')))
+    highest_frame = 0
+    start = time.perf_counter()
+    for tick in range(ticks):
+        direction = 'left' if (tick // flip) % 2 == 0 else 'right'
+        if variant == 'assign':
+            for sprite, _ in entities:
+                sprite.image = animations[direction]
+        else:
+            for _, animator in entities:
+                animator.set(direction)
+        sim_time[0] += 1.0 / rate
+        pyglet.clock.tick()
+        highest_frame = max(highest_frame, entities[0][0].frame_index)
+    elapsed = time.perf_counter() - start
+    clock.time = real_time
+    switches = ticks * sprites if variant == 'assign' else sum(animator.switches for _, animator in entities)
+    for sprite, _ in entities:
+        sprite.delete()
+    return elapsed, switches, highest_frame
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sprites', type=int, default=50, help="počet animovaných spritov (bossov)")
+    parser.add_argument('--ticks', type=int, default=2000, help="počet tickov")
+    parser.add_argument('--flip', type=int, default=240, help="po koľkých tickoch sa otočí smer (120 = 1 s pri 120 Hz)")
+    parser.add_argument('--rate', type=int, default=main.Game.SIM_RATE, help="tickov za sekundu simulovaného času")
+    parser.add_argument('--files', nargs=2, metavar=('LEFT', 'RIGHT'), default=['eggman_left.gif', 'eggman_right.gif'],
+                        help="animácie pre oba smery (v aseprite/sprites)")
+    args = parser.parse_args()
+
+    animations = {direction: main.ResourceManager.get_animation(os.path.join(main.PlayerSprite.SPRITES_PATH, name),
+                                                                atlas=True)
+                  for direction, name in zip(('left', 'right'), args.files)}
+
+    print(f"{args.sprites} sprites, {args.ticks} ticks, direction flips every {args.flip} ticks")
+    header = "{:<16}{:>14}{:>16}{:>12}{:>14}".format("variant", "us / tick", "us / sprite", "switches", "max frame")
+    print(header)
+    print("-" * len(header))
+    results = {}
+    for variant in ('assign', 'state machine'):
+        elapsed, switches, highest_frame = run(variant, animations, args.sprites, args.ticks, args.flip, args.rate)
+        results[variant] = elapsed
+        per_tick = elapsed / args.ticks * 1e6
+        print("{:<16}{:>14.1f}{:>16.2f}{:>12}{:>14}".format(variant, per_tick, per_tick / args.sprites,
+                                                          switches, highest_frame))
+    print(f"speedup: {results['assign'] / results['state machine']:.1f}x")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,98 @@
+"""Prehrávanie zvuku nad pyglet.media: hudba s dekódovaným začiatkom (BufferedStream) a hlasy pre efekty (Voice).
+
+Hra (main.Audio) tento modul importuje až v etape štartu po prvej snímke - import pyglet.media vytvorí audio driver
+a načíta knižnice kodekov, čo trvá desiatky až stovky ms a menu to nepotrebuje.
+"""
+
+import ctypes
+
+from pyglet import media
+from pyglet.media.codecs.base import AudioData
+
+
+class BufferedStream(media.StreamingSource):
+    """Stream (hudba), ktorého začiatok sa dekóduje dopredu pri načítaní - play() potom nečaká na dekóder."""
+    PREBUFFER = 2.0  # sekundy hudby dekódované dopredu pri načítaní
+    CHUNK = 16384
+
+    def __init__(self, source, seconds=PREBUFFER):
+        self.source = source.get_queue_source()
+        self.audio_format = self.source.audio_format
+        self.info = self.source.info
+        self._duration = self.source.duration
+        self.head = []  # dekódovaný začiatok streamu (bytes po kúskoch, ako ich dal dekóder)
+        head_bytes = 0
+        while head_bytes < seconds * self.audio_format.bytes_per_second:
+            audio_data = self.source.get_audio_data(self.CHUNK)
+            if audio_data is None:
+                break
+            self.head.append(ctypes.string_at(audio_data.pointer, audio_data.length))
+            head_bytes += audio_data.length
+        self.head_duration = head_bytes / self.audio_format.bytes_per_second
+        self.position = 0  # index do head, None = číta sa priamo zo streamu
+        self.seek_after_head = False
+
+    def get_audio_data(self, num_bytes, compensation_time=0.0):
+        if self.position is not None:
+            if self.position < len(self.head):
+                data = self.head[self.position]
+                self.position += 1
+                return AudioData(data, len(data))
+            self.position = None
+            # Po slučke (seek na 0) je stream ešte na mieste, kde sa skončila predošlá skladba
+            if self.seek_after_head:
+                self.source.seek(self.head_duration)
+                self.seek_after_head = False
+        return self.source.get_audio_data(num_bytes, compensation_time)
+
+    def seek(self, timestamp):
+        # Slučka hudby (Player.loop) začína znova z dekódovaného začiatku, dekóder sa presunie až za neho
+        if timestamp == 0 and self.head:
+            self.position = 0
+            self.seek_after_head = True
+        else:
+            self.position = None
+            self.source.seek(timestamp)
+
+    def delete(self):
+        self.source.delete()
+
+
+class Voice(media.Player):
+    """Player pre krátke efekty, ktorý sa používa opakovane."""
+
+    def __init__(self):
+        super().__init__()
+        self.busy = False
+
+    def on_eos(self):
+        # Player.on_eos by prešiel na ďalší zdroj a zmazal prehrávač v audio driveri -> hlas si ho nechá pre ďalší zvuk
+        self.pause()
+        self.busy = False
+
+    def play_sound(self, sound, volume=1.0):
+        self.volume = volume
+        finished = self.source
+        self.queue(sound)
+        if finished is not None:
+            # Dohraný zvuk sa vymení za nový, pri rovnakom formáte ostáva ten istý prehrávač v driveri
+            self.next_source()
+        self.busy = True
+        self.play()
+
+
+def decode_sound(file_path):
+    """Celý efekt dekódovaný do pamäte (StaticSource)."""
+    return media.StaticSource(media.load(file_path, streaming=False))
+
+
+def open_music(file_path):
+    """Otvorí hudbu a dekóduje jej začiatok."""
+    return BufferedStream(media.load(file_path, streaming=True))
+
+
+def create_music_player(stream):
+    player = media.Player()
+    player.queue(stream)
+    player.loop = True
+    return player
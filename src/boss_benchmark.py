@@ -0,0 +1,76 @@
+"""Stres test bossov: koľko ms stojí krok simulácie, keď naraz bojuje 1 až 500 bossov.
+
+Použitie:
+    python src/boss_benchmark.py [--counts N ...] [--ticks N] [--budget N] [--seed N]
+
+Beží bez okna a grafiky (ako main.py --headless). Bossovia (postupne všetky typy z resources/bosses.json) sa spawnú
+rovnomerne po celej dráhe bossov (x 1000–3200), takže sú všetci v dosahu hráča. Hráč stojí na štarte a prstienky mu
+neubúdajú, súboj teda neskončí. Pre každý počet bossov sa meria celý krok simulácie (GameWorld.simulate) raz bez
+limitu a raz s budgetom BossManagera (najviac --budget aktualizácií bossov za tick): priemer a p99 v ms a priemerný
+počet bossov aktualizovaných za tick.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import pyglet
+
+# Bez okna a OpenGL kontextu, ako main.py --headless (musí sa nastaviť skôr, ako main importuje pyglet.gl)
+pyglet.options['shadow_window'] = False
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, '..')]
+
+import main
+
+main.HEADLESS = True
+
+
+def run(count, ticks, budget, seed):
+    sim = main.HeadlessSimulation(seed=seed)
+    sim.player_rings = 10 ** 9
+    manager = sim.boss_manager
+    manager.budget = budget
+    behaviours = list(manager.behaviours.values())
+    for i in range(count):
+        manager.spawn(behaviours[i % len(behaviours)], 1000 + 2200 * i / max(count - 1, 1))
+    times = []
+    updated = 0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        sim.simulate(sim.step_dt)
+        times.append(time.perf_counter() - start)
+        sim.update_damage_texts(sim.step_dt)
+        updated += manager.updated
+    times.sort()
+    return sum(times) / ticks * 1e3, times[int(ticks * 0.99)] * 1e3, updated / ticks
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 10, 25, 50, 100, 200, 300, 500],
+                        help="počty bossov")
+    parser.add_argument('--ticks', type=int, default=600, help="počet krokov simulácie pre každý počet (600 = 5 s)")
+    parser.add_argument('--budget', type=int, default=main.BossManager.UPDATE_BUDGET,
+                        help="najviac aktualizácií bossov za tick")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.ticks} ticks per run, budget {args.budget} boss updates per tick")
+    header = "{:>8}{:>16}{:>14}{:>16}{:>14}{:>16}".format(
+        "bosses", "no limit ms", "p99 ms", "budget ms", "p99 ms", "updates/tick")
+    print(header)
+    print("-" * len(header))
+    # Výpisy z hry (zásahy bossov...) by meranie len spomaľovali
+    for count in args.counts:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            unlimited = run(count, args.ticks, None, args.seed)
+            budgeted = run(count, args.ticks, args.budget, args.seed)
+        print("{:>8}{:>16.3f}{:>14.3f}{:>16.3f}{:>14.3f}{:>16.1f}".format(count, *unlimited[:2], *budgeted))
+
+
+if __name__ == "__main__":
+    main_benchmark()
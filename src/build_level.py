@@ -0,0 +1,122 @@
+"""Vytvorí level (tilemapu rozdelenú na chunky) z obrázka podlahy.
+
+Použitie:
+    python src/build_level.py [--repeat N] [--waves FILE] [--output FILE]
+
+Level je JSON Lines súbor - hra si pri otvorení zapamätá len offsety riadkov a chunky číta zo súboru,
+až keď sa k nim kamera priblíži, takže pamäť nerastie s dĺžkou levelu. Prvý riadok je hlavička:
+
+    {"version": 1, "tileset": "ground.png", "tile_size": 64, "chunk_width": 16, "rows": 9,
+     "origin_y": -114, "chunks": N, "player_start": [x, y], "bounds": [min_x, max_x],
+     "background": "sunsethill_animated.gif"}
+
+Každý ďalší riadok je jeden chunk (chunk_width stĺpcov dlaždíc, zľava doprava):
+
+    {"tiles": [[id, ...], ...],              riadky zhora nadol, -1 = prázdna dlaždica
+     "rings": [[x, y], ...],                 prstienky (súradnice vo svete) v tomto chunku
+     "triggers": [{"x": x, "type": "boss", "bosses": ["Eggman", ...]}]}
+
+Trigger "waves" namiesto jedného bossa spustí vlny nepriateľov (ďalšia príde, keď je predošlá porazená a uplynie delay):
+
+    {"x": x, "type": "waves", "waves": [{"delay": 2.0, "enemies": [{"boss": "Eggman", "count": 4, "x": [x1, x2]}]}, ...]}
+
+Id dlaždice je index celej dlaždice v tilesete (obrázok z aseprite/sprites), po riadkoch zhora.
+origin_y je y spodného riadku dlaždíc vo svete. Predvolený level je pôvodná scéna: podlaha ground.png na y=-120, 6 prstienkov a boss od x=1300.
+S --repeat N sa podlaha, prstienky aj hranice levelu zopakujú N-krát (dlhé levely na testovanie streamovania).
+S --waves FILE (JSON so zoznamom vĺn, napr. resources/waves/swarm.json) je na x=1300 trigger vĺn namiesto bossa.
+"""
+
+import argparse
+import json
+import os
+
+import pyglet
+
+# Obrázok sa len číta, OpenGL netreba:
+pyglet.options['shadow_window'] = False
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SPRITES_PATH = os.path.abspath(os.path.join(HERE, '../aseprite/sprites'))
+LEVELS_PATH = os.path.abspath(os.path.join(HERE, '../resources/levels'))
+
+TILESET = 'ground.png'
+TILE_SIZE = 64
+CHUNK_WIDTH = 16
+GROUND_Y = -120  # kde bol celý obrázok podlahy (sprite Ground) v pôvodnej scéne
+BOSSES = ["Eggman", "Eggdrill", "MetalSonic"]
+
+
+def tileset_tiles(file_path, tile_size):
+    """Vráti (stĺpce, riadky, množina prázdnych id, výška obrázka) pre celé dlaždice obrázka."""
+    image = pyglet.image.load(file_path).get_image_data()
+    pitch = image.width * 4
+    data = image.get_data('RGBA', -pitch)  # riadky zhora nadol, ako id dlaždíc
+    columns, rows = image.width // tile_size, image.height // tile_size
+    empty = set()
+    for row in range(rows):
+        for column in range(columns):
+            alpha = (data[(row * tile_size + y) * pitch + column * tile_size * 4 + 3:
+                          (row * tile_size + y) * pitch + (column + 1) * tile_size * 4:4]
+                     for y in range(tile_size))
+            if not any(any(line) for line in alpha):
+                empty.add(row * columns + column)
+    return columns, rows, empty, image.height
+
+
+def build_level(repeat, waves=None):
+    columns, rows, empty, height = tileset_tiles(os.path.join(SPRITES_PATH, TILESET), TILE_SIZE)
+    # Dlaždice sa berú od horného okraja, spodok obrázka (zvyšok pod posledným celým riadkom) sa oreže.
+    # origin_y je spodok mriežky - horné riadky sú potom presne tam, kde boli v pôvodnom obrázku
+    segment = columns * TILE_SIZE  # šírka jedného zopakovania podlahy v pixeloch
+    width_tiles = columns * repeat
+    chunk_count = -(-width_tiles // CHUNK_WIDTH)
+    chunks = [{'tiles': [[-1] * CHUNK_WIDTH for _ in range(rows)], 'rings': [], 'triggers': []}
+              for _ in range(chunk_count)]
+    for x in range(width_tiles):
+        chunk = chunks[x // CHUNK_WIDTH]
+        for row in range(rows):
+            tile = row * columns + x % columns
+            chunk['tiles'][row][x % CHUNK_WIDTH] = -1 if tile in empty else tile
+
+    def chunk_at(world_x):
+        return chunks[min(int(world_x // (CHUNK_WIDTH * TILE_SIZE)), chunk_count - 1)]
+
+    for i in range(repeat):
+        # Dva rady po 3 prstienkoch nad zemou (ground_y 280), ako boli v RingsManageri
+        for ring_y in (330, 420):
+            for ring_x in (1600, 1690, 1780):
+                chunk_at(i * segment + ring_x)['rings'].append([i * segment + ring_x, ring_y])
+    if waves is not None:
+        chunk_at(1300)['triggers'].append({'x': 1300, 'type': 'waves', 'waves': waves})
+    else:
+        chunk_at(1300)['triggers'].append({'x': 1300, 'type': 'boss', 'bosses': BOSSES})
+
+    header = {'version': 1, 'tileset': TILESET, 'tile_size': TILE_SIZE, 'chunk_width': CHUNK_WIDTH, 'rows': rows,
+              'origin_y': GROUND_Y + height - rows * TILE_SIZE, 'chunks': chunk_count, 'player_start': [1100, 300],
+              'bounds': [1000, (repeat - 1) * segment + 3400], 'background': 'sunsethill_animated.gif'}
+    return header, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=1, help="koľkokrát sa zopakuje podlaha (dĺžka levelu)")
+    parser.add_argument('--waves', metavar='FILE', help="vlny nepriateľov (JSON) namiesto jedného bossa")
+    parser.add_argument('--output', default=os.path.join(LEVELS_PATH, 'sunset_hill.jsonl'))
+    args = parser.parse_args()
+
+    waves = None
+    if args.waves:
+        with open(args.waves) as f:
+            waves = json.load(f)
+    header, chunks = build_level(args.repeat, waves)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        f.write(json.dumps(header) + '\n')
+        for chunk in chunks:
+            f.write(json.dumps(chunk, separators=(',', ':')) + '\n')
+    print(f"Level saved: {args.output} ({header['chunks']} chunks, "
+          f"{header['chunks'] * header['chunk_width'] * header['tile_size']} px)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Vytvorí zvukové efekty hry (krátke WAV súbory) syntézou - bez externých nástrojov a knižníc.
+
+Použitie:
+    python src/build_sounds.py [--output DIR]
+
+Všetky efekty majú rovnaký formát (mono, 16 bit, 22050 Hz). Audio v hre ich dekóduje celé do pamäte pri načítaní
+a prehráva na pár opakovane použitých hlasoch (pyglet Player) - pri rovnakom formáte hlas pri ďalšom zvuku len
+vymení dáta a nevytvára nový prehrávač v audio driveri.
+
+    ring.wav        zobranie prstienka (dva tóny nahor)
+    hurt.wav        zásah hráča (klesajúci štvorcový tón)
+    boss_hit.wav    zásah bossa (krátky úder so šumom)
+    explosion.wav   výbuch porazeného bossa (doznievajúci šum)
+
+Šum má pevný seed, takže opakované spustenie vytvorí rovnaké súbory.
+"""
+
+import argparse
+import math
+import os
+import random
+import struct
+import wave
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOUNDS_PATH = os.path.abspath(os.path.join(HERE, '../resources/sounds'))
+
+SAMPLE_RATE = 22050
+VOLUME = 0.5
+
+
+def envelope(t, duration, attack=0.005):
+    """Rýchly nábeh a lineárne doznenie do konca zvuku."""
+    if t < attack:
+        return t / attack
+    return max(0.0, 1.0 - (t - attack) / (duration - attack))
+
+
+def ring(duration=0.3):
+    samples = []
+    for i in range(int(duration * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        frequency = 1319.0 if t < 0.07 else 1760.0  # E6 -> A6
+        samples.append(math.sin(2 * math.pi * frequency * t) * envelope(t, duration))
+    return samples
+
+
+def hurt(duration=0.25):
+    samples = []
+    phase = 0.0
+    for i in range(int(duration * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        phase += (440.0 - 300.0 * t / duration) / SAMPLE_RATE
+        samples.append((1.0 if phase % 1.0 < 0.5 else -1.0) * 0.6 * envelope(t, duration))
+    return samples
+
+
+def boss_hit(duration=0.2, rng=None):
+    rng = rng or random.Random(1)
+    samples = []
+    for i in range(int(duration * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        tone = math.sin(2 * math.pi * (180.0 - 100.0 * t / duration) * t)
+        samples.append((0.7 * tone + 0.3 * rng.uniform(-1, 1)) * envelope(t, duration))
+    return samples
+
+
+def explosion(duration=0.8, rng=None):
+    rng = rng or random.Random(2)
+    samples = []
+    low = 0.0
+    for i in range(int(duration * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        # Jednoduchý low-pass (kĺzavý priemer) - šum s časom tmavne
+        smoothing = 0.3 - 0.25 * t / duration
+        low += (rng.uniform(-1, 1) - low) * smoothing
+        samples.append(low * 2.5 * envelope(t, duration, attack=0.01) ** 2)
+    return samples
+
+
+SOUNDS = {'ring': ring, 'hurt': hurt, 'boss_hit': boss_hit, 'explosion': explosion}
+
+
+def write_wav(file_path, samples):
+    frames = b''.join(struct.pack('<h', int(max(-1.0, min(1.0, s * VOLUME)) * 32767)) for s in samples)
+    with wave.open(file_path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=SOUNDS_PATH, help="priečinok pre WAV súbory")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for name, generate in SOUNDS.items():
+        file_path = os.path.join(args.output, name + '.wav')
+        samples = generate()
+        write_wav(file_path, samples)
+        print(f"{name}.wav: {len(samples) / SAMPLE_RATE:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,1524 @@
+import time
+STARTED = time.perf_counter()  # od tohto okamihu meria --startup-trace (pozri Startup)
 import os
+import sys
 import random
+import array
+import collections
+import contextlib
+import ctypes
+import hashlib
+import heapq
+import importlib
+import importlib.util
+import itertools
+import json
+import mmap
+import struct
+import threading
 import pyglet
+
+# --headless: simulácia bez okna a OpenGL kontextu. Musí sa nastaviť skôr, ako sa importuje pyglet.gl
+HEADLESS = '--headless' in sys.argv
+if HEADLESS:
+    pyglet.options['shadow_window'] = False
 from pyglet.window import key
-import aseprite.aseprite as aseprite # toto nie je moja trieda, ale ukradnutá z internetu -> dovoluje mi dekódovať a spracovať .aseprite súbory priamo do Animation, AnimationFrame a ImageData -> SUPER VEC
 from pyglet import math  # Pre prácu s maticami
 from pyglet.gl import *  # Pre prípadné použitie OpenGL -> kamera follow a vykreslovanie relatívne od polôh (matice)
-from pyglet import media
+from pyglet.graphics import vertexdomain
+
+# === Lazy Imports === - moduly, ktoré menu (prvá snímka) nepotrebuje, sa importujú až pri prvom použití:
+# aseprite dekóder (aj s numpy) až keď sa dekóduje .aseprite bez predkonvertovaného sheetu, audio (pyglet.media
+# vytvára audio driver) až po prvej snímke, numpy v EntityStore až pri veľa entitách, concurrent.futures (ťahá
+# logging, ~10 ms) až pre preloader a streamovanie. Importy hore ostávajú: pyglet.gl a pyglet.graphics aj tak
+# importuje pyglet.window (okno je pred prvou snímkou), hashlib a json potrebuje už menu (cache snímok, index sheetov).
+_lazy_modules = {}
+_lazy_lock = threading.Lock()
+
+def lazy_import(name, setup=None, optional=False, path=None):
+    """Importuje modul pri prvom volaní (aj z vlákien preloadera), setup(modul) sa zavolá raz hneď po importe.
+    S optional=True vráti None, ak modul nie je nainštalovaný. S path sa modul načíta priamo z tohto súboru (pod menom
+    name), nie hľadaním na sys.path - modul hry tak nezamení iný s rovnakým menom."""
+    module = _lazy_modules.get(name)
+    if module is not None or name in _lazy_modules:
+        return module
+    with _lazy_lock:
+        if name not in _lazy_modules:
+            start = time.perf_counter()
+            try:
+                if path is None:
+                    module = importlib.import_module(name)
+                else:
+                    spec = importlib.util.spec_from_file_location(name, path)
+                    module = importlib.util.module_from_spec(spec)
+                    sys.modules[name] = module
+                    try:
+                        spec.loader.exec_module(module)
+                    except BaseException:
+                        # Polovične inicializovaný modul nenecháme v sys.modules, ďalší import by dostal jeho
+                        sys.modules.pop(name, None)
+                        raise
+            except ImportError:
+                if not optional:
+                    raise
+                module = None
+            if module is not None and setup is not None:
+                setup(module)
+            _lazy_modules[name] = module
+            Startup.record('import ' + name, start, time.perf_counter())
+    return _lazy_modules[name]
+
+# === Disk Frame Cache === - dekódované RGBA snímky ukladáme na disk, aby ďalšie spustenie nemuselo znova dekódovať .aseprite/.gif
+# Formát súboru: hlavička (magic, verzia, mtime, veľkosť, počet snímok), cesta k zdroju, tabuľka snímok
+# (šírka, výška, trvanie, offset) a za ňou surové RGBA dáta zarovnané na 16 bajtov.
+class DiskFrameCache:
+    CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../.cache/frames'))
+    MAGIC = b'SFRC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHqqI')   # magic, verzia, dĺžka cesty, mtime_ns, veľkosť, počet snímok
+    FRAME = struct.Struct('<IIdQ')       # šírka, výška, trvanie (s), offset dát
+    ALIGN = 16
+    enabled = True
+
+    @staticmethod
+    def _cache_file(file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf8')).hexdigest()
+        return os.path.join(DiskFrameCache.CACHE_PATH, key + '.frames')
+
+    @staticmethod
+    def load(file_path):
+        """Vráti Animation z cache, alebo None ak cache chýba alebo je zastaraná."""
+        if not DiskFrameCache.enabled:
+            return None
+        cache_file = DiskFrameCache._cache_file(file_path)
+        if not os.path.exists(cache_file):
+            return None
+        stat = os.stat(file_path)
+        try:
+            with open(cache_file, 'rb') as f:
+                # ACCESS_COPY -> buffer je zapisovateľný (ctypes.from_buffer), ale súbor na disku sa nikdy nemení
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            magic, version, path_len, mtime_ns, size, num_frames = DiskFrameCache.HEADER.unpack_from(data, 0)
+            offset = DiskFrameCache.HEADER.size
+            cached_path = bytes(data[offset:offset + path_len]).decode('utf8')
+            offset += path_len
+            if (magic != DiskFrameCache.MAGIC or version != DiskFrameCache.VERSION or
+                    cached_path != os.path.abspath(file_path) or
+                    mtime_ns != stat.st_mtime_ns or size != stat.st_size):
+                data.close()
+                return None
+            frames = []
+            for _ in range(num_frames):
+                width, height, duration, data_offset = DiskFrameCache.FRAME.unpack_from(data, offset)
+                offset += DiskFrameCache.FRAME.size
+                # Pixely sa nekopírujú - ImageData ukazuje priamo do namapovaného súboru
+                pixels = (ctypes.c_ubyte * (width * height * 4)).from_buffer(data, data_offset)
+                image = pyglet.image.ImageData(width, height, 'RGBA', pixels, width * 4)
+                frames.append(pyglet.image.AnimationFrame(image, None if duration != duration else duration))
+            return pyglet.image.Animation(frames)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Frame cache unreadable, ignoring '{cache_file}': {e}")
+            return None
+
+    @staticmethod
+    def store(file_path, frames, count=None):
+        """Zapíše snímky do cache a vráti True, ak sa podarilo. frames môže byť aj generátor s count snímkami -
+        každá sa zapíše hneď po dekódovaní, takže celá animácia nie je v RAM naraz (pozadie 1920x1920 má stovky MB)."""
+        if not DiskFrameCache.enabled:
+            return False
+        if count is None:
+            frames = list(frames)
+            count = len(frames)
+        cache_file = DiskFrameCache._cache_file(file_path)
+        stat = os.stat(file_path)
+        path_bytes = os.path.abspath(file_path).encode('utf8')
+        table_size = DiskFrameCache.HEADER.size + len(path_bytes) + DiskFrameCache.FRAME.size * count
+        offset = -(-table_size // DiskFrameCache.ALIGN) * DiskFrameCache.ALIGN
+        table = []
+        # Najprv do dočasného súboru, aby pád hry nenechal polovičnú cache
+        tmp_file = cache_file + '.tmp'
+        try:
+            os.makedirs(DiskFrameCache.CACHE_PATH, exist_ok=True)
+            with open(tmp_file, 'wb') as f:
+                f.seek(offset)  # hlavička a tabuľka sa zapíšu až na konci, keď sú známe rozmery snímok
+                for frame in itertools.islice(frames, count):
+                    image = frame.image.get_image_data()
+                    # Kladný pitch -> pri uploade do GPU netreba prehadzovať riadky
+                    pixels = image.get_data('RGBA', image.width * 4)
+                    # None (posledná snímka bez opakovania) ukladáme ako NaN
+                    duration = frame.duration if frame.duration is not None else float('nan')
+                    table.append(DiskFrameCache.FRAME.pack(image.width, image.height, duration, offset))
+                    padding = bytes(-len(pixels) % DiskFrameCache.ALIGN)
+                    f.write(pixels)
+                    f.write(padding)
+                    offset += len(pixels) + len(padding)
+                f.seek(0)
+                f.write(DiskFrameCache.HEADER.pack(DiskFrameCache.MAGIC, DiskFrameCache.VERSION, len(path_bytes),
+                                                   stat.st_mtime_ns, stat.st_size, len(table)))
+                f.write(path_bytes)
+                f.writelines(table)
+            os.replace(tmp_file, cache_file)
+            return True
+        except OSError as e:
+            print(f"Could not write frame cache '{cache_file}': {e}")
+            return False
+        finally:
+            # Chyba dekódovania uprostred zápisu sa pošle ďalej, polovičný súbor nenecháme
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+# === Prebuilt Sheets === - .aseprite súbory predkonvertované nástrojom aseprite/transcode.py (premultiplied RGBA + index.json).
+# Ak sheet existuje a zodpovedá zdroju, hra ho len namapuje z disku a .aseprite sa vôbec nedekóduje.
+class PrebuiltSheets:
+    PREBUILT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/prebuilt'))
+    SPRITES_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites'))
+    INDEX_VERSION = 2
+    enabled = True
+    _index = None
+
+    @staticmethod
+    def _entry(file_path):
+        if not PrebuiltSheets.enabled:
+            return None
+        if PrebuiltSheets._index is None:
+            try:
+                with open(os.path.join(PrebuiltSheets.PREBUILT_PATH, 'index.json')) as f:
+                    index = json.load(f)
+                PrebuiltSheets._index = index['sprites'] if index.get('version') == PrebuiltSheets.INDEX_VERSION else {}
+            except (OSError, ValueError, KeyError):
+                PrebuiltSheets._index = {}
+        # Kľúč je cesta vzhľadom na priečinok spritov (ako v aseprite/transcode.py), nie len meno súboru
+        key = os.path.relpath(os.path.abspath(file_path), PrebuiltSheets.SPRITES_PATH).replace(os.sep, '/')
+        return PrebuiltSheets._index.get(key)
+
+    @staticmethod
+    def has(file_path):
+        return PrebuiltSheets._entry(file_path) is not None
 
-# Zaregistrujeme Aseprite dekóder:
-pyglet.image.codecs.add_decoders(aseprite)
+    @staticmethod
+    def load(file_path):
+        """Vráti Animation zo sheetu, alebo None ak sheet chýba alebo je zastaraný (zdroj sa odvtedy zmenil)."""
+        entry = PrebuiltSheets._entry(file_path)
+        if entry is None:
+            return None
+        # Hráč .aseprite mať nemusí, ale keď ho má (vývoj), overíme, že sheet je z aktuálnej verzie. Stačí veľkosť
+        # a mtime, celý súbor sa hashuje, len keď nesedia (napr. po checkoute)
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            if stat.st_size != entry.get('size') or stat.st_mtime_ns != entry.get('mtime_ns'):
+                with open(file_path, 'rb') as f:
+                    if hashlib.sha1(f.read()).hexdigest() != entry['sha1']:
+                        return None
+        sheet_file = os.path.join(PrebuiltSheets.PREBUILT_PATH, entry['sheet'])
+        width, height = entry['width'], entry['height']
+        frame_size = width * height * 4
+        try:
+            with open(sheet_file, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            if len(data) != frame_size * len(entry['durations']):
+                data.close()
+                return None
+        except (OSError, ValueError) as e:
+            print(f"Prebuilt sheet unreadable, ignoring '{sheet_file}': {e}")
+            return None
+        frames = []
+        for i, duration in enumerate(entry['durations']):
+            # Rovnako ako DiskFrameCache - ImageData ukazuje priamo do namapovaného súboru
+            pixels = (ctypes.c_ubyte * frame_size).from_buffer(data, i * frame_size)
+            image = pyglet.image.ImageData(width, height, 'RGBA', pixels, width * 4)
+            frames.append(pyglet.image.AnimationFrame(image, duration))
+        anim = pyglet.image.Animation(frames)
+        # Pri úplne nepriehľadných/priehľadných pixeloch je premultiplied to isté ako bežné alpha,
+        # iné blendovanie treba len keď má sheet polopriehľadné pixely
+        anim.premultiplied_alpha = entry['translucent']
+        return anim
+
+# === Streaming Animation === - veľké animované pozadia sa nedekódujú celé naraz. V GPU je len pár textúr (ring buffer),
+# snímky sa dekódujú až keď treba a tá nasledujúca sa pripravuje vo vlákne dopredu.
+class AnimationFrameSource:
+    """Zdroj snímok z hotovej Animation (napr. z DiskFrameCache, kde sú dáta len namapované zo súboru)."""
+    def __init__(self, anim):
+        self.frames = anim.frames
+        self.width = max(frame.image.width for frame in self.frames)
+        self.height = max(frame.image.height for frame in self.frames)
+        self.durations = [frame.duration for frame in self.frames]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get_frame(self, index):
+        return self.frames[index].image.get_image_data()
+
+class StreamingAnimation:
+    def __init__(self, source, resident_frames=3, prefetch=1):
+        self.source = source
+        self.durations = source.durations
+        self.prefetch_count = min(prefetch, len(source) - 1)
+        # Aspoň jedna textúra pre aktuálnu snímku + jedna pre každú prefetchnutú
+        count = min(max(resident_frames, self.prefetch_count + 1), len(source))
+        self.slots = [pyglet.image.Texture.create(source.width, source.height, mag_filter=GL_NEAREST)
+                      for _ in range(count)]
+        self.slot_frames = [None] * count
+        self.slot_loaded = [0] * count  # poradie nahratia - najstarší slot sa prepíše ako prvý
+        self.uploads = 0
+        self.executor = lazy_import('concurrent.futures').ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+        self.pending = {}
+        self.frame = 0
+        self.time = 0.0
+        self.texture = self.get_texture(0)
+        self.prefetch()
+
+    def _window(self):
+        return {(self.frame + i) % len(self.durations) for i in range(self.prefetch_count + 1)}
+
+    def _upload(self, index, image):
+        window = self._window()
+        free = [i for i, frame in enumerate(self.slot_frames) if frame is None or frame not in window]
+        slot = min(free or range(len(self.slots)), key=lambda i: self.slot_loaded[i])
+        self.slots[slot].blit_into(image, 0, 0, 0)
+        self.slot_frames[slot] = index
+        self.uploads += 1
+        self.slot_loaded[slot] = self.uploads
+        return self.slots[slot]
+
+    def get_texture(self, index):
+        if index in self.slot_frames:
+            return self.slots[self.slot_frames.index(index)]
+        future = self.pending.pop(index, None)
+        image = future.result() if future else self.source.get_frame(index)
+        return self._upload(index, image)
+
+    def prefetch(self):
+        for index in self._window():
+            if index not in self.slot_frames and index not in self.pending:
+                self.pending[index] = self.executor.submit(self.source.get_frame, index)
+
+    def poll(self):
+        """Nahrá do voľných slotov snímky, ktoré vlákno už stihlo dekódovať."""
+        for index, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[index]
+                self._upload(index, future.result())
+
+    def update(self, dt):
+        """Posunie prehrávanie o dt. Vráti True, ak sa zmenila aktuálna textúra."""
+        self.poll()
+        duration = self.durations[self.frame]
+        if duration is None:  # posledná snímka bez opakovania
+            return False
+        self.time += dt
+        changed = False
+        while self.time >= duration:
+            self.time -= duration
+            self.frame = (self.frame + 1) % len(self.durations)
+            changed = True
+            duration = self.durations[self.frame]
+            if duration is None:
+                break
+            duration = max(duration, 0.001)
+        if changed:
+            self.texture = self.get_texture(self.frame)
+            self.prefetch()
+        return changed
 
 # === Resource Manager === - Našiel som na geekforgeek a stackoverflow, že je dobré použiť kvôli výkonu. Načíta si všetky súbory do cache, aby ich vedel rýchlejšie potom vytahovať, lebo sú už skompilované!!!
 class ResourceManager:
     _cache = {}
+    # Animácie z foreground_batch sa balia do spoločných textúr (atlas), aby sa batch nemusel
+    # prepínať medzi textúrami pri každom sprite -> menej draw callov
+    ATLAS_SIZE = 4096
+    use_atlas = True
+    _atlas = None
+    _images = {}
+    # Streamované animácie (pozadie) - v GPU je naraz len STREAM_RESIDENT_FRAMES snímok
+    STREAM_RESIDENT_FRAMES = 3
+    _streams = {}
+    # Predrenderované texty (damage čísla) - layout a glyfy sa spravia raz, potom je to obyčajný obrázok
+    _texts = {}
+    # Dlaždice levelov - (súbor, veľkosť dlaždice) -> región v atlase pre každé id dlaždice (None = prázdna)
+    _tilesets = {}
+
+    @staticmethod
+    def _add_to_atlas(image):
+        if ResourceManager._atlas is None:
+            ResourceManager._atlas = pyglet.image.atlas.TextureBin(ResourceManager.ATLAS_SIZE,
+                                                                   ResourceManager.ATLAS_SIZE)
+        atlas = ResourceManager._atlas
+        # border=1, aby sa susedné snímky v atlase neprelievali do seba
+        region = atlas.add(image.get_image_data(), border=1)
+        glBindTexture(region.owner.target, region.owner.id)
+        glTexParameteri(region.owner.target, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        return region
+
     @staticmethod
-    def get_animation(file_path):
+    def _fallback_animation(file_path):
+        fallback_img = pyglet.image.SolidColorImagePattern(color=(255, 0, 0, 255)).create_image(64, 64)
+        fallback_anim = pyglet.image.Animation([pyglet.image.AnimationFrame(fallback_img, 1.0)])
+        ResourceManager._cache[file_path] = fallback_anim
+        return fallback_anim
+
+    @staticmethod
+    def aseprite():
+        """Modul aseprite.aseprite s dekóderom zaregistrovaným v pyglete - importuje sa až pri prvom .aseprite súbore,
+        ktorý nemá predkonvertovaný sheet."""
+        # toto nie je moja trieda, ale ukradnutá z internetu -> dovoluje mi dekódovať a spracovať .aseprite súbory priamo do Animation, AnimationFrame a ImageData -> SUPER VEC
+        return lazy_import('aseprite.aseprite', setup=pyglet.image.codecs.add_decoders)
+
+    @staticmethod
+    def decode_animation(file_path):
+        """Dekóduje animáciu bez OpenGL, takže sa dá volať aj z iného vlákna."""
+        anim = PrebuiltSheets.load(file_path)
+        if anim is not None:
+            print(f"Animation loaded from prebuilt sheet: {file_path}")
+            return anim
+        anim = DiskFrameCache.load(file_path)
+        if anim is None:
+            if file_path.lower().endswith(('.ase', '.aseprite')):
+                ResourceManager.aseprite()
+            anim = pyglet.image.load_animation(file_path)
+            DiskFrameCache.store(file_path, anim.frames)
+            print(f"Animation loaded and cached: {file_path}")
+        else:
+            print(f"Animation loaded from frame cache: {file_path}")
+        return anim
+
+    @staticmethod
+    def upload_animation(file_path, anim, atlas=False):
+        """Generátor - nahrá do GPU jednu snímku na každý krok, na konci animáciu uloží do cache.
+        Musí bežať na hlavnom vlákne (OpenGL kontext)."""
+        if atlas and ResourceManager.use_atlas:
+            frames = []
+            for frame in anim.frames:
+                frames.append(pyglet.image.AnimationFrame(ResourceManager._add_to_atlas(frame.image), frame.duration))
+                yield
+            premultiplied_alpha = getattr(anim, 'premultiplied_alpha', False)
+            anim = pyglet.image.Animation(frames)
+            anim.premultiplied_alpha = premultiplied_alpha
+        else:
+            for frame in anim.frames:
+                frame.image.get_texture().mag_filter = pyglet.gl.GL_NEAREST
+                yield
+        ResourceManager._cache[file_path] = anim
+
+    @staticmethod
+    def get_animation(file_path, atlas=False):
+        if HEADLESS:  # bez OpenGL nie je kam nahrať textúry, entity použijú HeadlessSprite
+            return None
         if file_path in ResourceManager._cache:
             return ResourceManager._cache[file_path]
-        if not os.path.exists(file_path):
+        if not os.path.exists(file_path) and not PrebuiltSheets.has(file_path):
             print(f"File not found: {file_path}")
-            fallback_img = pyglet.image.SolidColorImagePattern(color=(255, 0, 0, 255)).create_image(64, 64)
-            fallback_anim = pyglet.image.Animation([pyglet.image.AnimationFrame(fallback_img, 1.0)])
-            ResourceManager._cache[file_path] = fallback_anim
-            return fallback_anim
+            return ResourceManager._fallback_animation(file_path)
         try:
-            anim = pyglet.image.load_animation(file_path)
-            for frame in anim.frames:
-                frame.image.get_texture().mag_filter = pyglet.gl.GL_NEAREST
-            ResourceManager._cache[file_path] = anim
-            print(f"Animation loaded and cached: {file_path}")
-            return anim
+            anim = ResourceManager.decode_animation(file_path)
+            for _ in ResourceManager.upload_animation(file_path, anim, atlas):
+                pass
+            return ResourceManager._cache[file_path]
         except Exception as e:
             print(f"Error loading animation '{file_path}': {e}")
-            fallback_img = pyglet.image.SolidColorImagePattern(color=(255, 0, 0, 255)).create_image(64, 64)
-            fallback_anim = pyglet.image.Animation([pyglet.image.AnimationFrame(fallback_img, 1.0)])
-            ResourceManager._cache[file_path] = fallback_anim
-            return fallback_anim
+            return ResourceManager._fallback_animation(file_path)
+
+    @staticmethod
+    def open_frame_source(file_path):
+        """Pripraví zdroj snímok pre StreamingAnimation bez OpenGL (dá sa volať z iného vlákna)."""
+        if file_path.lower().endswith(('.ase', '.aseprite')):
+            anim = PrebuiltSheets.load(file_path)
+            if anim is not None:
+                return AnimationFrameSource(anim)
+            return ResourceManager.aseprite().AsepriteFrameStream(file_path)
+        anim = DiskFrameCache.load(file_path)
+        if anim is None:
+            # Snímky idú rovno do cache a potom sa z nej len namapujú
+            if DiskFrameCache.store(file_path, *ResourceManager.iter_animation_frames(file_path)):
+                anim = DiskFrameCache.load(file_path)
+            if anim is None:  # cache vypnutá alebo sa nedala zapísať
+                anim = pyglet.image.load_animation(file_path)
+        return AnimationFrameSource(anim)
+
+    @staticmethod
+    def iter_animation_frames(file_path):
+        """(snímky, počet) pre DiskFrameCache.store. GIF cez gdk-pixbuf (Linux) sa dekóduje po jednej snímke,
+        ostatné dekodéry pygletu (GDI+ na Windows, Quartz na macOS) vedia len celú animáciu naraz."""
+        try:
+            from pyglet.image.codecs import gdkpixbuf2, gif
+        except ImportError:  # iná platforma alebo chýba knižnica gdk-pixbuf
+            gdkpixbuf2 = None
+        decoders = pyglet.image.codecs.registry.get_animation_decoders(file_path)
+        if gdkpixbuf2 is not None and decoders and isinstance(decoders[0], gdkpixbuf2.GdkPixbuf2ImageDecoder):
+            with open(file_path, 'rb') as f:
+                count = len(gif.read(f).images)
+
+            def frames():
+                with open(file_path, 'rb') as f:
+                    yield from gdkpixbuf2.GdkPixBufLoader(file_path, f).get_animation()
+            return frames(), count
+        frames = pyglet.image.load_animation(file_path).frames
+        return frames, len(frames)
+
+    @staticmethod
+    def upload_stream(file_path, source):
+        ResourceManager._streams[file_path] = StreamingAnimation(source, ResourceManager.STREAM_RESIDENT_FRAMES)
+        yield
+
+    @staticmethod
+    def get_streaming_animation(file_path):
+        if file_path not in ResourceManager._streams:
+            for _ in ResourceManager.upload_stream(file_path, ResourceManager.open_frame_source(file_path)):
+                pass
+        return ResourceManager._streams[file_path]
+
+    @staticmethod
+    def upload_image(file_path, image):
+        image.get_texture()
+        yield
+        ResourceManager._images[file_path] = image
+
+    @staticmethod
+    def get_image(file_path):
+        if file_path not in ResourceManager._images:
+            for _ in ResourceManager.upload_image(file_path, pyglet.image.load(file_path)):
+                pass
+        return ResourceManager._images[file_path]
+
+    @staticmethod
+    def decode_tileset(file_path, tile_size):
+        """Rozreže obrázok na celé dlaždice (id po riadkoch zhora, ako v súboroch levelov) bez OpenGL.
+        Vráti (pre každé id index unikátnej dlaždice alebo None, ak je prázdna; zoznam unikátnych ImageData)."""
+        image = pyglet.image.load(file_path).get_image_data()
+        pitch = image.width * 4
+        data = image.get_data('RGBA', pitch)  # riadky zdola, ako ich chce ImageData
+        row_bytes = tile_size * 4
+        columns, rows = image.width // tile_size, image.height // tile_size
+        tile_indices = []
+        unique = {}
+        for row in range(rows):
+            bottom = image.height - (row + 1) * tile_size
+            for column in range(columns):
+                start = bottom * pitch + column * row_bytes
+                pixels = b''.join(data[start + y * pitch:start + y * pitch + row_bytes] for y in range(tile_size))
+                if not any(pixels[3::4]):
+                    tile_indices.append(None)
+                    continue
+                # Rovnaké dlaždice (napr. výplň pod povrchom) sú v atlase len raz
+                tile_indices.append(unique.setdefault(pixels, len(unique)))
+        return tile_indices, [pyglet.image.ImageData(tile_size, tile_size, 'RGBA', pixels) for pixels in unique]
+
+    @staticmethod
+    def upload_tileset(key, decoded):
+        """Generátor - jedna unikátna dlaždica do atlasu na každý krok (ako upload_animation)."""
+        tile_indices, images = decoded
+        regions = []
+        for image in images:
+            regions.append(ResourceManager._add_to_atlas(image))
+            yield
+        ResourceManager._tilesets[key] = [None if index is None else regions[index] for index in tile_indices]
 
-# === DamageText Class ===
+    @staticmethod
+    def get_tileset(file_path, tile_size):
+        if HEADLESS:
+            return None
+        key = (file_path, tile_size)
+        if key not in ResourceManager._tilesets:
+            for _ in ResourceManager.upload_tileset(key, ResourceManager.decode_tileset(file_path, tile_size)):
+                pass
+        return ResourceManager._tilesets[key]
+
+    @staticmethod
+    def get_text_image(text, font_name='Arial', font_size=24):
+        """Text poskladaný z glyfov fontu do jedného bieleho obrázka s anchorom v strede (farbu dá sprite cez color)."""
+        text_key = (text, font_name, font_size)
+        if text_key in ResourceManager._texts:
+            return ResourceManager._texts[text_key]
+        font = pyglet.font.load(font_name, font_size)
+        glyphs = font.get_glyphs(text)
+        # Rozmery podľa glyfov (left/right sú posuny od pera na baseline), výška podľa fontu
+        pen_x = 0
+        min_x = max_x = 0
+        placed = []
+        for glyph in glyphs:
+            left, bottom, right, top = glyph.vertices
+            if glyph.width and glyph.height:
+                placed.append((glyph, pen_x + left, bottom))
+                min_x = min(min_x, pen_x + left)
+                max_x = max(max_x, pen_x + right)
+            pen_x += glyph.advance
+        width = max(max_x, pen_x, 1) - min_x
+        height = font.ascent - font.descent
+        buffer = bytearray(width * height * 4)
+        for glyph, x, bottom in placed:
+            glyph_image = glyph.get_image_data()
+            data = glyph_image.get_data('RGBA', glyph_image.width * 4)
+            x -= min_x
+            row_bytes = glyph_image.width * 4
+            # Niektoré font renderery (freetype) majú glyf v textúre hore nohami a otáčajú ho až tex_coords
+            flipped = glyph.tex_coords[1] > glyph.tex_coords[7]
+            for row in range(glyph_image.height):
+                y = bottom - font.descent + row
+                if not 0 <= y < height or x + glyph_image.width > width:
+                    continue
+                start = (y * width + x) * 4
+                src_row = glyph_image.height - 1 - row if flipped else row
+                src = data[src_row * row_bytes:(src_row + 1) * row_bytes]
+                # Glyfy sa môžu prekrývať (kerning), takže pixely len zlúčime, neprepisujeme
+                buffer[start:start + row_bytes] = bytes(map(max, buffer[start:start + row_bytes], src))
+        image = pyglet.image.ImageData(width, height, 'RGBA', bytes(buffer))
+        image.anchor_x = width // 2
+        image.anchor_y = height // 2
+        texture = image.get_texture()
+        ResourceManager._texts[text_key] = texture
+        return texture
+
+# === Audio === - hudba a zvukové efekty. Všetko sa otvorí a dekóduje v preloaderi (thread pool), kým beží menu a loading
+# screen: efekty celé do pamäte (StaticSource), hudba ako stream, ktorého začiatok je už dekódovaný (BufferedStream).
+# Efekty hrajú na pár hlasoch (Voice), ktoré sa vytvoria pri načítaní a potom sa len znova používajú, takže zvuk
+# spustený počas hry nič nedekóduje ani nevytvára nový prehrávač v audio driveri. Triedy nad pyglet.media sú v src/audio.py,
+# importuje sa až v Audio.init() (po prvej snímke). Pri --headless sa nič nenačíta a Audio.play() nič nerobí.
+class Audio:
+    SOUNDS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../resources/sounds'))
+    SOUNDS = ('ring', 'hurt', 'boss_hit', 'explosion')  # vytvára ich src/build_sounds.py
+    VOICES = 8  # naraz hrá najviac toľko efektov, ďalšie sa zahodia
+    BACKEND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio.py')
+    backend = None  # modul src/audio.py
+    sounds = {}  # meno -> StaticSource
+    voices = []
+    dropped = 0
+    music_player = None
+
+    @staticmethod
+    def init():
+        """Importuje audio (pyglet.media vytvorí audio driver) - na hlavnom vlákne, skôr ako preloader dekóduje zvuky."""
+        if Audio.backend is None:
+            Audio.backend = lazy_import('sonic_audio', path=Audio.BACKEND_PATH)
+        return Audio.backend
+
+    @staticmethod
+    def sound_files():
+        return [os.path.join(Audio.SOUNDS_PATH, name + '.wav') for name in Audio.SOUNDS]
+
+    @staticmethod
+    def decode_sound(file_path):
+        """Celý efekt dekódovaný do pamäte - volá sa vo vlákne preloadera."""
+        return Audio.backend.decode_sound(file_path)
+
+    @staticmethod
+    def open_music(file_path):
+        """Otvorí hudbu a dekóduje jej začiatok - volá sa vo vlákne preloadera."""
+        return Audio.backend.open_music(file_path)
+
+    @staticmethod
+    def upload_sound(file_path, sound):
+        Audio.sounds[os.path.splitext(os.path.basename(file_path))[0]] = sound
+        if Audio.voices or sound.audio_format is None:
+            return
+        # Hlasy sa vytvoria s prvým efektom a raz ho potichu prehrajú - prehrávače v audio driveri (pre formát
+        # efektov) tak vzniknú počas načítania, nie pri prvom zvuku v hre
+        for _ in range(Audio.VOICES):
+            voice = Audio.backend.Voice()
+            voice.play_sound(sound, volume=0.0)
+            Audio.voices.append(voice)
+            yield
+
+    @staticmethod
+    def upload_music(file_path, stream):
+        Audio.music_player = Audio.backend.create_music_player(stream)
+        yield
+
+    @staticmethod
+    def play(name):
+        sound = Audio.sounds.get(name)
+        if sound is None:
+            return
+        for voice in Audio.voices:
+            if not voice.busy:
+                voice.play_sound(sound)
+                return
+        Audio.dropped += 1
+
+    @staticmethod
+    def play_music():
+        if Audio.music_player is not None:
+            Audio.music_player.play()
+        return Audio.music_player
+
+# === Asset Preloader === - súbory sa dekódujú v thread poole, kým sa animuje menu a loading screen.
+# Upload do GPU musí byť na hlavnom vlákne, preto ide po malých kúskoch v každom ticku (max UPLOAD_BUDGET sekúnd).
+class AssetPreloader:
+    UPLOAD_BUDGET = 0.004
+
+    def __init__(self, animations=(), atlas_animations=(), images=(), streams=(), tilesets=(), sounds=(), music=(),
+                 on_finished=None, max_workers=None):
+        self.on_finished = on_finished
+        self.executor = lazy_import('concurrent.futures').ThreadPoolExecutor(max_workers=max_workers,
+                                                                             thread_name_prefix="preload")
+        self.pending = []  # (future, file_path, druh) v poradí, v akom sa majú nahrať
+        for file_path in animations:
+            self._submit(file_path, 'animation')
+        for file_path in atlas_animations:
+            self._submit(file_path, 'atlas_animation')
+        for file_path in images:
+            self._submit(file_path, 'image')
+        for file_path in streams:
+            self._submit(file_path, 'stream')
+        for tileset in tilesets:  # (súbor, veľkosť dlaždice)
+            self._submit(tileset, 'tileset')
+        for file_path in sounds:
+            self._submit(file_path, 'sound')
+        for file_path in music:
+            self._submit(file_path, 'music')
+        self.total = len(self.pending)
+        self.done = 0
+        self.uploading = None
+        self.finished = False
+        pyglet.clock.schedule_interval(self.upload_step, 1 / 60.0)
+
+    def _submit(self, file_path, kind):
+        if kind == 'image':
+            if file_path in ResourceManager._images:
+                return
+            future = self.executor.submit(pyglet.image.load, file_path)
+        elif kind == 'stream':
+            if file_path in ResourceManager._streams:
+                return
+            future = self.executor.submit(ResourceManager.open_frame_source, file_path)
+        elif kind == 'tileset':
+            if file_path in ResourceManager._tilesets:
+                return
+            future = self.executor.submit(ResourceManager.decode_tileset, *file_path)
+        elif kind in ('sound', 'music'):
+            # Hra bez zvuku ide ďalej (chýbajúci súbor, formát bez dekodéra), len sa to vypíše
+            if not os.path.exists(file_path):
+                print(f"File not found: {file_path}")
+                return
+            Audio.init()
+            future = self.executor.submit(Audio.decode_sound if kind == 'sound' else Audio.open_music, file_path)
+        else:
+            if file_path in ResourceManager._cache:
+                return
+            if not os.path.exists(file_path):
+                print(f"File not found: {file_path}")
+                ResourceManager._fallback_animation(file_path)
+                return
+            future = self.executor.submit(ResourceManager.decode_animation, file_path)
+        self.pending.append((future, file_path, kind))
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    def _upload_until(self, deadline):
+        while time.perf_counter() < deadline:
+            if self.uploading is None:
+                self.uploading = self._next_upload()
+                if self.uploading is None:
+                    break
+            try:
+                next(self.uploading)
+            except StopIteration:
+                self.uploading = None
+                self.done += 1
+
+    def _next_upload(self):
+        for i, (future, file_path, kind) in enumerate(self.pending):
+            if not future.done():
+                continue
+            del self.pending[i]
+            try:
+                result = future.result()
+            except Exception as e:
+                if kind == 'image':
+                    raise
+                # Pozadie, loading screen a dlaždice majú náhradu (placeholder) - výsledok sa len nezapíše do cache
+                if kind in ('stream', 'tileset', 'sound', 'music'):
+                    print(f"Error loading {kind} '{file_path}': {e}")
+                    return iter(())
+                print(f"Error loading animation '{file_path}': {e}")
+                ResourceManager._fallback_animation(file_path)
+                return iter(())
+            if kind == 'image':
+                return ResourceManager.upload_image(file_path, result)
+            if kind == 'stream':
+                return ResourceManager.upload_stream(file_path, result)
+            if kind == 'tileset':
+                return ResourceManager.upload_tileset(file_path, result)
+            if kind == 'sound':
+                return Audio.upload_sound(file_path, result)
+            if kind == 'music':
+                return Audio.upload_music(file_path, result)
+            return ResourceManager.upload_animation(file_path, result, atlas=(kind == 'atlas_animation'))
+        return None
+
+    def upload_step(self, dt):
+        with Profiler.section('asset upload', 'asset'):
+            self._upload_until(time.perf_counter() + self.UPLOAD_BUDGET)
+        if not self.pending and self.uploading is None:
+            self.finished = True
+            pyglet.clock.unschedule(self.upload_step)
+            self.executor.shutdown(wait=False)
+            if self.on_finished:
+                self.on_finished()
+
+# === Draw Call Counter === - počíta volania glDraw* v pyglete, aby bolo vidieť, koľko draw callov stojí každá vrstva
+class DrawCallCounter:
+    FUNCTIONS = ('glDrawArrays', 'glDrawElements', 'glDrawArraysInstanced', 'glDrawElementsInstanced')
+
+    def __init__(self, report_interval=1.0):
+        self.calls = 0
+        self.frames = 0
+        self.layers = {}
+        # Batch aj samostatné vertex listy kreslia cez vertexdomain, takže stačí obaliť funkcie tam
+        for name in self.FUNCTIONS:
+            setattr(vertexdomain, name, self._wrap(getattr(vertexdomain, name)))
+        pyglet.clock.schedule_interval(self.report, report_interval)
+
+    def _wrap(self, func):
+        def counted(*args):
+            self.calls += 1
+            return func(*args)
+        return counted
+
+    def draw(self, name, drawable):
+        before = self.calls
+        drawable.draw()
+        self.layers[name] = self.layers.get(name, 0) + self.calls - before
+
+    def end_frame(self):
+        self.frames += 1
+
+    def report(self, dt):
+        if self.frames:
+            per_layer = ", ".join(f"{name}={count / self.frames:.1f}" for name, count in self.layers.items())
+            print(f"Draw calls/frame: {sum(self.layers.values()) / self.frames:.1f} ({per_layer})")
+        self.frames = 0
+        self.layers = {}
+
+# === Profiler === - meria čas pomenovaných sekcií (update subsystémov, kreslenie batchov, načítanie assetov).
+# Sekcie raz za snímku sú `with Profiler.section(...)`, to je vypnuté len jedna kontrola. Metódy volané v každom kroku
+# simulácie sa zaregistrujú cez Profiler.instrument() a obalia sa (ako DrawCallCounter) len kým je profiler zapnutý,
+# takže vypnutý profiler nestojí nič ani v headless režime. Zapnutý zbiera časy snímok pre overlay (F3)
+# a s --trace aj udalosti pre Chrome trace (chrome://tracing alebo ui.perfetto.dev).
+class _ProfilerSection:
+    __slots__ = ('name', 'category', 'start')
+
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        Profiler.record(self.name, self.category, self.start, time.perf_counter())
+
+class Profiler:
+    HISTORY = 240                # koľko posledných snímok drží overlay
+    MAX_TRACE_EVENTS = 1000000   # strop, aby dlhé hranie nezjedlo pamäť
+    enabled = False
+    tracing = False
+    frames = collections.deque(maxlen=HISTORY)  # (trvanie snímky v s, {sekcia: s v tej snímke})
+    frame_count = 0
+    _current = {}
+    _frame_start = None
+    _events = []          # (meno, kategória, začiatok, koniec, vlákno, detail) pre Chrome trace
+    _thread_names = {}
+    _epoch = STARTED  # čas 0 v trace = štart procesu (vidieť aj etapy štartu)
+    _main_thread = threading.get_ident()
+    _instrumented = []    # (trieda, atribút, meno sekcie, kategória, detail)
+    _originals = {}
+    _NULL = contextlib.nullcontext()
+
+    @staticmethod
+    def section(name, category='update'):
+        if not Profiler.enabled:
+            return Profiler._NULL
+        return _ProfilerSection(name, category)
+
+    @staticmethod
+    def instrument(owner, attr, name, category='update', detail=None):
+        """Zaregistruje metódu (aj staticmethod), ktorá sa meria ako sekcia, kým je profiler zapnutý.
+        detail(*args) -> str sa uloží k udalosti v trace (napr. meno načítaného súboru)."""
+        Profiler._instrumented.append((owner, attr, name, category, detail))
+        if Profiler.enabled:
+            Profiler._wrap(owner, attr, name, category, detail)
+
+    @staticmethod
+    def _wrap(owner, attr, name, category, detail):
+        original = owner.__dict__[attr]
+        func = original.__func__ if isinstance(original, staticmethod) else original
+
+        def profiled(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                Profiler.record(name, category, start, time.perf_counter(), detail(*args) if detail else None)
+
+        Profiler._originals[owner, attr] = original
+        setattr(owner, attr, staticmethod(profiled) if isinstance(original, staticmethod) else profiled)
+
+    @staticmethod
+    def set_enabled(enabled):
+        if enabled == Profiler.enabled:
+            return
+        Profiler.enabled = enabled
+        for owner, attr, name, category, detail in Profiler._instrumented:
+            if enabled:
+                Profiler._wrap(owner, attr, name, category, detail)
+            else:
+                setattr(owner, attr, Profiler._originals.pop((owner, attr)))
+        if not enabled:
+            Profiler.frames.clear()
+            Profiler._current = {}
+
+    @staticmethod
+    def start_trace():
+        Profiler.tracing = True
+        Profiler.set_enabled(True)
+
+    @staticmethod
+    def record(name, category, start, end, detail=None):
+        thread = threading.get_ident()
+        # Do snímky (overlay) patrí len hlavné vlákno, dekódovanie v preloaderi je vidieť v trace
+        if thread == Profiler._main_thread:
+            Profiler._current[name] = Profiler._current.get(name, 0.0) + end - start
+        if Profiler.tracing:
+            Profiler._trace(name, category, start, end, thread, detail)
+
+    @staticmethod
+    def _trace(name, category, start, end, thread, detail=None):
+        if len(Profiler._events) >= Profiler.MAX_TRACE_EVENTS:
+            print(f"Trace buffer full ({Profiler.MAX_TRACE_EVENTS} events), tracing stopped")
+            Profiler.tracing = False
+            return
+        if thread not in Profiler._thread_names:
+            Profiler._thread_names[thread] = threading.current_thread().name
+        Profiler._events.append((name, category, start, end, thread, detail))
+
+    @staticmethod
+    def end_frame():
+        """Uzavrie snímku - volá sa raz za snímku na konci Game.on_draw."""
+        now = time.perf_counter()
+        if Profiler.enabled and Profiler._frame_start is not None:
+            Profiler.frames.append((now - Profiler._frame_start, Profiler._current))
+            Profiler.frame_count += 1
+            if Profiler.tracing:
+                Profiler._trace('frame', 'frame', Profiler._frame_start, now, Profiler._main_thread)
+        Profiler._current = {}
+        Profiler._frame_start = now
+
+    @staticmethod
+    def percentile(sorted_values, p):
+        if not sorted_values:
+            return 0.0
+        return sorted_values[min(int(p * len(sorted_values)), len(sorted_values) - 1)]
+
+    @staticmethod
+    def summary():
+        """Časy snímok zoradené (s) a priemerný čas každej sekcie na snímku (s) za celú históriu."""
+        frame_times = sorted(duration for duration, _ in Profiler.frames)
+        totals = {}
+        for _, sections in Profiler.frames:
+            for name, duration in sections.items():
+                totals[name] = totals.get(name, 0.0) + duration
+        count = max(len(Profiler.frames), 1)
+        return frame_times, {name: total / count for name, total in totals.items()}
+
+    @staticmethod
+    def save_trace(path):
+        """Uloží udalosti v Chrome trace-event JSON formáte (časy v mikrosekundách)."""
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in Profiler._thread_names.items()]
+        for name, category, start, end, tid, detail in Profiler._events:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - Profiler._epoch) * 1e6, 3), 'dur': round((end - start) * 1e6, 3)}
+            if detail is not None:
+                event['args'] = {'detail': detail}
+            events.append(event)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Trace saved: {path} ({len(Profiler._events)} events)")
+
+class ProfilerOverlay:
+    """Graf časov snímok (ako osciloskop - každú snímku sa prepíše len jeden stĺpec) a tabuľka sekcií, F3 zapína/vypína."""
+    SAMPLES = 180
+    BAR_WIDTH = 2
+    MAX_SECTIONS = 14      # v tabuľke len najdrahšie sekcie
+    PX_PER_MS = 4
+    GRAPH_MS = 50          # výška grafu v ms, dlhšie snímky sa orežú
+    TEXT_INTERVAL = 0.25   # Label sa prepočítava len párkrát za sekundu, layout textu nie je zadarmo
+
+    def __init__(self, window):
+        self.window = window
+        self.visible = False
+        self.batch = pyglet.graphics.Batch()
+        background = pyglet.graphics.Group(order=0)
+        foreground = pyglet.graphics.Group(order=1)
+        width = self.SAMPLES * self.BAR_WIDTH
+        height = self.GRAPH_MS * self.PX_PER_MS
+        self.x = window.width - width - 20
+        self.y = window.height - height - 20
+        self.panel = pyglet.shapes.Rectangle(self.x - 10, self.y - 330, width + 20, height + 340,
+                                             color=(0, 0, 0, 180), batch=self.batch, group=background)
+        self.bars = [pyglet.shapes.Rectangle(self.x + i * self.BAR_WIDTH, self.y, self.BAR_WIDTH, 0,
+                                             batch=self.batch, group=foreground) for i in range(self.SAMPLES)]
+        # Hranice 60 a 30 fps
+        self.budget_lines = [pyglet.shapes.Line(self.x, self.y + ms * self.PX_PER_MS, self.x + width,
+                                                self.y + ms * self.PX_PER_MS, color=(255, 255, 255, 90),
+                                                batch=self.batch, group=foreground) for ms in (1000 / 60, 1000 / 30)]
+        self.label = pyglet.text.Label("", font_name='Courier New', font_size=11, x=self.x, y=self.y - 10,
+                                       width=width, multiline=True, anchor_y='top',
+                                       color=(255, 255, 255, 255), batch=self.batch, group=foreground)
+        self.cursor = 0
+        self.frames_seen = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        # Trace beží ďalej aj so skrytým overlayom
+        Profiler.set_enabled(self.visible or Profiler.tracing)
+        if self.visible:
+            pyglet.clock.schedule_interval(self.refresh_text, self.TEXT_INTERVAL)
+        else:
+            pyglet.clock.unschedule(self.refresh_text)
+
+    def update(self):
+        """Zapíše poslednú snímku do grafu - volá sa raz za snímku."""
+        if Profiler.frame_count == self.frames_seen or not Profiler.frames:
+            return
+        self.frames_seen = Profiler.frame_count
+        ms = Profiler.frames[-1][0] * 1000
+        bar = self.bars[self.cursor]
+        bar.height = min(ms, self.GRAPH_MS) * self.PX_PER_MS
+        bar.color = (80, 220, 80) if ms <= 1000 / 60 + 1 else (240, 200, 60) if ms <= 1000 / 30 + 1 else (240, 60, 60)
+        self.cursor = (self.cursor + 1) % self.SAMPLES
+
+    def refresh_text(self, dt):
+        frame_times, sections = Profiler.summary()
+        if not frame_times:
+            return
+        mean = sum(frame_times) / len(frame_times)
+        lines = [f"frame {mean * 1000:6.2f} ms  {1 / mean if mean else 0:5.0f} fps",
+                 "p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+                     *(Profiler.percentile(frame_times, p) * 1000 for p in (0.5, 0.95, 0.99)), frame_times[-1] * 1000)]
+        for name, duration in sorted(sections.items(), key=lambda item: -item[1])[:self.MAX_SECTIONS]:
+            lines.append(f"{name:<20}{duration * 1000:8.3f} ms")
+        self.label.text = "\n".join(lines)
+
+    def draw(self):
+        if self.visible:
+            self.update()
+            self.batch.draw()
+
+# === Startup === - štart je rozdelený na etapy. Pred prvou snímkou sa len naimportuje pyglet a vytvorí okno a menu;
+# loading screen, audio, dekódovanie assetov a herný svet prídu na rad až po nej (v thread poole preloadera alebo
+# po kúskoch v tickoch). --startup-trace vypíše čas do prvej snímky a trvanie etáp, s --trace sú etapy aj v trace.
+class Startup:
+    FIRST_FRAME_BUDGET = 0.5  # s od spustenia po prvú snímku (menu)
+    trace = False
+    stages = []        # (meno, začiatok, koniec) v s od STARTED, aj z vlákien (lazy importy v preloaderi)
+    first_frame = None
+
+    @staticmethod
+    @contextlib.contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Startup.record(name, start, time.perf_counter())
+
+    @staticmethod
+    def record(name, start, end):
+        Startup.stages.append((name, start - STARTED, end - STARTED))
+        if Profiler.enabled:
+            Profiler.record(name, 'startup', start, end)
+
+    @staticmethod
+    def frame_drawn():
+        if Startup.first_frame is None:
+            Startup.first_frame = time.perf_counter() - STARTED
+
+    @staticmethod
+    def report():
+        print("Startup (ms from launch):")
+        print("  {:<28}{:>10}{:>10}".format("stage", "start", "duration"))
+        for name, start, end in sorted(Startup.stages, key=lambda stage: stage[1]):
+            print("  {:<28}{:>10.1f}{:>10.1f}".format(name, start * 1000, (end - start) * 1000))
+        if Startup.first_frame is not None:
+            over = " - OVER BUDGET" if Startup.first_frame > Startup.FIRST_FRAME_BUDGET else ""
+            print(f"  time to first frame: {Startup.first_frame * 1000:.1f} ms "
+                  f"(budget {Startup.FIRST_FRAME_BUDGET * 1000:.0f} ms){over}")
+        print(f"  time to game ready: {(time.perf_counter() - STARTED) * 1000:.1f} ms")
+
+# === Fixed Timestep === - simulácia beží s pevným krokom (nezávisle od FPS), takže hitche nemenia fyziku.
+# Nazbieraný čas sa spotrebúva po krokoch STEP, najviac max_steps krokov za snímku (inak by hra po záseku nestíhala dobiehať).
+class FixedTimestep:
+    def __init__(self, step=1 / 120.0, max_steps=8):
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped = 0.0  # koľko času sa zahodilo kvôli max_steps
+
+    def advance(self, dt, simulate):
+        """Zavolá simulate(step) toľkokrát, koľko krokov sa zmestí do nazbieraného času. Vráti počet krokov."""
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= self.step:
+            if steps >= self.max_steps:
+                self.dropped += self.accumulator - self.accumulator % self.step
+                self.accumulator %= self.step
+                break
+            simulate(self.step)
+            self.accumulator -= self.step
+            steps += 1
+        return steps
+
+    @property
+    def alpha(self):
+        """Kde medzi posledným a nasledujúcim stavom simulácie sme (0..1) - na interpoláciu pri vykreslení."""
+        return self.accumulator / self.step
+
+# === Input Recording === - klávesy počas hry sa zapisujú s číslom kroku simulácie (nie s časom) spolu so seedom pre random.
+# Pri prehrávaní ich Game podá hráčovi tesne pred tým istým krokom, takže súboj prebehne rovnako pri akomkoľvek FPS.
+# Na konci nahrávky je uložený stav sveta, replay ho po poslednom kroku porovná (regresný test) a vypíše, ako rýchlo bežal.
+class InputRecorder:
+    VERSION = 1
+
+    def __init__(self, seed, sim_rate, level_path, bosses_path):
+        self.seed = seed
+        self.sim_rate = sim_rate
+        self.level_path = level_path
+        self.bosses_path = bosses_path
+        self.events = []  # (krok, 'press'/'release', symbol)
+
+    def record(self, tick, kind, symbol):
+        self.events.append((tick, kind, symbol))
+
+    def save(self, path, end_tick, final_state):
+        with open(path, 'w') as f:
+            json.dump({'version': self.VERSION, 'seed': self.seed, 'sim_rate': self.sim_rate,
+                       'level': self.level_path, 'bosses': self.bosses_path, 'end_tick': end_tick, 'final_state': final_state, 'events': self.events}, f)
+        print(f"Input recorded: {path} ({len(self.events)} events, {end_tick} ticks)")
+
+class InputReplay:
+    def __init__(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != InputRecorder.VERSION:
+            raise ValueError(f"Unsupported recording version in '{path}'")
+        self.path = path
+        self.seed = data['seed']
+        self.sim_rate = data['sim_rate']
+        # Staršie nahrávky level a bossov nemajú - použije sa to, čo je zadané pri spustení
+        self.level_path = data.get('level')
+        self.bosses_path = data.get('bosses')
+        self.end_tick = data['end_tick']
+        self.final_state = data['final_state']
+        self.events = data['events']
+        self.position = 0
+
+    def events_at(self, tick):
+        """Udalosti, ktoré sa majú podať pred krokom tick (sú zoradené podľa kroku)."""
+        while self.position < len(self.events) and self.events[self.position][0] <= tick:
+            _, kind, symbol = self.events[self.position]
+            self.position += 1
+            yield kind, symbol
+
+    def check(self, final_state):
+        """Porovná stav sveta po poslednom kroku s nahrávkou. Vráti True, ak sa zhoduje."""
+        # Staršie nahrávky nemajú všetky položky stavu (napr. bosses) - porovná sa len to, čo v nahrávke je
+        final_state = {name: final_state.get(name) for name in self.final_state}
+        if final_state == self.final_state:
+            print(f"Replay matches the recording: {self.path}")
+            return True
+        print(f"Replay MISMATCH: {self.path}")
+        for name in sorted(set(final_state) | set(self.final_state)):
+            if final_state.get(name) != self.final_state.get(name):
+                print(f"  {name}: recorded {self.final_state.get(name)}, replayed {final_state.get(name)}")
+        return False
+
+# === Headless === - náhrada za pyglet sprite a okno, keď hra beží bez grafiky (--headless).
+# Kolízie čítajú sprite.width/height, takže HeadlessSprite nesie priamo rozmery hitboxu entity.
+class HeadlessSprite:
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.image = None
+        self.visible = True
+        self.paused = False
+        self.frame_index = 0
+
+    def update(self, x=None, y=None, **kwargs):
+        if x is not None:
+            self.x = x
+        if y is not None:
+            self.y = y
+
+    def draw(self):
+        pass
+
+    def delete(self):
+        pass
+
+class HeadlessWindow:
+    def __init__(self, width=1920, height=1080):
+        self.width = width
+        self.height = height
+
+def create_sprite(img, x, y, batch, hitbox):
+    if HEADLESS:
+        return HeadlessSprite(x, y, *hitbox)
+    if getattr(img, 'premultiplied_alpha', False):
+        return pyglet.sprite.Sprite(img, x=x, y=y, batch=batch, blend_src=GL_ONE, blend_dest=GL_ONE_MINUS_SRC_ALPHA)
+    return pyglet.sprite.Sprite(img, x=x, y=y, batch=batch)
+
+# === Spatial Hash === - rovnomerná mriežka, entity sú v bunkách, ktoré prekrýva ich hitbox. Kamera z nej berie entity
+# v zábere (culling). Kolízie prstienkov a projektilov s hráčom počíta EntityStore.overlapping nad stĺpcami store.
+class SpatialHash:
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entity_cells = {}
+        self.entity_ranges = {}  # rozsah buniek (cx1, cy1, cx2, cy2) - rýchly test, či sa entita presunula
+        self.inserted = None  # Camera si sem nechá zapisovať nové entity (aby skryla aj tie, čo vzniknú mimo záberu)
+
+    def _cells_for(self, hitbox):
+        x1, y1, x2, y2 = hitbox
+        size = self.cell_size
+        return [(cx, cy) for cx in range(int(x1 // size), int(x2 // size) + 1)
+                for cy in range(int(y1 // size), int(y2 // size) + 1)]
+
+    def update(self, entity, hitbox):
+        """Zaregistruje entitu, alebo ju presunie, ak sa pohla do iných buniek."""
+        x1, y1, x2, y2 = hitbox
+        size = self.cell_size
+        cell_range = (int(x1 // size), int(y1 // size), int(x2 // size), int(y2 // size))
+        if self.entity_ranges.get(entity) == cell_range:
+            return
+        self.entity_ranges[entity] = cell_range
+        cells = self._cells_for(hitbox)
+        old_cells = self.entity_cells.get(entity)
+        if old_cells:
+            self._discard(entity, old_cells)
+        elif self.inserted is not None:
+            self.inserted.append(entity)
+        for cell in cells:
+            # dict namiesto set -> kandidáti chodia vždy v rovnakom poradí (deterministická simulácia)
+            self.cells.setdefault(cell, {})[entity] = None
+        self.entity_cells[entity] = cells
+
+    insert = update
+
+    def remove(self, entity):
+        self.entity_ranges.pop(entity, None)
+        cells = self.entity_cells.pop(entity, None)
+        if cells:
+            self._discard(entity, cells)
+
+    def _discard(self, entity, cells):
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.pop(entity, None)
+                if not bucket:
+                    del self.cells[cell]
+
+    def query(self, hitbox, kind=None):
+        """Kandidáti, ktorých bunky sa prekrývajú s hitboxom (voliteľne len daného typu)."""
+        candidates = {}
+        if not self.cells:
+            return []
+        x1, y1, x2, y2 = hitbox
+        size = self.cell_size
+        cells = self.cells
+        for cx in range(int(x1 // size), int(x2 // size) + 1):
+            for cy in range(int(y1 // size), int(y2 // size) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    candidates.update(bucket)
+        if kind is not None:
+            return [entity for entity in candidates if isinstance(entity, kind)]
+        return list(candidates)
+
+    def __len__(self):
+        return len(self.entity_cells)
+
+# === Camera === - viditeľná časť sveta. Entitám zo spatial hash mimo záberu sa sprite skryje a zastaví animácia
+# (pyglet inak každý sprite animuje cez clock, aj keď je mimo obrazovky). Entity ďaleko od hráča spia (dormant):
+# neaktualizujú sa, kým sa hráč nepriblíži. Prebúdzanie sa ráta z polohy hráča v simulácii, nie z interpolovanej
+# kamery, aby bola simulácia stále deterministická (replay). Potrebné pre levely širšie ako 1000–3400.
+class Camera:
+    CULL_MARGIN = 128     # sprity kúsok za okrajom ostávajú zobrazené, aby pri rýchlom pohybe nevyskakovali
+    AWAKE_SCREENS = 1.0   # koľko šírok obrazovky za okrajom záberu entity ešte žijú
+
+    def __init__(self, width, height, spatial_hash):
+        self.width = width
+        self.height = height
+        self.x = 0
+        self.y = 0
+        self.spatial_hash = spatial_hash
+        self.shown = {}   # entity v zábere pri poslednom cull()
+        self.culled = 0   # koľko entít zo spatial hash je skrytých
+
+    def follow(self, x):
+        self.x = x - self.width / 2
+
+    @property
+    def view(self):
+        return math.Mat4().translate((-self.x, -self.y, 0))
+
+    def rect(self, margin=0):
+        return (self.x - margin, self.y - margin, self.x + self.width + margin, self.y + self.height + margin)
+
+    def awake_range(self, center_x):
+        """Rozsah x okolo hráča (center_x), v ktorom entity žijú - Level v ňom drží načítané chunky."""
+        reach = self.width * (0.5 + self.AWAKE_SCREENS)
+        return center_x - reach, center_x + reach
+
+    def is_awake(self, bounds, center_x):
+        """Či je entita s danými hranicami dosť blízko hráča (center_x), aby sa aktualizovala."""
+        reach = self.width * (0.5 + self.AWAKE_SCREENS)
+        return bounds[2] >= center_x - reach and bounds[0] <= center_x + reach
+
+    @staticmethod
+    def _set_culled(entity, culled, force=False):
+        # force: entita z poolu mohla pri spawne prepísať visible, takže príznak culled jej už nesedí
+        if not force and getattr(entity, 'culled', False) == culled:
+            return
+        entity.culled = culled
+        entity.sprite.visible = not culled
+        entity.sprite.paused = culled
+
+    def cull(self):
+        """Skryje entity mimo záberu a zobrazí tie v ňom. Prechádza len entity v zábere, tie čo z neho práve odišli
+        a nové - nie celý level."""
+        spatial_hash = self.spatial_hash
+        alive = spatial_hash.entity_cells  # zozbierané prstienky / zničené projektily už v hashi nie sú
+        if spatial_hash.inserted is None:
+            # Prvý cull: odteraz si hash pamätá nové entity, tie doterajšie prejdeme všetky raz
+            spatial_hash.inserted = list(alive)
+        in_view = dict.fromkeys(spatial_hash.query(self.rect(self.CULL_MARGIN)))
+        for entity in spatial_hash.inserted:
+            if entity in alive:
+                self._set_culled(entity, entity not in in_view, force=True)
+        spatial_hash.inserted.clear()
+        for entity in self.shown:
+            if entity not in in_view and entity in alive:
+                self._set_culled(entity, True)
+        for entity in in_view:
+            self._set_culled(entity, False)
+        self.shown = in_view
+        self.culled = len(alive) - len(in_view)
+
+# === Entity Store === - structure of arrays: poloha, rýchlosť a rozmery entít jedného druhu (prstienky, projektily)
+# sú v stĺpcoch array('d'), nie v atribútoch každého objektu. Pohyb, dopad na zem a AABB test proti hráčovi sa robia
+# naraz nad celými stĺpcami a vrátia indexy. Objekt entity (Ring, Projectile) je len handle so spritom a indexom.
+# Pri veľa entitách to počíta numpy (pohľady na tie isté stĺpce, bez kopírovania, import až pri prvom použití); pri pár entitách, ako v bežnom
+# súboji, je réžia numpy volaní väčšia ako celý cyklus, takže sa použije cyklus. Výsledky sú v oboch prípadoch
+# rovnaké (rovnaké operácie v double presnosti, indexy vzostupne).
+class EntityStore:
+    COLUMNS = ('x', 'y', 'velocity_x', 'velocity_y', 'width', 'height', 'prev_x', 'prev_y')
+    VECTORIZE_MIN = 64  # od koľkých živých entít sa oplatí numpy
+
+    def __init__(self, capacity=16):
+        self.columns = {name: array.array('d') for name in self.COLUMNS}
+        for name, column in self.columns.items():
+            setattr(self, name, column)
+        self.alive = bytearray()
+        self.entities = []  # index -> handle entity (None pre voľný index)
+        self.free = []      # halda voľných indexov - nová entita dostane najnižší, živé sú na začiatku stĺpcov
+        self.count = 0
+        self.high = 0       # všetky živé entity majú index < high
+        self.views = None   # numpy pohľady na stĺpce
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        # Stĺpce s pohľadmi sa nedajú zväčšiť (BufferError), preto sa pohľady zahodia a vytvoria znova
+        self.views = None
+        added = capacity - len(self.alive)
+        for column in self.columns.values():
+            column.extend([0.0] * added)
+        self.alive.extend(bytes(added))
+        for index in range(len(self.entities), capacity):
+            heapq.heappush(self.free, index)
+        self.entities.extend([None] * added)
+
+    def _vectorized(self):
+        """(numpy, pohľady na stĺpce), alebo (None, None), ak sa má počítať cyklom."""
+        if self.count < self.VECTORIZE_MIN:
+            return None, None
+        np = lazy_import('numpy', optional=True)
+        if np is None:
+            return None, None
+        if self.views is None:
+            self.views = {name: np.frombuffer(column, dtype=np.float64) for name, column in self.columns.items()}
+            self.views['alive'] = np.frombuffer(self.alive, dtype=np.bool_)
+        return np, self.views
+
+    def spawn(self, entity, x, y, velocity_x=0.0, velocity_y=0.0, width=0.0, height=0.0):
+        if not self.free:
+            self._grow(len(self.alive) * 2)
+        index = heapq.heappop(self.free)
+        self.x[index] = self.prev_x[index] = x
+        self.y[index] = self.prev_y[index] = y
+        self.velocity_x[index] = velocity_x
+        self.velocity_y[index] = velocity_y
+        self.width[index] = width
+        self.height[index] = height
+        self.alive[index] = 1
+        self.entities[index] = entity
+        self.count += 1
+        self.high = max(self.high, index + 1)
+        return index
+
+    def kill(self, index):
+        self.alive[index] = 0
+        self.entities[index] = None
+        heapq.heappush(self.free, index)
+        self.count -= 1
+        while self.high and not self.alive[self.high - 1]:
+            self.high -= 1
+
+    def hitbox(self, index):
+        x, y = self.x[index], self.y[index]
+        return (x, y, x + self.width[index], y + self.height[index])
+
+    def move(self, dt):
+        """Posunie živé entity o rýchlosť * dt (predošlá poloha ostane v prev_x/prev_y na interpoláciu)."""
+        np, views = self._vectorized()
+        if views is not None:
+            alive = views['alive']
+            for pos, prev, velocity in (('x', 'prev_x', 'velocity_x'), ('y', 'prev_y', 'velocity_y')):
+                np.copyto(views[prev], views[pos], where=alive)
+                np.add(views[pos], views[velocity] * dt, out=views[pos], where=alive)
+            return
+        x, y, prev_x, prev_y = self.x, self.y, self.prev_x, self.prev_y
+        velocity_x, velocity_y, alive = self.velocity_x, self.velocity_y, self.alive
+        for i in range(self.high):
+            if alive[i]:
+                prev_x[i] = x[i]
+                prev_y[i] = y[i]
+                x[i] += velocity_x[i] * dt
+                y[i] += velocity_y[i] * dt
+
+    def below(self, limit):
+        """Indexy živých entít so spodným okrajom na limit alebo pod ním (dopad na zem)."""
+        np, views = self._vectorized()
+        if views is not None:
+            return np.flatnonzero(views['alive'] & (views['y'] <= limit)).tolist()
+        y, alive = self.y, self.alive
+        return [i for i in range(self.high) if alive[i] and y[i] <= limit]
+
+    def overlapping(self, hitbox):
+        """Indexy živých entít, ktorých AABB sa prekrýva s hitboxom (dotyk hranou sa počíta). Jediný test
+        prstienkov a projektilov proti hráčovi."""
+        x1, y1, x2, y2 = hitbox
+        np, views = self._vectorized()
+        if views is not None:
+            x, y = views['x'], views['y']
+            outside = (x1 > x + views['width']) | (x > x2) | (y1 > y + views['height']) | (y > y2)
+            return np.flatnonzero(views['alive'] & ~outside).tolist()
+        x, y, width, height, alive = self.x, self.y, self.width, self.height, self.alive
+        return [i for i in range(self.high)
+                if alive[i] and not (x2 < x[i] or x1 > x[i] + width[i] or y2 < y[i] or y1 > y[i] + height[i])]
+
+    def sync_sprites(self, alpha, spatial_hash=None):
+        """Jeden prechod pre vykreslenie: sprity na interpolovanú polohu, v spatial hash poloha pre kameru."""
+        x, y, prev_x, prev_y, alive, entities = self.x, self.y, self.prev_x, self.prev_y, self.alive, self.entities
+        for i in range(self.high):
+            if alive[i]:
+                entity = entities[i]
+                entity.sprite.update(x=prev_x[i] + (x[i] - prev_x[i]) * alpha,
+                                     y=prev_y[i] + (y[i] - prev_y[i]) * alpha)
+                if spatial_hash is not None:
+                    spatial_hash.update(entity, self.hitbox(i))
+
+    def __len__(self):
+        return self.count
+
+# === Object Pool === - projektily, výbuchy a damage texty sa počas súboja nevytvárajú ani nemažú (nový sprite/label
+# = alokácia vertexov v batchi a layout textu, čo robilo hitche). Vytvoria sa vopred a po skončení sa len skryjú a vrátia do poolu.
+class ObjectPool:
+    def __init__(self, factory, size=0):
+        self.factory = factory  # factory(pool) -> nový, skrytý objekt
+        self.free = [factory(self) for _ in range(size)]
+        self.allocated = size
+
+    def acquire(self):
+        if self.free:
+            return self.free.pop()
+        # Pool je prázdny -> dorobíme ďalší objekt (ten sa po uvoľnení tiež vráti do poolu)
+        self.allocated += 1
+        return self.factory(self)
+
+    def release(self, obj):
+        self.free.append(obj)
+
+    def __len__(self):
+        return len(self.free)
+
+class EntityPools:
+    PROJECTILES = 8
+    EXPLOSIONS = 4
+    DAMAGE_TEXTS = 8
+
+    def __init__(self, batch, spatial_hash=None, text_batch=None):
+        proj_path = os.path.join(PlayerSprite.SPRITES_PATH, 'projectile.gif')
+        exp_path = os.path.join(PlayerSprite.SPRITES_PATH, 'explosion.gif')
+        # Polohy a rýchlosti všetkých projektilov - pohyb a kolízie idú naraz cez store (BossManager.update_projectiles)
+        self.projectile_store = EntityStore()
+        self.projectiles = ObjectPool(lambda pool: Projectile(proj_path, batch, self.projectile_store, spatial_hash, pool),
+                                      self.PROJECTILES)
+        self.explosions = ObjectPool(lambda pool: Explosion(exp_path, batch, pool), self.EXPLOSIONS)
+        self.damage_texts = ObjectPool(lambda pool: DamageText(batch=text_batch, pool=pool), self.DAMAGE_TEXTS)
+
+# === DamageText Class === - text je predrenderovaný obrázok (ResourceManager.get_text_image) v sprite v spoločnom batchi,
+# takže aj veľa zásahov naraz je jeden draw call. Stúpanie a miznutie sú len zmeny vertexov (poloha, opacity).
 class DamageText:
-    def __init__(self, text, x, y, duration=1.0):
+    COLOR = (255, 0, 0)
+    RISE = 40  # o koľko pixelov text vystúpi, kým zmizne
+
+    def __init__(self, text="-1 HP", x=0, y=0, duration=1.0, batch=None, pool=None):
         self.text = text
+        self.x = x
+        self.y = y
+        self.duration = duration
+        self.timer = 0
+        self.pool = pool
+        self.sprite = None
+        if not HEADLESS:
+            self.sprite = pyglet.sprite.Sprite(ResourceManager.get_text_image(text), x=x, y=y, batch=batch)
+            self.sprite.color = self.COLOR
+            self.sprite.visible = False
+    def spawn(self, text, x, y, duration=1.0):
         self.x = x
         self.y = y
         self.duration = duration
         self.timer = duration
-        self.label = pyglet.text.Label(
-            text,
-            font_name='Arial',
-            font_size=24,
-            x=x,
-            y=y,
-            anchor_x='center',
-            anchor_y='center',
-            color=(255, 0, 0, 255)
-        )
+        if self.sprite is not None:
+            if text != self.text:
+                self.sprite.image = ResourceManager.get_text_image(text)
+            self.sprite.update(x=x, y=y)
+            self.sprite.opacity = 255
+            self.sprite.visible = True
+        self.text = text
+        return self
+    def release(self):
+        self.timer = 0
+        if self.sprite is not None:
+            self.sprite.visible = False
+        if self.pool is not None:
+            self.pool.release(self)
     def update(self, dt):
         self.timer -= dt
+        if self.sprite is not None and self.timer > 0:
+            progress = 1.0 - self.timer / self.duration
+            self.sprite.y = self.y + self.RISE * progress
+            self.sprite.opacity = int(255 * (1.0 - progress))
     def draw(self):
-        if self.timer > 0:
-            self.label.draw()
+        if self.timer > 0 and self.sprite is not None:
+            self.sprite.draw()
 
 # === Background Class === - pozadie
 class Background:
@@ -67,6 +1526,7 @@ class Background:
         self.file_path = file_path
         self.batch = batch
         self.sprite = None
+        self.stream = None
         self.loaded = False
         display = pyglet.canvas.Display()
         screen = display.get_default_screen()
@@ -74,28 +1534,61 @@ class Background:
                                                      color=(0, 0, 0), batch=self.batch)
         pyglet.clock.schedule_once(self.load_background, 0)
     def load_background(self, dt):
-        anim = ResourceManager.get_animation(self.file_path)
-        if anim:
-            self.sprite = pyglet.sprite.Sprite(anim, x=0, y=-100, batch=self.batch)
-            self.loaded = True
-            self.placeholder.delete()
-            print("Background successfully loaded.")
-        else:
-            print("Failed to load background animation.")
+        # Pozadie sa streamuje - v pamäti je len pár snímok naraz (StreamingAnimation)
+        try:
+            self.stream = ResourceManager.get_streaming_animation(self.file_path)
+        except Exception as e:
+            print(f"Failed to load background animation: {e}")
+            return
+        self.sprite = pyglet.sprite.Sprite(self.stream.texture, x=0, y=-100, batch=self.batch)
+        self.loaded = True
+        self.placeholder.delete()
+        print("Background successfully loaded.")
     def update(self, dt):
-        pass
+        if self.loaded and self.stream.update(dt):
+            self.sprite.image = self.stream.texture
     def draw(self):
         if self.sprite:
             self.sprite.draw()
         else:
             self.placeholder.draw()
 
-# === Ground Class === - podlaha
-class Ground:
-    def __init__(self, file_path, batch, y_position):
-        self.sprite = pyglet.sprite.Sprite(pyglet.image.load(file_path), x=0, y=y_position, batch=batch)
-    def draw(self):
-        self.sprite.draw()
+# === Animation State Machine === - priradenie sprite.image v pyglete spustí animáciu od prvej snímky (a naplánuje ju
+# v clocku) a prepočíta textúrové súradnice, aj keď je to tá istá animácia. Bossovia to predtým robili v každom ticku,
+# takže sa ich animácie ani neprehrávali. Tu sa animácia mení len pri skutočnej zmene stavu.
+class AnimationStateMachine:
+    def __init__(self, sprite, animations, state):
+        self.sprite = sprite
+        self.animations = animations  # stav -> Animation (v headless režime None)
+        self.state = state            # stav, ktorého animácia je práve v sprite
+        self.switches = 0
+
+    @staticmethod
+    def load(table):
+        """Tabuľka stav -> súbor na stav -> animácia (z atlasu, ako ostatné sprity vo foreground_batch)."""
+        return {state: ResourceManager.get_animation(file_path, atlas=True) for state, file_path in table.items()}
+
+    def set(self, state):
+        """Prepne animáciu, ak sa stav zmenil. Vráti True pri zmene animácie."""
+        if state == self.state:
+            return False
+        animation = self.animations.get(state)
+        previous = self.animations.get(self.state)
+        self.state = state
+        # Stavy môžu zdieľať animáciu (MetalSonic flying a moving_vertical) - tá istá nech beží ďalej bez reštartu
+        if animation is previous:
+            return False
+        self.switches += 1
+        if animation is not None:
+            sprite = self.sprite
+            if sprite.paused:
+                # Priradenie image pustí animáciu aj pozastavenému spritu (mimo záberu kamery) - pauzu vrátime
+                sprite.paused = False
+                sprite.image = animation
+                sprite.paused = True
+            else:
+                sprite.image = animation
+        return True
 
 # === Player Sprite Enumeration === - animácie , cesta k nim. toto je taký Enum v podstate
 class PlayerSprite:
@@ -116,57 +1609,51 @@ class Player:
     GRAVITY = -1500
     HITBOX_WIDTH = 148
     HITBOX_HEIGHT = 180
-    def __init__(self, batch, window):
+    # Stav animácie (akcia, smer) -> súbor
+    ANIMATIONS = {('idle', 'left'): PlayerSprite.IDLE_LEFT, ('idle', 'right'): PlayerSprite.IDLE_RIGHT,
+                  ('run', 'left'): PlayerSprite.RUN_LEFT, ('run', 'right'): PlayerSprite.RUN_RIGHT,
+                  ('jump', 'left'): PlayerSprite.JUMP_LEFT, ('jump', 'right'): PlayerSprite.JUMP_RIGHT}
+    def __init__(self, batch, window, start=(1100, 300), bounds=(1000, 3400)):
         self.batch = batch
         self.window = window
-        self.animations = {}
-        for attr in dir(PlayerSprite):
-            if not attr.startswith("__") and attr.isupper():
-                value = getattr(PlayerSprite, attr)
-                if isinstance(value, str) and value.lower().endswith(".aseprite"):
-                    anim = ResourceManager.get_animation(value)
-                    if anim:
-                        self.animations[attr] = anim
-        self.x = 1100
-        self.y = 300
+        self.bounds = bounds  # kam až môže hráč v leveli dôjsť (min_x, max_x)
+        self.animations = AnimationStateMachine.load(self.ANIMATIONS)
+        self.x, self.y = start
         self.velocity_x = 0
         self.velocity_y = 0
         self.direction = 'right'
         self.is_jumping = False
         self.jump_timer = 0
-        self.current_action = 'IDLE_RIGHT'
-        self.animation = self.animations.get(self.current_action)
+        self.animation = self.animations[('idle', 'right')]
         if self.animation is None:
             fallback_img = pyglet.image.SolidColorImagePattern(color=(0,255,0,255)).create_image(64,64)
             self.animation = pyglet.image.Animation([pyglet.image.AnimationFrame(fallback_img, 1.0)])
-        self.sprite = pyglet.sprite.Sprite(self.animation, x=self.x, y=self.y, batch=self.batch)
+        self.sprite = create_sprite(self.animation, self.x, self.y, self.batch, (self.HITBOX_WIDTH, self.HITBOX_HEIGHT))
         self.sprite.anchor_x = 0
         self.sprite.anchor_y = 0
+        self.animator = AnimationStateMachine(self.sprite, self.animations, ('idle', 'right'))
         self.active_movement_keys = set()
         self.jump_held = False
         self.hit_cooldown = 0  # Cooldown pred ďalším zásahom
 
-    def set_action(self, action_key):
-        if self.is_jumping and not action_key.startswith("JUMP_"):
+    def set_action(self, action):
+        """Akcia 'idle' / 'run' / 'jump' v aktuálnom smere. Počas skoku ostáva animácia skoku."""
+        if self.is_jumping and action != 'jump':
             return
-        if self.current_action != action_key:
-            self.current_action = action_key
-            anim = self.animations.get(action_key)
-            if anim:
-                self.sprite.image = anim
-                print(f"Switched action to {action_key}")
+        if self.animator.set((action, self.direction)) and self.animations.get(self.animator.state):
+            print(f"Switched action to {action} {self.direction}")
 
     def move_right(self):
         self.active_movement_keys.add('RIGHT')
         self.direction = 'right'
         if not self.is_jumping:
-            self.set_action('RUN_RIGHT')
+            self.set_action('run')
 
     def move_left(self):
         self.active_movement_keys.add('LEFT')
         self.direction = 'left'
         if not self.is_jumping:
-            self.set_action('RUN_LEFT')
+            self.set_action('run')
 
     def jump(self):
         if self.is_jumping or self.y != 300:
@@ -175,10 +1662,7 @@ class Player:
         self.jump_timer = 1.0
         self.velocity_y = self.JUMP_VELOCITY
         self.jump_held = True
-        if self.direction == 'right':
-            self.set_action('JUMP_RIGHT')
-        else:
-            self.set_action('JUMP_LEFT')
+        self.set_action('jump')
 
     def update(self, dt):
         if self.hit_cooldown > 0:
@@ -205,7 +1689,7 @@ class Player:
                 if self.velocity_x > -1:
                     self.velocity_x = 0
             if self.velocity_x == 0 and not self.is_jumping:
-                self.set_action('IDLE_RIGHT' if self.direction == 'right' else 'IDLE_LEFT')
+                self.set_action('idle')
         if self.is_jumping:
             effective_gravity = self.GRAVITY if not self.jump_held else self.GRAVITY * 0.5
             self.velocity_y += effective_gravity * dt
@@ -216,17 +1700,20 @@ class Player:
                 self.velocity_y = 0
                 self.jump_held = False
                 if self.active_movement_keys:
-                    self.set_action('RUN_RIGHT' if self.direction == 'right' else 'RUN_LEFT')
+                    self.set_action('run')
                 else:
-                    self.set_action('IDLE_RIGHT' if self.direction == 'right' else 'IDLE_LEFT')
+                    self.set_action('idle')
         self.x += self.velocity_x * dt
         window_width = self.window.width
         window_height = self.window.height
-        self.x = max(1000, min(self.x, 3400 - self.sprite.width))
+        self.x = max(self.bounds[0], min(self.x, self.bounds[1] - self.sprite.width))
         self.y = max(0, min(self.y, window_height - self.sprite.height))
         self.sprite.x = self.x
         self.sprite.y = self.y
 
+    def get_hitbox(self):
+        return (self.x, self.y, self.x + self.sprite.width, self.y + self.sprite.height)
+
     def on_key_press(self, symbol, modifiers):
         if self.is_jumping and symbol in (key.D, key.A):
             if symbol == key.D:
@@ -251,68 +1738,205 @@ class Player:
         elif symbol == key.SPACE:
             self.jump_held = False
 
-# === Ring Class ===
+# === Ring Class === - prstienky sú v poole (RingsManager), Level ich spawne pri načítaní chunku a vráti pri uvoľnení
 class Ring:
-    def __init__(self, file_path, batch, x, y):
-        self.sprite = pyglet.sprite.Sprite(ResourceManager.get_animation(file_path), x=x, y=y, batch=batch)
-        self.x = x
-        self.y = y
+    HITBOX_WIDTH = 80
+    HITBOX_HEIGHT = 80
+    # Poloha a rozmery sú v EntityStore (RingsManager.store), prstienok si drží len sprite a svoj index
+    def __init__(self, file_path, batch, store, pool=None):
+        self.sprite = create_sprite(ResourceManager.get_animation(file_path, atlas=True), 0, 0, batch, (self.HITBOX_WIDTH, self.HITBOX_HEIGHT))
+        self.sprite.visible = False
+        self.sprite.paused = True
+        self.store = store
+        self.pool = pool
+        self.ring_id = None
+        self.index = None
         self.width = self.sprite.width
         self.height = self.sprite.height
-        self.collected = False
-    def update(self, dt):
-        pass
+    def spawn(self, ring_id, x, y):
+        self.ring_id = ring_id
+        self.index = self.store.spawn(self, x, y, width=self.width, height=self.height)
+        self.sprite.update(x=x, y=y)
+        self.sprite.visible = True
+        self.sprite.paused = False
+        return self
+    def release(self):
+        self.store.kill(self.index)
+        self.index = None
+        self.sprite.visible = False
+        self.sprite.paused = True
+        if self.pool is not None:
+            self.pool.release(self)
     def draw(self):
-        if not self.collected:
-            self.sprite.draw()
+        self.sprite.draw()
     def get_hitbox(self):
-        return (self.x, self.y, self.x + self.width, self.y + self.sprite.height)
+        return self.store.hitbox(self.index)
 
-# === Rings Manager ===
+# === Rings Manager === - prstienky načítaných chunkov levelu. Zozbierané id si pamätá, aby sa po opätovnom
+# načítaní chunku neobjavili znova.
 class RingsManager:
-    def __init__(self, file_path, batch, ground_y, count=6):
-        self.rings = []
+    def __init__(self, file_path, batch, spatial_hash=None):
         self.batch = batch
+        self.spatial_hash = spatial_hash if spatial_hash is not None else SpatialHash()  # len pre kameru (culling)
+        self.store = EntityStore()
+        self.pool = ObjectPool(lambda pool: Ring(file_path, batch, self.store, pool))
+        self.rings = {}  # ring_id -> Ring, len prstienky v načítaných chunkoch
+        self.collected_ids = set()
         self.collected_count = 0
-        row1_y = ground_y + 50
-        row1_start = 1600
-        spacing = 10
-        for i in range(3):
-            x = row1_start + i * (self._ring_width(file_path, batch) + spacing)
-            ring = Ring(file_path, batch, x, row1_y)
-            self.rings.append(ring)
-        row2_y = ground_y + 140
-        row2_start = 1600
-        for i in range(3):
-            x = row2_start + i * (self._ring_width(file_path, batch) + spacing)
-            ring = Ring(file_path, batch, x, row2_y)
-            self.rings.append(ring)
-    def _ring_width(self, file_path, batch):
-        temp_sprite = pyglet.sprite.Sprite(ResourceManager.get_animation(file_path), x=0, y=0, batch=batch)
-        width = temp_sprite.width
-        temp_sprite.delete()
-        return width
+    def spawn(self, ring_id, x, y):
+        if ring_id in self.collected_ids or ring_id in self.rings:
+            return
+        ring = self.pool.acquire().spawn(ring_id, x, y)
+        self.rings[ring_id] = ring
+        self.spatial_hash.insert(ring, ring.get_hitbox())
+    def despawn(self, ring_id):
+        ring = self.rings.pop(ring_id, None)
+        if ring is not None:
+            self.spatial_hash.remove(ring)
+            ring.release()
     def update(self, dt, player):
         collected = 0
-        for ring in self.rings:
-            if not ring.collected and self.check_collision(player, ring):
-                ring.collected = True
-                ring.sprite.delete()
-                collected += 1
+        if not self.rings:
+            return collected
+        # Jeden AABB test nad stĺpcami store pre všetky načítané prstienky naraz
+        for index in self.store.overlapping(player.get_hitbox()):
+            ring_id = self.store.entities[index].ring_id
+            self.collected_ids.add(ring_id)
+            self.despawn(ring_id)
+            collected += 1
+        if collected:
+            Audio.play('ring')
+        self.collected_count += collected
         return collected
-    def check_collision(self, player, ring):
-        px1, py1 = player.x, player.y
-        px2, py2 = player.x + player.sprite.width, player.y + player.sprite.height
-        rx1, ry1, rx2, ry2 = ring.get_hitbox()
-        return not (px2 < rx1 or px1 > rx2 or py2 < ry1 or py1 > ry2)
     def draw(self):
-        for ring in self.rings:
+        for ring in self.rings.values():
             ring.draw()
 
+# === Level === - tilemapa rozdelená na chunky (resources/levels/*.jsonl, vytvára ich src/build_level.py).
+# Pri otvorení sa prečíta len hlavička a offsety riadkov. Chunk sa načíta zo súboru, keď sa k nemu hráč priblíži
+# (rovnaký dosah ako majú živé entity v Camera), a keď sa vzdiali, jeho dlaždice a prstienky sa vrátia do poolov.
+# Pamäť aj počet spritov teda nezávisia od dĺžky levelu. Dlaždice sú sprity v ground_batch s regiónmi zo spoločného
+# atlasu, takže celá podlaha je jeden draw call. Streamovanie ide podľa hráča v simulácii (deterministické ako Camera).
+class Level:
+    LEVELS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../resources/levels'))
+    DEFAULT = os.path.join(LEVELS_PATH, 'sunset_hill.jsonl')
+    UNLOAD_MARGIN = 1  # chunky sa uvoľnia až o chunk ďalej, ako sa načítajú (hráč na hranici ich nenačítava dokola)
+
+    @staticmethod
+    def read_header(file_path):
+        with open(file_path, 'rb') as f:
+            return json.loads(f.readline())
+
+    def __init__(self, file_path, batch, rings_manager, camera):
+        self.file_path = file_path
+        self.rings_manager = rings_manager
+        self.camera = camera
+        self.offsets = []  # začiatok riadku každého chunku v súbore
+        with open(file_path, 'rb') as f:
+            self.header = json.loads(f.readline())
+            offset = f.tell()
+            for line in f:
+                self.offsets.append(offset)
+                offset += len(line)
+        self.tile_size = self.header['tile_size']
+        self.chunk_px = self.header['chunk_width'] * self.tile_size
+        self.rows = self.header['rows']
+        self.origin_y = self.header['origin_y']
+        self.player_start = tuple(self.header['player_start'])
+        self.bounds = tuple(self.header['bounds'])
+        self.tiles = None
+        self.tile_pool = None
+        if batch is not None:  # headless: bez grafiky sa dlaždice nevytvárajú, prstienky a triggery áno
+            tileset_path = os.path.join(PlayerSprite.SPRITES_PATH, self.header['tileset'])
+            try:
+                self.tiles = ResourceManager.get_tileset(tileset_path, self.tile_size)
+            except Exception as e:
+                print(f"Failed to load tileset: {e}")
+        if self.tiles is not None:
+            any_tile = next((tile for tile in self.tiles if tile is not None), None)
+            if any_tile is None:
+                # Úplne priehľadný tileset - nie je čo kresliť, level ide ako bez tilesetu
+                print(f"Tileset '{self.header['tileset']}' has no visible tiles")
+            else:
+                self.tile_pool = ObjectPool(lambda pool: self._create_tile_sprite(any_tile, batch))
+        self.chunks = {}       # index -> (sprity dlaždíc, id prstienkov)
+        self.triggers = {}     # (chunk, poradie) -> trigger z načítaných chunkov, ktorý ešte nenastal
+        self.fired = set()     # triggery, ktoré už nastali (ostanú tak aj po uvoľnení chunku)
+        self.center_chunk = None
+        self.stream(self.player_start[0])  # okolie štartu je načítané hneď, nie až po prvom kroku simulácie
+
+    @staticmethod
+    def _create_tile_sprite(image, batch):
+        sprite = pyglet.sprite.Sprite(image, batch=batch)
+        sprite.visible = False
+        return sprite
+
+    def update(self, center_x):
+        """Načíta/uvoľní chunky okolo hráča a vráti triggery, ku ktorým práve došiel (väčšinou prázdne)."""
+        if int(center_x // self.chunk_px) != self.center_chunk:
+            self.stream(center_x)
+        if not self.triggers:
+            return ()
+        reached = [trigger_id for trigger_id, trigger in self.triggers.items() if center_x >= trigger['x']]
+        for trigger_id in reached:
+            self.fired.add(trigger_id)
+        return [self.triggers.pop(trigger_id) for trigger_id in reached]
+
+    def stream(self, center_x):
+        self.center_chunk = center_chunk = int(center_x // self.chunk_px)
+        # Dosah sa počíta od okrajov chunku, v ktorom je hráč, takže chunky sa menia len pri prechode hranicou
+        low, _ = self.camera.awake_range(center_chunk * self.chunk_px)
+        _, high = self.camera.awake_range((center_chunk + 1) * self.chunk_px)
+        first = max(0, int(low // self.chunk_px))
+        last = min(len(self.offsets) - 1, int(high // self.chunk_px))
+        for index in [index for index in self.chunks
+                      if index < first - self.UNLOAD_MARGIN or index > last + self.UNLOAD_MARGIN]:
+            self.unload_chunk(index)
+        for index in range(first, last + 1):
+            if index not in self.chunks:
+                self.load_chunk(index)
+
+    def load_chunk(self, index):
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offsets[index])
+            chunk = json.loads(f.readline())
+        sprites = []
+        if self.tile_pool is not None:
+            chunk_x = index * self.chunk_px
+            for row, tile_row in enumerate(chunk['tiles']):
+                y = self.origin_y + (self.rows - 1 - row) * self.tile_size
+                for column, tile in enumerate(tile_row):
+                    if tile < 0 or self.tiles[tile] is None:
+                        continue
+                    sprite = self.tile_pool.acquire()
+                    sprite.image = self.tiles[tile]
+                    sprite.update(x=chunk_x + column * self.tile_size, y=y)
+                    sprite.visible = True
+                    sprites.append(sprite)
+        ring_ids = []
+        for i, (x, y) in enumerate(chunk['rings']):
+            ring_id = (index, i)
+            self.rings_manager.spawn(ring_id, x, y)
+            ring_ids.append(ring_id)
+        for i, trigger in enumerate(chunk['triggers']):
+            if (index, i) not in self.fired:
+                self.triggers[index, i] = trigger
+        self.chunks[index] = (sprites, ring_ids)
+
+    def unload_chunk(self, index):
+        sprites, ring_ids = self.chunks.pop(index)
+        for sprite in sprites:
+            sprite.visible = False
+            self.tile_pool.release(sprite)
+        for ring_id in ring_ids:
+            self.rings_manager.despawn(ring_id)
+        for trigger_id in [trigger_id for trigger_id in self.triggers if trigger_id[0] == index]:
+            del self.triggers[trigger_id]
+
 # === Ring Counter (UI) ===
 class RingCounter:
     def __init__(self, icon_path, x=30, y=30):
-        self.icon = pyglet.sprite.Sprite(pyglet.image.load(icon_path), x=x, y=y)
+        self.icon = pyglet.sprite.Sprite(ResourceManager.get_image(icon_path), x=x, y=y)
         self.count = 0
         self.label = pyglet.text.Label(str(self.count),
                                        font_name='Arial',
@@ -335,7 +1959,7 @@ class Menu:
         menu_bg_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')), 'titleGif.gif')
         self.bg = pyglet.sprite.Sprite(ResourceManager.get_animation(menu_bg_path), x=0, y=0)
         game_title_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')), 'gameTitle.png')
-        game_title_image = pyglet.image.load(game_title_path)
+        game_title_image = ResourceManager.get_image(game_title_path)
         game_title_image.anchor_x = game_title_image.width // 2
         game_title_image.anchor_y = game_title_image.height // 2
         self.title = pyglet.sprite.Sprite(game_title_image, x=self.window.width // 2, y=int(self.window.height * 0.75))
@@ -358,45 +1982,167 @@ class Menu:
         self.press.draw()
 
 # === LoadingScreen Class === - hodnoty * 0.45 pre x a * 0.15 - 1000, vychádza pekne do rohu, tweakoval som strašne dlho polohu :(
+# Animácia má 92 snímok 1920x1920 - streamuje sa ako pozadie (StreamingAnimation) z cache snímok, nie celá v RAM
 class LoadingScreen:
+    PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')), 'loading.gif')
     def __init__(self, window):
         self.window = window
-        loading_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')), 'loading.gif')
-        loading_anim = ResourceManager.get_animation(loading_path)
-        self.sprite = pyglet.sprite.Sprite(loading_anim, x=self.window.width * 0.45, y=self.window.height * 0.15 - 1000)
-        for frame in self.sprite.image.frames:
-            frame.image.anchor_x = frame.image.width // 2
-            frame.image.anchor_y = frame.image.height // 2
+        self.stream = None
+        try:
+            self.stream = ResourceManager.get_streaming_animation(self.PATH)
+        except Exception as e:
+            # Bez animácie ostane aspoň nápis, hra sa dá spustiť aj tak
+            print(f"Failed to load loading screen animation: {e}")
+            self.sprite = pyglet.text.Label("Loading...", font_name='Arial', font_size=36,
+                                            x=self.window.width // 2, y=self.window.height // 2,
+                                            anchor_x='center', anchor_y='center')
+            return
+        for texture in self.stream.slots:
+            texture.anchor_x = texture.width // 2
+            texture.anchor_y = texture.height // 2
+        self.sprite = pyglet.sprite.Sprite(self.stream.texture, x=self.window.width * 0.45, y=self.window.height * 0.15 - 1000)
+    def update(self, dt):
+        if self.stream and self.stream.update(dt):
+            self.sprite.image = self.stream.texture
     def draw(self):
         self.sprite.draw()
 
 # === GameText Class ===
 class GameText:
     def __init__(self, file_path, batch, x, y):
-        image = pyglet.image.load(file_path)
+        image = ResourceManager.get_image(file_path)
         image.anchor_x = image.width // 2
         image.anchor_y = image.height // 2
         self.sprite = pyglet.sprite.Sprite(image, x=x, y=y, batch=batch)
     def draw(self):
         self.sprite.draw()
 
+# === Boss Behaviour === - bossovia sú opísaní dátami (resources/bosses.json): stavy, pohyb, útoky a pravidlá kontaktu
+# s hráčom. Pri načítaní sa každý stav preloží na tabuľku (handler, parametre) - kroky sú metódy Boss.step_*, pravidlá
+# kontaktu BossManager.contact_*. V ticku sa len prejde tabuľka aktuálneho stavu, bez isinstance a vetvenia podľa typu,
+# takže cena ticku nerastie s počtom druhov bossov. Nový boss alebo iné ladenie (rýchlosti, cooldowny) = zmena v JSON.
+class BossBehaviour:
+    DEFAULT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../resources/bosses.json'))
+    # Parametre krokov, ktoré JSON môže vynechať
+    STEP_DEFAULTS = {'patrol': {'inclusive': False, 'then': None}, 'fire': {'health_scaled': False}}
+    # Parametre, bez ktorých krok nefunguje, a tie z nich, ktoré sú menom premennej (musí byť vo variables)
+    STEP_PARAMS = {'patrol': ('speed', 'min_x', 'max_x'), 'move_to_y': ('speed', 'target', 'then'),
+                   'scale': ('var', 'base', 'per_damage'), 'wait': ('timer', 'then'),
+                   'fire': ('timer', 'interval', 'offset_x', 'velocity'), 'set': ('var', 'value'),
+                   'randint': ('var', 'range')}
+    STEP_VARIABLES = ('speed', 'target', 'timer', 'var')
+    _cache = {}  # súbor -> {meno: BossBehaviour}
+
+    @staticmethod
+    def load(file_path=DEFAULT):
+        """Všetci bossovia zo súboru (meno -> BossBehaviour) v poradí zo súboru - z neho sa vyberá náhodný boss."""
+        behaviours = BossBehaviour._cache.get(file_path)
+        if behaviours is None:
+            with open(file_path, encoding='utf-8') as f:
+                definitions = json.load(f)
+            behaviours = {name: BossBehaviour(name, definition) for name, definition in definitions.items()}
+            BossBehaviour._cache[file_path] = behaviours
+        return behaviours
+
+    @staticmethod
+    def animation_files(behaviours):
+        """Súbory animácií všetkých bossov (bez duplikátov) - zbalia sa do atlasu pri štarte, aj keď sa boss spawne neskôr."""
+        files = {}
+        for behaviour in behaviours.values():
+            files.update(dict.fromkeys(behaviour.animations.values()))
+        return [os.path.join(PlayerSprite.SPRITES_PATH, file_name) for file_name in files]
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.health = definition['health']
+        self.spawn = tuple(definition['spawn'])
+        self.size = tuple(definition['size'])  # rozmery sprite-u v headless režime (ako HITBOX_WIDTH/HEIGHT entít)
+        self.hitbox_front = definition.get('hitbox_front')  # útočí len špic vpredu (px), None = celý sprite
+        self.invulnerability = definition.get('invulnerability', 3.0)  # imunita bossa po zásahu (s)
+        self.player_invulnerability = definition.get('player_invulnerability', 3.0)  # imunita hráča po zásahu (s)
+        self.variables = definition.get('variables', {})
+        self.initial_state = definition['initial_state']
+        states = definition['states']
+        if self.initial_state not in states:
+            raise ValueError(f"Boss {name}: unknown initial state '{self.initial_state}'")
+        self.animations = {}  # (stav, smer) -> súbor v SPRITES_PATH
+        self.steps = {}       # stav -> ((Boss.step_*, parametre), ...) - každý tick
+        self.enter = {}       # stav -> kroky pri prechode do stavu (nastavenie časovača, náhodný cieľ...)
+        self.contact = {}     # stav -> ((BossManager.contact_*, parametre), ...) - po kroku bossa
+        for state, spec in states.items():
+            for direction, file_name in spec['animations'].items():
+                self.animations[state, direction] = file_name
+            self.steps[state] = self.compile(state, spec.get('steps', ()), 'do', Boss, 'step_', states)
+            self.enter[state] = self.compile(state, spec.get('enter', ()), 'do', Boss, 'step_', states)
+            self.contact[state] = self.compile(state, spec.get('contact', definition.get('contact', ())), 'rule',
+                                               BossManager, 'contact_', states)
+
+    def compile(self, state, entries, key, owner, prefix, states):
+        # Meno z JSON -> funkcia sa nájde raz tu, chyba v dátach sa ukáže pri načítaní a nie až počas súboja
+        table = []
+        for entry in entries:
+            handler = getattr(owner, prefix + entry[key], None)
+            if handler is None:
+                raise ValueError(f"Boss {self.name}, state {state}: unknown {prefix.rstrip('_')} '{entry[key]}'")
+            for param in self.STEP_PARAMS.get(entry[key], ()):
+                if param not in entry:
+                    raise ValueError(f"Boss {self.name}, state {state}: {entry[key]} needs '{param}'")
+            for param in self.STEP_VARIABLES:
+                if param in entry and entry[param] not in self.variables:
+                    raise ValueError(f"Boss {self.name}, state {state}: unknown variable '{entry[param]}'")
+            if entry.get('then') is not None and entry['then'] not in states:
+                raise ValueError(f"Boss {self.name}, state {state}: unknown state '{entry['then']}'")
+            table.append((handler, {**self.STEP_DEFAULTS.get(entry[key], {}), **entry}))
+        return tuple(table)
+
 # === Boss Classes ===
 
-# Abstraktná trieda Boss
+# Boss - jedna trieda pre všetkých bossov, čo robia, určuje BossBehaviour (stavy a ich kroky z dát)
 class Boss:
-    def __init__(self, x, y, health, movement_speed, damage, batch):
-        self.x = x
-        self.y = y
-        self.health = health
-        self.movement_speed = movement_speed
-        self.damage = damage
+    def __init__(self, behaviour, batch, spatial_hash=None, pools=None, x=None, y=None):
+        self.spatial_hash = spatial_hash if spatial_hash is not None else SpatialHash()
+        self.pools = pools if pools is not None else EntityPools(batch, self.spatial_hash)
+        self.behaviour = behaviour
+        self.name = behaviour.name
+        self.x = behaviour.spawn[0] if x is None else x
+        self.y = behaviour.spawn[1] if y is None else y
+        self.health = behaviour.health
         self.batch = batch  # Tu odovzdávame batch (pozor na hitbox - overit musím podľa konzolového výpisu niekedy inokedy, nechce sa mi teraz)
         self.sprite = None
+        self.animator = None
         self.direction = 'left'
         self.active = True
         self.hit_cooldown = 0
+        self.vars = dict(behaviour.variables)  # premenné krokov (rýchlosti, časovače, cieľ...) podľa mien z JSON
+        self.deferred_dt = 0.0  # čas z tickov, v ktorých ho BossManager pre budget neaktualizoval
+        self.encounter = None   # vlna (Encounter), z ktorej boss je
+        self.enter(behaviour.initial_state)  # nastaví state a steps (tabuľka krokov aktuálneho stavu), spustí enter kroky
+        self.create_animated_sprite((self.state, self.direction))
+    def create_animated_sprite(self, state):
+        """Sprite s animáciami bossa ((stav, smer) -> súbor v SPRITES_PATH), začína v stave state."""
+        animations = AnimationStateMachine.load({key: os.path.join(PlayerSprite.SPRITES_PATH, file_name)
+                                                 for key, file_name in self.behaviour.animations.items()})
+        self.sprite = create_sprite(animations[state], self.x, self.y, self.batch, self.behaviour.size)
+        self.sprite.anchor_x = 0
+        self.sprite.anchor_y = 0
+        self.animator = AnimationStateMachine(self.sprite, animations, state)
     def update(self, dt):
-        raise NotImplementedError
+        if not self.active:
+            return
+        self.update_cooldown(dt)
+        # Kroky stavu z tabuľky. Prechod do iného stavu platí od ďalšieho ticku (zvyšné kroky starého stavu dobehnú),
+        # animácia ide podľa stavu na začiatku kroku a smeru na jeho konci
+        state = self.state
+        for handler, params in self.steps:
+            handler(self, params, dt)
+        self.animator.set((state, self.direction))
+        self.sprite.x = self.x
+        self.sprite.y = self.y
+    def enter(self, state):
+        self.state = state
+        self.steps = self.behaviour.steps[state]
+        for handler, params in self.behaviour.enter[state]:
+            handler(self, params, 0)
     def draw(self):
         if self.sprite:
             self.sprite.draw()
@@ -404,248 +2150,241 @@ class Boss:
         if self.hit_cooldown > 0:
             return
         self.health -= amount
-        self.hit_cooldown = 3.0
+        self.hit_cooldown = self.behaviour.invulnerability
+        Audio.play('boss_hit')
         print(f"Boss health: {self.health}")
         if self.health <= 0:
             self.active = False
+            self.spatial_hash.remove(self)
             if self.sprite is not None:
                 self.sprite.delete()
                 self.sprite = None
+    def get_bounds(self):
+        """Celý obdĺžnik sprite-u (na rozdiel od get_hitbox, ktorý môže byť len časť - napr. špic Eggdrilla)."""
+        return (self.x, self.y, self.x + self.sprite.width, self.y + self.sprite.height)
+    def get_hitbox(self):
+        front = self.behaviour.hitbox_front
+        if front is None:
+            return self.get_bounds()
+        # Len špic v smere pohybu
+        if self.direction == 'right':
+            return (self.x + self.sprite.width - front, self.y, self.x + self.sprite.width, self.y + self.sprite.height)
+        else:
+            return (self.x, self.y, self.x + front, self.y + self.sprite.height)
     def update_cooldown(self, dt):
         if self.hit_cooldown > 0:
             self.hit_cooldown -= dt
             if self.hit_cooldown < 0:
                 self.hit_cooldown = 0
 
+    # --- Kroky správania ("do": "patrol" -> step_patrol), params sú parametre kroku z JSON, premenné sú v self.vars ---
+    def step_patrol(self, params, dt):
+        """Let tam a späť medzi min_x a max_x rýchlosťou z premennej speed. Na okraji sa otočí (a prejde do stavu then)."""
+        speed = self.vars[params['speed']]
+        if self.direction == 'left':
+            self.x -= speed * dt
+            turned = self.x <= params['min_x'] if params['inclusive'] else self.x < params['min_x']
+            if turned:
+                self.x = params['min_x']
+                self.direction = 'right'
+        else:
+            self.x += speed * dt
+            turned = self.x >= params['max_x'] if params['inclusive'] else self.x > params['max_x']
+            if turned:
+                self.x = params['max_x']
+                self.direction = 'left'
+        if turned and params['then'] is not None:
+            self.enter(params['then'])
+    def step_move_to_y(self, params, dt):
+        """Zvislý pohyb k premennej target, po jej dosiahnutí prechod do stavu then."""
+        speed = self.vars[params['speed']]
+        target_y = self.vars[params['target']]
+        if self.y < target_y:
+            self.y += speed * dt
+            if self.y >= target_y:
+                self.y = target_y
+                self.enter(params['then'])
+        elif self.y > target_y:
+            self.y -= speed * dt
+            if self.y <= target_y:
+                self.y = target_y
+                self.enter(params['then'])
+    def step_scale(self, params, dt):
+        """Premenná rastie s každým strateným životom: base + (plné zdravie - zdravie) * per_damage."""
+        self.vars[params['var']] = params['base'] + (self.behaviour.health - self.health) * params['per_damage']
+    def step_wait(self, params, dt):
+        """Odpočítava časovač, po jeho uplynutí prechod do stavu then."""
+        self.vars[params['timer']] -= dt
+        if self.vars[params['timer']] <= 0:
+            self.enter(params['then'])
+    def step_fire(self, params, dt):
+        """Projektil v smere pohybu každých interval sekúnd (pri health_scaled kratší s nižším zdravím)."""
+        self.vars[params['timer']] -= dt
+        if self.vars[params['timer']] <= 0:
+            velocity_x, velocity_y = params['velocity']
+            if self.direction == 'left':
+                proj_x = self.x - params['offset_x']
+                velocity_x = -velocity_x
+            else:
+                proj_x = self.x + params['offset_x']
+            # Projektil sa ďalej hýbe v EntityStore (BossManager.update_projectiles), boss si ho nepamätá
+            self.pools.projectiles.acquire().spawn(proj_x, self.y, velocity_x, velocity_y,
+                                                   self.behaviour.player_invulnerability)
+            interval = params['interval']
+            if params['health_scaled']:
+                interval = interval * (self.health / self.behaviour.health)
+            self.vars[params['timer']] = interval
+    def step_set(self, params, dt):
+        self.vars[params['var']] = params['value']
+    def step_randint(self, params, dt):
+        self.vars[params['var']] = random.randint(*params['range'])
+
 # Projectile Class - lietajúce strely, ktoré dokážu hráča zranit
 class Projectile:
-    def __init__(self, file_path, batch, x, y, velocity_x, velocity_y):
+    HITBOX_WIDTH = 32
+    HITBOX_HEIGHT = 32
+    # Vytvára sa skrytý (cez EntityPools), do hry ho pustí až spawn(). Poloha a rýchlosť sú v EntityStore
+    # (EntityPools.projectile_store) - pohyb, dopad na zem aj zásah hráča počíta BossManager pre všetky projektily naraz
+    def __init__(self, file_path, batch, store, spatial_hash=None, pool=None):
         self.batch = batch
-        self.sprite = pyglet.sprite.Sprite(ResourceManager.get_animation(file_path), x=x, y=y, batch=self.batch)
-        self.x = x
-        self.y = y
-        self.velocity_x = velocity_x
-        self.velocity_y = velocity_y
-        self.active = True
-    def update(self, dt):
-        if not self.active or self.sprite is None:
+        self.sprite = create_sprite(ResourceManager.get_animation(file_path, atlas=True), 0, 0, self.batch, (self.HITBOX_WIDTH, self.HITBOX_HEIGHT))
+        self.sprite.visible = False
+        self.sprite.paused = True
+        # Rozmery si zapamätáme, aby kolízie nečítali sprite.width (pyglet property) v každom ticku
+        self.width = self.sprite.width
+        self.height = self.sprite.height
+        self.store = store
+        self.index = None
+        self.spatial_hash = spatial_hash  # len pre kameru (culling), polohu v ňom obnovuje sync_sprites raz za snímku
+        self.pool = pool
+    @property
+    def active(self):
+        return self.index is not None
+    def spawn(self, x, y, velocity_x, velocity_y, invulnerability=3.0):
+        self.invulnerability = invulnerability  # imunita hráča po zásahu týmto projektilom (podľa bossa, ktorý ho vystrelil)
+        self.index = self.store.spawn(self, x, y, velocity_x, velocity_y, self.width, self.height)
+        self.sprite.update(x=x, y=y)
+        self.sprite.visible = True
+        self.sprite.paused = False
+        if self.spatial_hash is not None:
+            self.spatial_hash.insert(self, self.get_hitbox())
+        return self
+    def deactivate(self):
+        if not self.active:
             return
-        self.x += self.velocity_x * dt
-        self.y += self.velocity_y * dt
-        self.sprite.x = self.x
-        self.sprite.y = self.y
-        if self.y <= 300:
-            self.active = False
-            self.sprite.delete()
-            self.sprite = None
+        self.store.kill(self.index)
+        self.index = None
+        self.sprite.visible = False
+        self.sprite.paused = True
+        if self.spatial_hash is not None:
+            self.spatial_hash.remove(self)
+        if self.pool is not None:
+            self.pool.release(self)
     def draw(self):
         if self.active and self.sprite is not None:
             self.sprite.draw()
     def get_hitbox(self):
-        return (self.x, self.y, self.x + self.sprite.width, self.y + self.sprite.height)
+        return self.store.hitbox(self.index)
 
 # Explosion Class - výbuchy keď boss je porazený
 class Explosion:
-    def __init__(self, file_path, batch, x, y, duration=1.0):
+    HITBOX_WIDTH = 68
+    HITBOX_HEIGHT = 74
+    # Rovnako ako Projectile - skrytý z EntityPools, spawn() ho zobrazí a pustí animáciu od začiatku
+    def __init__(self, file_path, batch, pool=None):
         self.batch = batch
-        self.sprite = pyglet.sprite.Sprite(ResourceManager.get_animation(file_path), x=x, y=y, batch=self.batch)
+        self.sprite = create_sprite(ResourceManager.get_animation(file_path, atlas=True), 0, 0, self.batch, (self.HITBOX_WIDTH, self.HITBOX_HEIGHT))
+        self.sprite.visible = False
+        self.sprite.paused = True
+        self.x = 0
+        self.y = 0
+        self.duration = 0
+        self.timer = 0
+        self.pool = pool
+    def spawn(self, x, y, duration=1.0):
         self.x = x
         self.y = y
         self.duration = duration
         self.timer = duration
+        self.sprite.update(x=x, y=y)
+        self.sprite.frame_index = 0
+        self.sprite.visible = True
+        self.sprite.paused = False
+        return self
     def update(self, dt):
-        self.timer -= dt
-        if self.timer <= 0 and self.sprite is not None:
-            self.sprite.delete()
-            self.sprite = None
-    def draw(self):
-        if self.timer > 0 and self.sprite is not None:
-            self.sprite.draw()
-
-# Eggman (Boss) Class – damage hráča dokážu dať len projektily
-class Eggman(Boss):
-    def __init__(self, batch):
-        super().__init__(x=3000, y=650, health=10, movement_speed=150, damage=1, batch=batch)
-        eggman_left_path = os.path.join(PlayerSprite.SPRITES_PATH, 'eggman_left.gif')
-        eggman_right_path = os.path.join(PlayerSprite.SPRITES_PATH, 'eggman_right.gif')
-        self.anim_left = ResourceManager.get_animation(eggman_left_path)
-        self.anim_right = ResourceManager.get_animation(eggman_right_path)
-        self.sprite = pyglet.sprite.Sprite(self.anim_right, x=self.x, y=self.y, batch=self.batch)
-        self.sprite.anchor_x = 0
-        self.sprite.anchor_y = 0
-        self.projectile_timer = 3.0
-        self.projectiles = []
-    def update(self, dt):
-        if not self.active:
+        if self.timer <= 0:
             return
-        self.update_cooldown(dt)
-        if self.direction == 'left':
-            self.x -= self.movement_speed * dt
-            if self.x < 1000:
-                self.x = 1000
-                self.direction = 'right'
-        else:
-            self.x += self.movement_speed * dt
-            if self.x > 3200:
-                self.x = 3200
-                self.direction = 'left'
-        self.movement_speed = 150 + (10 - self.health) * 10
-        if self.direction == 'left':
-            self.sprite.image = self.anim_left
-        else:
-            self.sprite.image = self.anim_right
-        self.sprite.x = self.x
-        self.sprite.y = self.y
-        self.projectile_timer -= dt
-        if self.projectile_timer <= 0:
-            self.spawn_projectile()
-            self.projectile_timer = 3.0 * (self.health / 10.0)
-        for proj in self.projectiles:
-            proj.update(dt)
-        self.projectiles = [p for p in self.projectiles if p.active]
-    def spawn_projectile(self):
-        proj_path = os.path.join(PlayerSprite.SPRITES_PATH, 'projectile.gif')
-        if self.direction == 'left':
-            proj_x = self.x - 50
-            velocity_x = -200
-        else:
-            proj_x = self.x + 50
-            velocity_x = 200
-        proj_y = self.y
-        proj_velocity_y = -150
-        projectile = Projectile(proj_path, self.batch, proj_x, proj_y, velocity_x, proj_velocity_y)
-        self.projectiles.append(projectile)
+        self.timer -= dt
+        if self.timer <= 0:
+            self.sprite.visible = False
+            self.sprite.paused = True
+            if self.pool is not None:
+                self.pool.release(self)
     def draw(self):
-        if self.active and self.sprite is not None:
+        if self.timer > 0:
             self.sprite.draw()
-        for proj in self.projectiles:
-            proj.draw()
-
-# Eggdrill (Boss) Class – damage hráča dáva len špic hitboxu (rozšírená o 10 pixelov navyše)
-class Eggdrill(Boss):
-    def __init__(self, batch):
-        super().__init__(x=2500, y=300, health=10, movement_speed=200, damage=1, batch=batch)
-        eggdrill_left_path = os.path.join(PlayerSprite.SPRITES_PATH, 'eggdrill_left.gif')
-        eggdrill_right_path = os.path.join(PlayerSprite.SPRITES_PATH, 'eggdrill_right.gif')
-        self.anim_left = ResourceManager.get_animation(eggdrill_left_path)
-        self.anim_right = ResourceManager.get_animation(eggdrill_right_path)
-        self.sprite = pyglet.sprite.Sprite(self.anim_right, x=self.x, y=self.y, batch=self.batch)
-        self.sprite.anchor_x = 0
-        self.sprite.anchor_y = 0
 
-    def update(self, dt):
-        if not self.active:
+# === Encounter === - vlny nepriateľov z triggeru levelu ({"type": "waves", "waves": [...]}). Vlna je zoznam skupín
+# bossov: meno z resources/bosses.json, počet a rozsah x, v ktorom sa rovnomerne rozostavia. Ďalšia vlna príde, keď je
+# predošlá celá porazená a uplynie jej delay. Spawnutých bossov potom BossManager riadi ako každého iného bossa.
+class Encounter:
+    def __init__(self, waves, behaviours):
+        for wave in waves:
+            for group in wave['enemies']:
+                if group['boss'] not in behaviours:
+                    raise ValueError(f"Wave enemy: unknown boss '{group['boss']}'")
+        self.waves = waves
+        self.next_wave = 0
+        self.alive = 0     # živí bossovia aktuálnej vlny (BossManager ich odpočíta pri porážke)
+        self.timer = None  # odpočet delay ďalšej vlny, beží až keď je predošlá porazená
+
+    @property
+    def finished(self):
+        return self.next_wave >= len(self.waves) and self.alive == 0
+
+    def update(self, dt, manager):
+        if self.alive or self.next_wave >= len(self.waves):
             return
-        # Pridáme update cooldown, aby sa hit_cooldown znižoval
-        self.update_cooldown(dt)
-        if self.direction == 'left':
-            self.x -= self.movement_speed * dt
-            if self.x < 1000:
-                self.x = 1000
-                self.direction = 'right'
-        else:
-            self.x += self.movement_speed * dt
-            if self.x > 3200:
-                self.x = 3200
-                self.direction = 'left'
-        self.movement_speed = 200 + (10 - self.health) * 15
-        if self.direction == 'left':
-            self.sprite.image = self.anim_left
-        else:
-            self.sprite.image = self.anim_right
-        self.sprite.x = self.x
-        self.sprite.y = self.y
-
-    def get_hitbox(self):
-        # Rozšírime hitbox o 10 pixelov dopredu
-        if self.direction == 'right':
-            return (self.x + self.sprite.width - 30, self.y, self.x + self.sprite.width, self.y + self.sprite.height)
-        else:
-            return (self.x, self.y, self.x + 30, self.y + self.sprite.height)
-
-    def draw(self):
-        if self.active and self.sprite is not None:
-            self.sprite.draw()
-
-# MetalSonic (Boss) Class
-class MetalSonic(Boss):
-    def __init__(self, batch):
-        super().__init__(x=1000, y=700, health=10, movement_speed=400, damage=1, batch=batch)
-        right_img = os.path.join(PlayerSprite.SPRITES_PATH, 'metalsonic_right.gif')
-        right_fly_img = os.path.join(PlayerSprite.SPRITES_PATH, 'metalsonic_right_fly.gif')
-        left_img = os.path.join(PlayerSprite.SPRITES_PATH, 'metalsonic_left.gif')
-        left_fly_img = os.path.join(PlayerSprite.SPRITES_PATH, 'metalsonic_left_fly.gif')
-        self.anim_right = ResourceManager.get_animation(right_img)
-        self.anim_right_fly = ResourceManager.get_animation(right_fly_img)
-        self.anim_left = ResourceManager.get_animation(left_img)
-        self.anim_left_fly = ResourceManager.get_animation(left_fly_img)
-        self.sprite = pyglet.sprite.Sprite(self.anim_right, x=self.x, y=self.y, batch=self.batch)
-        self.sprite.anchor_x = 0
-        self.sprite.anchor_y = 0
-        self.state = "flying"  # Stavy: "flying", "waiting", "moving_vertical"
-        self.wait_timer = 0
-        self.target_y = self.y
-    def update(self, dt):
-        if not self.active:
+        wave = self.waves[self.next_wave]
+        if self.timer is None:
+            self.timer = wave.get('delay', 0.0)
+        self.timer -= dt
+        if self.timer > 0:
             return
-        self.update_cooldown(dt)
-        speed = 400 + (10 - self.health) * 50
-        if self.state == "flying":
-            if self.direction == 'right':
-                self.x += speed * dt
-                if self.x >= 3200:
-                    self.x = 3200
-                    self.direction = 'left'
-                    self.state = "waiting"
-                    self.wait_timer = 4.0
-            else:
-                self.x -= speed * dt
-                if self.x <= 1000:
-                    self.x = 1000
-                    self.direction = 'right'
-                    self.state = "waiting"
-                    self.wait_timer = 4.0
-            if self.direction == 'right':
-                self.sprite.image = self.anim_right_fly
-            else:
-                self.sprite.image = self.anim_left_fly
-        elif self.state == "waiting":
-            self.wait_timer -= dt
-            if self.direction == 'right':
-                self.sprite.image = self.anim_right
-            else:
-                self.sprite.image = self.anim_left
-            if self.wait_timer <= 0:
-                self.target_y = random.randint(300, 700)
-                self.state = "moving_vertical"
-        elif self.state == "moving_vertical":
-            vertical_speed = 100 + (10 - self.health) * 20
-            if self.y < self.target_y:
-                self.y += vertical_speed * dt
-                if self.y >= self.target_y:
-                    self.y = self.target_y
-                    self.state = "flying"
-            elif self.y > self.target_y:
-                self.y -= vertical_speed * dt
-                if self.y <= self.target_y:
-                    self.y = self.target_y
-                    self.state = "flying"
-            if self.direction == 'right':
-                self.sprite.image = self.anim_right_fly
-            else:
-                self.sprite.image = self.anim_left_fly
-        self.sprite.x = self.x
-        self.sprite.y = self.y
-    def draw(self):
-        if self.active and self.sprite is not None:
-            self.sprite.draw()
-    def get_hitbox(self):
-        return (self.x, self.y, self.x + self.sprite.width, self.y + self.sprite.height)
+        self.next_wave += 1
+        self.timer = None
+        for group in wave['enemies']:
+            behaviour = manager.behaviours[group['boss']]
+            count = group.get('count', 1)
+            x1, x2 = group.get('x', (behaviour.spawn[0], behaviour.spawn[0]))
+            for i in range(count):
+                boss = manager.spawn(behaviour, x1 + (x2 - x1) * i / max(count - 1, 1), group.get('y'))
+                boss.encounter = self
+                self.alive += 1
+        print(f"Wave {self.next_wave}/{len(self.waves)}: {self.alive} enemies")
 
 # === BossManager – s prístupom k window, ui_batch a hre ===
+# Riadi všetkých živých bossov naraz (boss z triggeru levelu aj vlny). Cena ticku je ohraničená: najviac
+# UPDATE_BUDGET aktualizácií bossov za tick. Pri viac bossoch v dosahu sa polovica budgetu dá najbližším k hráčovi
+# (tí sa aktualizujú každý tick), zvyšok sa strieda medzi vzdialenejšími - dostane ho ten, kto čaká najdlhšie, a
+# aktualizuje sa naraz so všetkým zmeškaným časom. Budget je v počte aktualizácií, nie v ms, aby simulácia ostala
+# deterministická (replay, headless); koľko ms to je, ukáže src/boss_benchmark.py.
 class BossManager:
-    def __init__(self, batch, window, ui_batch, game):
-        self.boss = None
+    UPDATE_BUDGET = 64
+
+    def __init__(self, batch, window, ui_batch, game, spatial_hash=None, camera=None, bosses_path=BossBehaviour.DEFAULT):
+        # Mená bossov v triggeroch levelu -> ich správanie z dát
+        self.behaviours = BossBehaviour.load(bosses_path)
+        self.spatial_hash = spatial_hash if spatial_hash is not None else SpatialHash()
+        self.camera = camera  # s kamerou boss ďaleko od hráča spí (neaktualizuje sa)
+        # Projektily, výbuchy a damage texty sa alokujú raz pri vytvorení sveta, nie počas súboja
+        self.pools = EntityPools(batch, self.spatial_hash, ui_batch)
+        self.bosses = []      # živí bossovia (porazený v ňom ostane do ďalšieho ticku, potom vybuchne)
+        self.defeated = []    # porazení v tomto ticku
+        self.encounters = []
+        self.boss = None      # prvý spawnutý boss (world_state, výsledky headless súbojov)
+        self.budget = self.UPDATE_BUDGET  # None = bez limitu
+        self.updated = 0      # koľko bossov sa aktualizovalo v poslednom ticku
         self.batch = batch
         self.window = window
         self.ui_batch = ui_batch
@@ -654,103 +2393,156 @@ class BossManager:
         self.explosions = []
         self.win_displayed = False
         self.lose_displayed = False
-    def spawn_boss(self):
-        if not self.boss_spawned:
-            boss_class = random.choice([Eggman, Eggdrill, MetalSonic])
-            self.boss = boss_class(self.batch)
-            self.boss_spawned = True
-            print("Boss spawned:", type(self.boss).__name__)
+    def spawn_boss(self, candidates=None):
+        # candidates: mená bossov z triggeru levelu, boss sa vyberie náhodne z nich
+        behaviour = random.choice([self.behaviours[name] for name in candidates or self.behaviours])
+        boss = self.spawn(behaviour)
+        print("Boss spawned:", boss.name)
+
+    def spawn(self, behaviour, x=None, y=None):
+        boss = Boss(behaviour, self.batch, self.spatial_hash, self.pools, x, y)
+        # V hashi je boss kvôli kamere (culling), kolízie s ním sa stále počítajú priamo.
+        # Poloha v hashi sa preto obnovuje len raz za snímku (Game.interpolate), nie v každom kroku simulácie
+        self.spatial_hash.insert(boss, boss.get_bounds())
+        self.bosses.append(boss)
+        if self.boss is None:
+            self.boss = boss
+        self.boss_spawned = True
+        return boss
+
+    def start_encounter(self, waves):
+        self.encounters.append(Encounter(waves, self.behaviours))
+        self.boss_spawned = True
+
+    def nearest_boss(self, x):
+        return min((boss for boss in self.bosses if boss.active), key=lambda boss: abs(boss.x - x), default=None)
 
     def update(self, dt, player, player_rings):
-        # Ak je boss spawnutý a aktívny, aktualizujeme jeho stav
-        if self.boss_spawned and self.boss and self.boss.active:
-            self.boss.update(dt)
-
-            # Všeobecná kolízia: ak Sonic koliduje s bossom a nie je skákajúci,
-            # Sonic dostáva damage
-            if self.check_collision(player, self.boss) and player.hit_cooldown <= 0:
-                if not player.is_jumping:
-                    player.hit_cooldown = 3.0
-                    player_rings = max(player_rings - 1, 0)
-                    dmg_x = (player.x + player.sprite.width / 2) if player.sprite else player.x
-                    dmg_y = (player.y + player.sprite.height + 20) if player.sprite else player.y
-                    self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-
-            # Špecifické spracovanie podľa typu bossa:
-            if isinstance(self.boss, Eggman):
-                # Eggman nedáva damage hráčovi priamym dotykom, iba projektilmi
-                for proj in self.boss.projectiles:
-                    if self.check_collision(player, proj) and player.hit_cooldown <= 0:
-                        player.hit_cooldown = 3.0
-                        proj.active = False
-                        if proj.sprite is not None:
-                            proj.sprite.delete()
-                            proj.sprite = None
-                        player_rings = max(player_rings - 1, 0)
-                        dmg_x = (player.x + player.sprite.width / 2) if player.sprite else player.x
-                        dmg_y = (player.y + player.sprite.height + 20) if player.sprite else player.y
-                        self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-                        # ak Sonic je skákajúci a dotkne sa Eggmana, boss dostane damage.
-                if player.is_jumping and self.check_collision(player,
-                                                              self.boss) and self.boss.hit_cooldown <= 0:
-                    self.boss.take_damage(1)
-                    player.hit_cooldown = 3.0
-                    dmg_x = (self.boss.x + self.boss.sprite.width / 2) if self.boss.sprite else self.boss.x
-                    dmg_y = (self.boss.y + self.boss.sprite.height) if self.boss.sprite else self.boss.y
-                    self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-            elif isinstance(self.boss, Eggdrill):
-                ex1, ey1, ex2, ey2 = self.boss.get_hitbox()
-                if (player.x + player.sprite.width > ex1 and player.x < ex2 and
-                        player.y + player.sprite.height > ey1 and player.y < ey2):
-                    if player.hit_cooldown <= 0 and not player.is_jumping:
-                        player.hit_cooldown = 3.0
-                        player_rings = max(player_rings - 1, 0)
-                        dmg_x = (player.x + player.sprite.width / 2) if player.sprite else player.x
-                        dmg_y = (player.y + player.sprite.height + 20) if player.sprite else player.y
-                        self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-                # Ak Sonic je skákajúci a dotkne sa Eggdrilla a boss nie je v imunite, boss dostane damage
-                if player.is_jumping and self.check_collision(player, self.boss) and self.boss.hit_cooldown <= 0:
-                    self.boss.take_damage(1)
-                    player.hit_cooldown = 3.0
-                    dmg_x = (self.boss.x + self.boss.sprite.width / 2) if self.boss.sprite else self.boss.x
-                    dmg_y = (self.boss.y + self.boss.sprite.height) if self.boss.sprite else self.boss.y
-                    self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-            elif isinstance(self.boss, MetalSonic):
-                if self.boss.state == "flying":
-                    if self.check_collision(player, self.boss) and player.hit_cooldown <= 0:
-                        if player.is_jumping and self.boss.hit_cooldown <= 0:
-                            self.boss.take_damage(1)
-                            player.hit_cooldown = 3.0
-                            dmg_x = (self.boss.x + self.boss.sprite.width / 2) if self.boss.sprite else self.boss.x
-                            dmg_y = (self.boss.y + self.boss.sprite.height) if self.boss.sprite else self.boss.y
-                            self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-                        elif not player.is_jumping:
-                            player.hit_cooldown = 3.0
-                            player_rings = max(player_rings - 1, 0)
-                            dmg_x = (player.x + player.sprite.width / 2) if player.sprite else player.x
-                            dmg_y = (player.y + player.sprite.height + 20) if player.sprite else player.y
-                            self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-                # Aj mimo stavu "flying": ak Sonic je skákajúci a dotkne sa bossa a boss nie je v cooldowne (nemá imunitu), tak dostane damage.
-                if player.is_jumping and self.check_collision(player, self.boss) and self.boss.hit_cooldown <= 0:
-                    self.boss.take_damage(1)
-                    player.hit_cooldown = 3.0
-                    dmg_x = (self.boss.x + self.boss.sprite.width / 2) if self.boss.sprite else self.boss.x
-                    dmg_y = (self.boss.y + self.boss.sprite.height) if self.boss.sprite else self.boss.y
-                    self.game.damage_texts.append(DamageText("-1 HP", dmg_x, dmg_y, 1.0))
-            # V tejto vetve vždy vrátime hodnotu player_rings
-            return player_rings
-
-        elif self.boss_spawned and self.boss and not self.boss.active:
-            if not self.explosions:
-                self.spawn_explosions(self.boss.x, self.boss.y)
+        # Porazení v minulom ticku vybuchnú a zmiznú zo zoznamu
+        if self.defeated:
+            for boss in self.defeated:
+                self.bosses.remove(boss)
+                self.spawn_explosions(boss.x, boss.y)
+                if boss.encounter is not None:
+                    boss.encounter.alive -= 1
+            self.defeated = []
+        for encounter in self.encounters:
+            encounter.update(dt, self)
+        if self.explosions:
             for exp in self.explosions:
                 exp.update(dt)
-            if all(exp.timer <= 0 for exp in self.explosions) and not self.win_displayed:
-                self.win_displayed = True
-                self.display_end_message("gameText2.png")  # YOU WIN
-            return player_rings
-
-        return player_rings
+            self.explosions = [exp for exp in self.explosions if exp.timer > 0]
+
+        awake = self.update_bosses(dt, player)
+        lost = 0
+        # Pravidlá kontaktu z tabuľky stavu, v ktorom je boss po svojom kroku (každé vráti stratené prstienky). Platia
+        # pre každého bossa v dosahu, aj keď v tomto ticku čakal na budget - výsledok nezávisí od poradia aktualizácií
+        for boss in awake:
+            for rule, params in boss.behaviour.contact[boss.state]:
+                lost += rule(self, boss, player, params)
+        # Projektily nepatria žiadnemu bossovi - letia a zraňujú, aj keď ich strelec už nežije, spí alebo čaká na budget
+        if self.pools.projectile_store.count:
+            self.update_projectiles(dt)
+            lost += self.check_projectiles(player)
+
+        if (not self.bosses and not self.explosions and not self.win_displayed
+                and all(encounter.finished for encounter in self.encounters)):
+            self.win_displayed = True
+            self.display_end_message("gameText2.png")  # YOU WIN
+        return max(player_rings - lost, 0)
+
+    def update_bosses(self, dt, player):
+        """Krok bossov v dosahu hráča v rámci budgetu. Vráti všetkých v dosahu (aj tých, čo čakajú na budget)."""
+        if self.camera is None:
+            awake = list(self.bosses)
+        else:
+            # Ďaleko od hráča sa nič nedeje (spiaci boss nestarne).
+            # Rovnaký test ako Camera.is_awake(boss.get_bounds()), len bez n-tice hraníc pre každého bossa
+            low, high = self.camera.awake_range(player.x)
+            awake = [boss for boss in self.bosses if boss.x + boss.sprite.width >= low and boss.x <= high]
+        updated = awake
+        if self.budget is not None and len(awake) > self.budget:
+            awake.sort(key=lambda boss: abs(boss.x - player.x))
+            near = self.budget // 2
+            for boss in awake[near:]:
+                boss.deferred_dt += dt
+            # Zo vzdialenejších tí, čo čakajú najdlhšie (pri zhode bližší - deterministické)
+            updated = awake[:near] + heapq.nlargest(self.budget - near, awake[near:], key=lambda boss: boss.deferred_dt)
+            for boss in updated[near:]:
+                boss.deferred_dt -= dt
+        for boss in updated:
+            boss.update(dt + boss.deferred_dt)
+            boss.deferred_dt = 0.0
+        self.updated = len(updated)
+        return awake
+
+    def update_projectiles(self, dt):
+        # Všetky projektily naraz: pohyb nad stĺpcami store, potom tie, čo dopadli na zem, späť do poolu
+        store = self.pools.projectile_store
+        if not store.count:
+            return
+        store.move(dt)
+        for index in store.below(300):
+            store.entities[index].deactivate()
+
+    # --- Pravidlá kontaktu ("rule": "body" -> contact_body), vrátia počet prstienkov, ktoré hráč stratil ---
+    def contact_body(self, boss, player, params):
+        """Dotyk s celým spritom bossa zraní hráča, ktorý neskáče."""
+        if self.check_collision(player, boss) and player.hit_cooldown <= 0 and not player.is_jumping:
+            return self.hurt_player(player, boss.behaviour.player_invulnerability)
+        return 0
+
+    def contact_hitbox(self, boss, player, params):
+        """Zraní hráča, ktorý neskáče, len útočná časť bossa (get_hitbox, napr. špic Eggdrilla)."""
+        ex1, ey1, ex2, ey2 = boss.get_hitbox()
+        if (player.x + player.sprite.width > ex1 and player.x < ex2 and
+                player.y + player.sprite.height > ey1 and player.y < ey2):
+            if player.hit_cooldown <= 0 and not player.is_jumping:
+                return self.hurt_player(player, boss.behaviour.player_invulnerability)
+        return 0
+
+    def contact_trade(self, boss, player, params):
+        """Pri dotyku dostane damage ten, kto neútočí: skákajúci hráč bossa, inak boss hráča."""
+        if self.check_collision(player, boss) and player.hit_cooldown <= 0:
+            if player.is_jumping and boss.hit_cooldown <= 0:
+                self.hit_boss(boss, player)
+            elif not player.is_jumping:
+                return self.hurt_player(player, boss.behaviour.player_invulnerability)
+        return 0
+
+    def contact_stomp(self, boss, player, params):
+        """Skákajúci hráč dá bossovi damage, ak boss nie je v imunite."""
+        if player.is_jumping and self.check_collision(player, boss) and boss.hit_cooldown <= 0:
+            self.hit_boss(boss, player)
+        return 0
+
+    def check_projectiles(self, player):
+        """Jeden AABB test nad všetkými projektilmi v store, zasiahnuť môže len prvý - potom je hráč v imunite."""
+        lost = 0
+        store = self.pools.projectile_store
+        for index in store.overlapping(player.get_hitbox()):
+            if player.hit_cooldown <= 0:
+                projectile = store.entities[index]
+                invulnerability = projectile.invulnerability
+                projectile.deactivate()
+                lost += self.hurt_player(player, invulnerability)
+        return lost
+
+    def hurt_player(self, player, invulnerability):
+        player.hit_cooldown = invulnerability
+        dmg_x = (player.x + player.sprite.width / 2) if player.sprite else player.x
+        dmg_y = (player.y + player.sprite.height + 20) if player.sprite else player.y
+        self.show_damage_text(dmg_x, dmg_y)
+        return 1
+
+    def hit_boss(self, boss, player):
+        boss.take_damage(1)
+        if not boss.active:
+            self.defeated.append(boss)
+        player.hit_cooldown = boss.behaviour.player_invulnerability
+        dmg_x = (boss.x + boss.sprite.width / 2) if boss.sprite else boss.x
+        dmg_y = (boss.y + boss.sprite.height) if boss.sprite else boss.y
+        self.show_damage_text(dmg_x, dmg_y)
 
     def check_collision(self, entity1, entity2):
         e1x1, e1y1 = entity1.x, entity1.y
@@ -762,15 +2554,20 @@ class BossManager:
             return False
         return not (e1x2 < e2x1 or e1x1 > e2x2 or e1y2 < e2y1 or e1y1 > e2y2)
 
+    def show_damage_text(self, x, y):
+        self.game.damage_texts.append(self.pools.damage_texts.acquire().spawn("-1 HP", x, y, 1.0))
+
     def spawn_explosions(self, x, y):
-        exp_path = os.path.join(PlayerSprite.SPRITES_PATH, 'explosion.gif')
         offsets = [(-50, -50), (50, -50), (-50, 50), (50, 50)]
+        Audio.play('explosion')
         for dx, dy in offsets:
-            exp = Explosion(exp_path, self.batch, x + dx, y + dy, duration=1.0)
+            exp = self.pools.explosions.acquire().spawn(x + dx, y + dy, duration=1.0)
             self.explosions.append(exp)
 
     def display_end_message(self, image_file):
-        end_img = pyglet.image.load(os.path.join(PlayerSprite.SPRITES_PATH, image_file))
+        if HEADLESS:  # výsledok si headless simulácia prečíta z win_displayed / lose_displayed
+            return
+        end_img = ResourceManager.get_image(os.path.join(PlayerSprite.SPRITES_PATH, image_file))
         end_img.anchor_x = end_img.width // 2
         end_img.anchor_y = end_img.height // 2
         self.end_sprite = pyglet.sprite.Sprite(end_img, x=self.window.width // 2, y=self.window.height // 2,
@@ -788,135 +2585,475 @@ class BossManager:
 # === GameText Class ===
 class GameText:
     def __init__(self, file_path, batch, x, y):
-        image = pyglet.image.load(file_path)
+        image = ResourceManager.get_image(file_path)
         image.anchor_x = image.width // 2
         image.anchor_y = image.height // 2
         self.sprite = pyglet.sprite.Sprite(image, x=x, y=y, batch=batch)
     def draw(self):
         self.sprite.draw()
 
+# === GameWorld === - herná logika jedného kroku simulácie, spoločná pre Game (s oknom) aj HeadlessSimulation
+class GameWorld:
+    def interpolated_entities(self):
+        yield self.player
+        for boss in self.boss_manager.bosses:
+            if boss.active:
+                yield boss
+
+    def simulate(self, dt):
+        # Zapamätáme si polohy pred krokom, aby sa sprity dali vykresliť medzi dvoma stavmi
+        for entity in self.interpolated_entities():
+            entity.prev_x, entity.prev_y = entity.x, entity.y
+        self.player.update(dt)
+        new_rings = self.rings_manager.update(dt, self.player)
+        self.player_rings += new_rings
+        for trigger in self.level.update(self.player.x):
+            self.on_trigger(trigger)
+        if self.boss_manager.boss_spawned:
+            player_rings = self.boss_manager.update(dt, self.player, self.player_rings)
+            if player_rings < self.player_rings:
+                Audio.play('hurt')
+            self.player_rings = player_rings
+        if self.player_rings <= 0 and not self.boss_manager.lose_displayed:
+            self.boss_manager.lose_displayed = True
+            self.boss_manager.display_end_message("gameText3.png")  # YOU LOSE -> po 3 s koniec hry
+
+    def on_trigger(self, trigger):
+        if trigger['type'] == 'boss':
+            self.boss_manager.spawn_boss(trigger.get('bosses'))
+        elif trigger['type'] == 'waves':
+            self.boss_manager.start_encounter(trigger['waves'])
+
+    def world_state(self):
+        """Stav sveta po kroku simulácie - replay ho porovnáva s nahrávkou (čísla presne, JSON ich neskresľuje)."""
+        boss = self.boss_manager.boss
+        return {'player': [self.player.x, self.player.y, self.player.velocity_x, self.player.velocity_y],
+                'rings': self.player_rings,
+                'rings_collected': self.rings_manager.collected_count,
+                'boss': boss.name if boss else None,
+                'boss_state': [boss.x, boss.y, boss.health] if boss else None,
+                # Všetci živí bossovia (vlny) - meno, poloha, zdravie
+                'bosses': [[b.name, b.x, b.y, b.health] for b in self.boss_manager.bosses if b.active],
+                'won': self.boss_manager.win_displayed,
+                'lost': self.boss_manager.lose_displayed}
+
+    def update_damage_texts(self, dt):
+        # Dohraté texty sa vrátia do poolu, label ostáva vytvorený pre ďalší zásah
+        alive = []
+        for dt_obj in self.damage_texts:
+            dt_obj.update(dt)
+            if dt_obj.timer > 0:
+                alive.append(dt_obj)
+            else:
+                dt_obj.release()
+        self.damage_texts = alive
+
 # === Game Class (s kamera follow, menu a boss fight) ===
-class Game:
-    def __init__(self):
-        self.window = pyglet.window.Window(fullscreen=True, caption="Sonic Game")
+class Game(GameWorld):
+    # Všetky animácie z foreground_batch - pri štarte sa naraz zbalia do atlasu (animácie bossov pridá preloader z ich dát)
+    ATLAS_ANIMATIONS = [getattr(PlayerSprite, attr) for attr in dir(PlayerSprite)
+                        if attr.isupper() and getattr(PlayerSprite, attr).lower().endswith('.aseprite')] + [
+        os.path.join(PlayerSprite.SPRITES_PATH, name) for name in ('ring.gif', 'projectile.gif', 'explosion.gif')]
+
+    SIM_RATE = 120
+    MAX_SIM_STEPS = 8
+
+    def __init__(self, use_atlas=True, count_draw_calls=False, sim_rate=SIM_RATE, render_rate=None, profile=False,
+                 seed=None, record_path=None, replay_path=None, level_path=Level.DEFAULT, bosses_path=BossBehaviour.DEFAULT):
+        # Replay prebehne s rovnakým seedom, krokom simulácie, levelom a bossmi ako nahrávka, inak by sa súboj rozišiel
+        self.replay = InputReplay(replay_path) if replay_path else None
+        if self.replay:
+            seed, sim_rate = self.replay.seed, self.replay.sim_rate
+            level_path = self.replay.level_path or level_path
+            bosses_path = self.replay.bosses_path or bosses_path
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        self.record_path = record_path
+        self.recorder = InputRecorder(self.seed, sim_rate, level_path, bosses_path) if record_path else None
+        self.replay_ok = None
+        self.tick = 0  # počet krokov simulácie od štartu hry
+        self.replay_frames = 0
+        # Pred prvou snímkou len okno a menu, zvyšok štartu spustí prvá snímka (start_loading)
+        with Startup.stage('window'):
+            self.window = pyglet.window.Window(fullscreen=True, caption="Sonic Game")
+        ResourceManager.use_atlas = use_atlas
+        self.draw_calls = DrawCallCounter() if count_draw_calls else None
+        # F3 zobrazí/skryje overlay profilera, --profile ho zapne hneď od štartu (aj s načítaním assetov).
+        # Overlay sa vytvorí až pri prvom zapnutí
+        self.profiler_overlay = None
+        if profile:
+            self.toggle_profiler()
         self.background_batch = pyglet.graphics.Batch()
         self.ground_batch = pyglet.graphics.Batch()
         self.foreground_batch = pyglet.graphics.Batch()
         self.ui_batch = pyglet.graphics.Batch()
 
         self.state = "menu"
-        self.camera_x = 0
 
-        self.menu = Menu(self.window)
-        self.loading = LoadingScreen(self.window)
+        with Startup.stage('menu'):
+            self.menu = Menu(self.window)
+        self.loading = None  # loading screen sa streamuje, vytvorí sa, keď je otvorený (on_loading_screen_ready)
+        self.first_frame_drawn = False
 
         # MEDIA PREHRAVAC, nasiel som z kniznice pyglet na internete
         self.music_player = None
 
-        self.background_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')),
-                                            'sunsethill_animated.gif')
-        self.background = Background(self.background_path, self.background_batch)
+        self.player_rings = 6
 
-        ground_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')),
-                                   'ground.png')
-        self.ground = Ground(ground_path, self.ground_batch, y_position=-120)
+        # Zoznam pre damage texty
+        self.damage_texts = []
 
-        self.player = Player(self.foreground_batch, self.window)
+        # Herný svet sa vytvorí až keď preloader dekóduje a nahrá všetky assety (create_world)
+        self.assets_ready = False
+        self.level_path = level_path
+        self.bosses_path = bosses_path
+        self.preloader = None
 
-        ring_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')),
-                                 'ring.gif')
-        self.rings_manager = RingsManager(ring_path, self.foreground_batch, ground_y=280, count=6)
+        self.timestep = FixedTimestep(1.0 / sim_rate, Game.MAX_SIM_STEPS)
+        self.render_rate = render_rate
 
-        ring_icon_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')),
-                                      'ringPhoto.png')
-        self.ring_counter = RingCounter(ring_icon_path, x=30, y=self.window.height - 100)
+        # Replay nečaká v menu na SPACE, hra sa spustí hneď po načítaní assetov
+        if self.replay:
+            self.state = "loading"
 
-        game_text_path = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '../aseprite/sprites')),
-                                      'gameText1.png')
-        self.game_text = GameText(game_text_path, self.foreground_batch, x=800, y=700)
+        self.window.push_handlers(self)
+        # update beží každú snímku, simulácia vo vnútri ide po pevných krokoch (FixedTimestep)
+        pyglet.clock.schedule(self.update)
 
-        self.boss_manager = BossManager(self.foreground_batch, self.window, self.ui_batch, self)
+    def create_world(self):
+        self.background = Background(self.background_path, self.background_batch)
 
-        self.player_rings = 6
+        ring_path = os.path.join(PlayerSprite.SPRITES_PATH, 'ring.gif')
+        self.spatial_hash = SpatialHash()
+        self.camera = Camera(self.window.width, self.window.height, self.spatial_hash)
+        self.rings_manager = RingsManager(ring_path, self.foreground_batch, spatial_hash=self.spatial_hash)
+        # Podlaha (dlaždice v ground_batch), prstienky a triggery bossov sú v leveli
+        self.level = Level(self.level_path, self.ground_batch, self.rings_manager, self.camera)
 
-        # Zoznam pre damage texty
-        self.damage_texts = []
+        self.player = Player(self.foreground_batch, self.window, self.level.player_start, self.level.bounds)
 
-        self.window.push_handlers(self)
-        pyglet.clock.schedule_interval(self.update, 1 / 60.0)
+        ring_icon_path = os.path.join(PlayerSprite.SPRITES_PATH, 'ringPhoto.png')
+        self.ring_counter = RingCounter(ring_icon_path, x=30, y=self.window.height - 100)
+
+        game_text_path = os.path.join(PlayerSprite.SPRITES_PATH, 'gameText1.png')
+        self.game_text = GameText(game_text_path, self.foreground_batch, x=800, y=700)
 
-    # Metóda pre hudbu
+        self.boss_manager = BossManager(self.foreground_batch, self.window, self.ui_batch, self, self.spatial_hash,
+                                        self.camera, self.bosses_path)
+
+    def start_loading(self, dt):
+        # Etapy po prvej snímke - menu už je na obrazovke, dekódovanie beží v thread poole preloadera
+        with Startup.stage('loading screen'):
+            self.loading_preloader = AssetPreloader(streams=[LoadingScreen.PATH], on_finished=self.on_loading_screen_ready)
+        with Startup.stage('audio'):
+            Audio.init()
+        with Startup.stage('preloader'):
+            # Z levelu sa teraz prečíta len hlavička (tileset a pozadie), chunky sa načítajú až počas hry
+            level_header = Level.read_header(self.level_path)
+            self.background_path = os.path.join(PlayerSprite.SPRITES_PATH,
+                                                level_header.get('background', 'sunsethill_animated.gif'))
+            self.preloader = AssetPreloader(
+                streams=[self.background_path],
+                atlas_animations=Game.ATLAS_ANIMATIONS + BossBehaviour.animation_files(BossBehaviour.load(self.bosses_path)),
+                images=[os.path.join(PlayerSprite.SPRITES_PATH, name) for name in
+                        ('ringPhoto.png', 'gameText1.png', 'gameText2.png', 'gameText3.png')],
+                tilesets=[(os.path.join(PlayerSprite.SPRITES_PATH, level_header['tileset']), level_header['tile_size'])],
+                sounds=Audio.sound_files(),
+                music=[os.path.join(PlayerSprite.SPRITES_PATH, "doomsday.mp3")],
+                on_finished=self.on_assets_ready)
+        self.loading_started = time.perf_counter()
+
+    def on_loading_screen_ready(self):
+        self.loading = LoadingScreen(self.window)
+
+    def on_assets_ready(self):
+        Startup.record('assets', self.loading_started, time.perf_counter())
+        with Startup.stage('world'):
+            self.create_world()
+        self.assets_ready = True
+        print(f"Assets preloaded: {self.preloader.total} files")
+        if Startup.trace:
+            Startup.report()
+        # Hráč už stlačil SPACE a čaká na loading screene
+        if self.state == "loading":
+            self.start_game(0)
+
+    # Metóda pre hudbu - otvorená a s dekódovaným začiatkom už z preloadera (Audio.open_music)
     def play_music(self):
-        music_path = os.path.join(PlayerSprite.SPRITES_PATH, "doomsday.mp3")
-        music = pyglet.media.load(music_path, streaming=True)
-        self.music_player = pyglet.media.Player()
-        self.music_player.queue(music)
-        self.music_player.loop = True
-        self.music_player.play()
+        self.music_player = Audio.play_music()
 
     def on_draw(self):
-        self.window.clear()
-        if self.state == "menu":
-            self.menu.draw()
-        elif self.state == "loading":
-            self.loading.draw()
-        elif self.state == "game":
-            self.window.view = math.Mat4().translate((-self.camera_x, 0, 0))
-            self.background_batch.draw()
-            self.ground_batch.draw()
-            self.foreground_batch.draw()
-            self.window.view = math.Mat4()
-            self.ring_counter.draw()
-            self.ui_batch.draw()
-            for dt in self.damage_texts:
-                dt.draw()
-        else:
-            self.ui_batch.draw()
-            for dt in self.damage_texts:
-                dt.draw()
+        with Profiler.section('draw', 'draw'):
+            self.window.clear()
+            if self.state == "menu":
+                self.draw_layer("menu", self.menu)
+            elif self.state == "loading":
+                if self.loading:
+                    self.draw_layer("loading", self.loading)
+            elif self.state == "game":
+                self.window.view = self.camera.view
+                self.draw_layer("background", self.background_batch)
+                self.draw_layer("ground", self.ground_batch)
+                self.draw_layer("foreground", self.foreground_batch)
+                self.window.view = math.Mat4()
+                self.draw_layer("ring_counter", self.ring_counter)
+                # ui_batch kreslí aj všetky damage texty naraz
+                self.draw_layer("ui", self.ui_batch)
+                if self.draw_calls:
+                    self.draw_calls.end_frame()
+                self.replay_frames += 1
+            else:
+                self.ui_batch.draw()
+        # Overlay sa kreslí mimo sekcie 'draw', aby nemeral sám seba
+        if self.profiler_overlay:
+            self.profiler_overlay.draw()
+        Profiler.end_frame()
+        if not self.first_frame_drawn:
+            # Menu je na obrazovke - zvyšok štartu až od ďalšieho ticku
+            self.first_frame_drawn = True
+            Startup.frame_drawn()
+            pyglet.clock.schedule_once(self.start_loading, 0)
+
+    def toggle_profiler(self):
+        if self.profiler_overlay is None:
+            self.profiler_overlay = ProfilerOverlay(self.window)
+        self.profiler_overlay.toggle()
+
+    def draw_layer(self, name, drawable):
+        with Profiler.section('draw ' + name, 'draw'):
+            if self.draw_calls:
+                self.draw_calls.draw(name, drawable)
+            else:
+                drawable.draw()
 
     def on_key_press(self, symbol, modifiers):
-        if self.state == "menu":
+        if symbol == key.F3:
+            self.toggle_profiler()
+        elif self.state == "menu":
             if symbol == key.SPACE:
                 self.state = "loading"
-                pyglet.clock.schedule_once(self.start_game, 2.0)
-        elif self.state == "game":
+                # Hra štartuje, až keď je preloader hotový (on_assets_ready)
+                if self.assets_ready:
+                    self.start_game(0)
+        elif self.state == "game" and not self.replay:
+            if self.recorder:
+                self.recorder.record(self.tick, 'press', symbol)
             self.player.on_key_press(symbol, modifiers)
 
     def on_key_release(self, symbol, modifiers):
-        if self.state == "game":
+        if self.state == "game" and not self.replay:
+            if self.recorder:
+                self.recorder.record(self.tick, 'release', symbol)
             self.player.on_key_release(symbol, modifiers)
 
     def start_game(self, dt):
         self.state = "game"
+        # Bossovia (výber, pohyb MetalSonica) používajú random - od štartu hry je deterministický
+        random.seed(self.seed)
+        self.tick = 0
+        self.replay_start = time.perf_counter()
         # Hudba začne až tu, keď sa spustí hra
         self.play_music()
 
+    def simulate(self, dt):
+        if self.replay:
+            if self.tick >= self.replay.end_tick:
+                return
+            # Klávesy z nahrávky sa podajú presne pred tým krokom, pred ktorým ich hráč stlačil
+            for kind, symbol in self.replay.events_at(self.tick):
+                if kind == 'press':
+                    self.player.on_key_press(symbol, 0)
+                else:
+                    self.player.on_key_release(symbol, 0)
+        super().simulate(dt)
+        self.tick += 1
+        if self.replay and self.tick == self.replay.end_tick:
+            self.finish_replay()
+
+    def finish_replay(self):
+        elapsed = time.perf_counter() - self.replay_start
+        self.replay_ok = self.replay.check(self.world_state())
+        print(f"Replay: {self.tick} ticks ({self.tick * self.timestep.step:.1f} s simulated) in {elapsed:.2f} s, "
+              f"{self.replay_frames} frames, {self.replay_frames / elapsed:.1f} fps")
+        pyglet.app.exit()
+
+    def save_recording(self):
+        if self.state != "game":
+            print("Nothing recorded, the game was not started")
+            return
+        self.recorder.save(self.record_path, self.tick, self.world_state())
+
+    def interpolate(self, alpha):
+        for entity in self.interpolated_entities():
+            if entity.sprite is not None:
+                prev_x = getattr(entity, 'prev_x', entity.x)
+                prev_y = getattr(entity, 'prev_y', entity.y)
+                entity.sprite.update(x=prev_x + (entity.x - prev_x) * alpha,
+                                     y=prev_y + (entity.y - prev_y) * alpha)
+        for boss in self.boss_manager.bosses:
+            if boss.active:
+                self.spatial_hash.update(boss, boss.get_bounds())
+        projectile_store = self.boss_manager.pools.projectile_store
+        if projectile_store.count:
+            # Projektily sa interpolujú priamo zo stĺpcov store, jedným prechodom aj s polohou v hashi pre kameru.
+            # Letia aj po smrti strelca, takže podľa toho, či nejaké sú, nie či žije boss
+            projectile_store.sync_sprites(alpha, self.spatial_hash)
+        self.camera.follow(self.player.sprite.x)
+        self.camera.cull()
+
     def update(self, dt):
-        if self.state == "game":
-            self.player.update(dt)
-            self.background.update(dt)
-            new_rings = self.rings_manager.update(dt, self.player)
-            self.player_rings += new_rings
-            self.ring_counter.update(self.player_rings)
-            self.game_text.draw()
-            self.camera_x = self.player.x - self.window.width / 2
-            if self.player.x >= 1300 and not self.boss_manager.boss_spawned:
-                self.boss_manager.spawn_boss()
-            if self.boss_manager.boss_spawned:
-                self.player_rings = self.boss_manager.update(dt, self.player, self.player_rings)
-            if self.player_rings <= 0:
-                self.boss_manager.display_end_message("gameText3.png")  # YOU LOSE
-                pyglet.clock.schedule_once(lambda dt: pyglet.app.exit(), 3.0)
-
-        # Aktualizácia damage textov
-        for dt_obj in self.damage_texts:
-            dt_obj.update(dt)
-        self.damage_texts = [dt_obj for dt_obj in self.damage_texts if dt_obj.timer > 0]
+        with Profiler.section('update'):
+            if self.state == "game":
+                self.timestep.advance(dt, self.simulate)
+                self.interpolate(self.timestep.alpha)
+                self.background.update(dt)
+                self.ring_counter.update(self.player_rings)
+                self.game_text.draw()
+            elif self.state == "loading" and self.loading:
+                self.loading.update(dt)
+
+            # Aktualizácia damage textov
+            self.update_damage_texts(dt)
 
     def run(self):
-        pyglet.app.run()
+        # Bez render_rate sa kreslí tak rýchlo, ako dovolí vsync (refresh monitora)
+        if self.render_rate:
+            pyglet.app.run(1.0 / self.render_rate)
+        else:
+            pyglet.app.run(0 if self.window.vsync else 1 / 60.0)
+        if self.recorder:
+            self.save_recording()
+        if self.replay and self.replay_ok is None:
+            print(f"Replay interrupted at tick {self.tick} of {self.replay.end_tick}")
+            self.replay_ok = False
+
+# Sekcie profilera v metódach volaných v každom kroku simulácie a pri načítaní assetov
+# (obalia sa, len keď je profiler zapnutý - pozri Profiler.instrument)
+for owner, attr, name in ((GameWorld, 'simulate', 'simulate'), (Player, 'update', 'player'),
+                          (RingsManager, 'update', 'rings'), (Level, 'update', 'level'), (BossManager, 'update', 'boss'),
+                          (BossManager, 'update_projectiles', 'projectiles'),
+                          (GameWorld, 'update_damage_texts', 'damage_texts'), (Game, 'interpolate', 'interpolate'),
+                          (Background, 'update', 'background'), (RingCounter, 'update', 'ring_counter')):
+    Profiler.instrument(owner, attr, name)
+for attr in ('decode_animation', 'get_animation', 'open_frame_source', 'get_image', 'decode_tileset'):
+    Profiler.instrument(ResourceManager, attr, attr, 'asset', detail=lambda file_path, *args, **kwargs: os.path.basename(file_path))
+Profiler.instrument(ResourceManager, 'get_text_image', 'get_text_image', 'asset', detail=lambda text, *args: text)
+Profiler.instrument(StreamingAnimation, '_upload', 'stream upload', 'asset')
+for attr in ('decode_sound', 'open_music'):
+    Profiler.instrument(Audio, attr, attr, 'asset', detail=lambda file_path: os.path.basename(file_path))
+
+# === Headless Simulation === - súboje bez okna a grafiky, tak rýchlo ako to CPU zvládne (ladenie bossov, CI)
+class SimpleBot:
+    """Jednoduchý hráč pre headless režim: beží k bossovi a keď je blízko, skočí naň."""
+    JUMP_DISTANCE = 250
+
+    def __init__(self, player):
+        self.player = player
+        self.held = None
+
+    def update(self, boss):
+        boss_alive = boss is not None and boss.active
+        target_x = boss.x if boss_alive else self.player.x + 1000
+        wanted = key.D if target_x > self.player.x else key.A
+        if wanted != self.held:
+            if self.held is not None:
+                self.player.on_key_release(self.held, 0)
+            self.player.on_key_press(wanted, 0)
+            self.held = wanted
+        if boss_alive and abs(boss.x - self.player.x) < self.JUMP_DISTANCE and not self.player.is_jumping:
+            self.player.on_key_press(key.SPACE, 0)
+            self.player.on_key_release(key.SPACE, 0)
+
+class HeadlessSimulation(GameWorld):
+    def __init__(self, sim_rate=Game.SIM_RATE, seed=None, level_path=Level.DEFAULT, bosses_path=BossBehaviour.DEFAULT):
+        random.seed(seed)
+        self.window = HeadlessWindow()
+        self.step_dt = 1.0 / sim_rate
+        ring_path = os.path.join(PlayerSprite.SPRITES_PATH, 'ring.gif')
+        self.spatial_hash = SpatialHash()
+        # Bez okna sa nič neskrýva (cull sa nevolá), ale spiace entity ďaleko od hráča fungujú rovnako ako v hre
+        self.camera = Camera(self.window.width, self.window.height, self.spatial_hash)
+        self.rings_manager = RingsManager(ring_path, None, spatial_hash=self.spatial_hash)
+        self.level = Level(level_path, None, self.rings_manager, self.camera)
+        self.player = Player(None, self.window, self.level.player_start, self.level.bounds)
+        self.boss_manager = BossManager(None, self.window, None, self, self.spatial_hash, self.camera, bosses_path)
+        self.player_rings = 6
+        self.damage_texts = []
+        self.bot = SimpleBot(self.player)
+        self.steps = 0
+
+    @property
+    def result(self):
+        if self.boss_manager.win_displayed:
+            return "win"
+        if self.boss_manager.lose_displayed:
+            return "lose"
+        return "timeout"
+
+    def run(self, max_time):
+        max_steps = int(max_time / self.step_dt)
+        while self.result == "timeout" and self.steps < max_steps:
+            self.bot.update(self.boss_manager.nearest_boss(self.player.x))
+            self.simulate(self.step_dt)
+            self.update_damage_texts(self.step_dt)
+            self.steps += 1
+        return self.result
+
+def run_headless(fights, max_time, sim_rate=Game.SIM_RATE, seed=0, level_path=Level.DEFAULT, bosses_path=BossBehaviour.DEFAULT):
+    results = collections.Counter()
+    total_steps = 0
+    start = time.perf_counter()
+    # Výpisy z hry (zdravie bossa, spawn...) by pri tisícoch súbojov len spomaľovali
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(fights):
+            sim = HeadlessSimulation(sim_rate, seed + i, level_path, bosses_path)
+            result = sim.run(max_time)
+            boss = sim.boss_manager.boss.name if sim.boss_manager.boss else "none"
+            results[boss, result] += 1
+            total_steps += sim.steps
+    elapsed = time.perf_counter() - start
+    print(f"Fights: {fights}, simulated steps: {total_steps}, real time: {elapsed:.2f} s")
+    print(f"Simulated steps per second: {total_steps / elapsed:.0f} "
+          f"({total_steps / sim_rate / elapsed:.0f}x real time at {sim_rate} Hz)")
+    for boss in sorted({boss for boss, _ in results}):
+        counts = ", ".join(f"{result}={results[boss, result]}" for result in ("win", "lose", "timeout"))
+        print(f"  {boss}: {counts}")
+    return results
 
 if __name__ == '__main__':
-    game = Game()
-    game.run()
+    Startup.record('import', STARTED, time.perf_counter())
+    import argparse
+    parser = argparse.ArgumentParser(description="Sonic Game")
+    parser.add_argument('--no-atlas', action='store_true', help="každá snímka vo vlastnej textúre (na porovnanie)")
+    parser.add_argument('--draw-calls', action='store_true', help="každú sekundu vypíše počet draw callov na snímku")
+    parser.add_argument('--sim-rate', type=int, default=Game.SIM_RATE, help="počet krokov simulácie za sekundu")
+    parser.add_argument('--fps', type=int, default=None, help="frekvencia vykresľovania (predvolene podľa vsync)")
+    parser.add_argument('--headless', action='store_true', help="súboje bez okna a grafiky, vypíše kroky simulácie za sekundu")
+    parser.add_argument('--fights', type=int, default=100, help="počet súbojov v headless režime")
+    parser.add_argument('--max-time', type=float, default=300.0, help="max. simulovaný čas jedného súboja (s)")
+    parser.add_argument('--seed', type=int, default=None, help="seed pre random (predvolene 0 v headless režime, v hre náhodný)")
+    parser.add_argument('--profile', action='store_true', help="zapne overlay profilera hneď od štartu (inak F3)")
+    parser.add_argument('--trace', metavar='FILE', help="pri ukončení uloží Chrome trace (chrome://tracing, ui.perfetto.dev)")
+    parser.add_argument('--record', metavar='FILE', help="nahrá klávesy hráča (s krokmi simulácie a seedom) do súboru")
+    parser.add_argument('--replay', metavar='FILE', help="prehrá nahrávku z --record a porovná výsledný stav sveta")
+    parser.add_argument('--level', metavar='FILE', default=Level.DEFAULT, help="súbor levelu (vytvára src/build_level.py)")
+    parser.add_argument('--bosses', metavar='FILE', default=BossBehaviour.DEFAULT, help="správanie bossov (JSON, resources/bosses.json)")
+    parser.add_argument('--startup-trace', action='store_true',
+                        help="po načítaní vypíše čas do prvej snímky a trvanie etáp štartu")
+    args = parser.parse_args()
+    Startup.trace = args.startup_trace
+    if args.trace:
+        Profiler.start_trace()
+    replay_ok = None
+    if args.headless:
+        run_headless(args.fights, args.max_time, args.sim_rate, args.seed or 0, args.level, args.bosses)
+    else:
+        game = Game(use_atlas=not args.no_atlas, count_draw_calls=args.draw_calls,
+                    sim_rate=args.sim_rate, render_rate=args.fps, profile=args.profile,
+                    seed=args.seed, record_path=args.record, replay_path=args.replay, level_path=args.level,
+                    bosses_path=args.bosses)
+        game.run()
+        replay_ok = game.replay_ok
+    if args.trace:
+        Profiler.save_trace(args.trace)
+    if replay_ok is False:
+        sys.exit(1)